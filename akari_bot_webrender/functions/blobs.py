@@ -0,0 +1,114 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from collections.abc import Iterable
+from pathlib import Path
+
+_blob_hash = re.compile(r"[0-9a-f]{32}")
+
+
+def blob_media_type(data: bytes) -> str:
+    if data.startswith(b"\x89PNG"):
+        return "image/png"
+    if data.startswith(b"\xff\xd8"):
+        return "image/jpeg"
+    return "application/octet-stream"
+
+
+class BlobStore:
+    def __init__(self, path: str | Path, max_bytes: int = 1024 * 1024 * 1024):
+        """
+        Content-addressed storage for screenshot slices. Identical slices are stored once under the hash of their
+        bytes, and the least recently used blobs are deleted once the store exceeds ``max_bytes``. Methods touch the
+        disk and are safe to call from worker threads with ``asyncio.to_thread``.
+
+        :param path: Directory holding the blobs. Blobs left by a previous run are picked up again.
+        :param max_bytes: Total size of all blobs to keep.
+        """
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.blobs: OrderedDict[str, int] = OrderedDict()
+        self.total_bytes = 0
+        self.stored = 0
+        self.deduplicated = 0
+        self.evicted = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.path.is_dir():
+            return
+        entries = []
+        for entry in self.path.glob("*/*"):
+            if _blob_hash.fullmatch(entry.name):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+        for _mtime, blob_hash, size in sorted(entries):
+            self.blobs[blob_hash] = size
+            self.total_bytes += size
+        self._evict()
+
+    def _file(self, blob_hash: str) -> Path:
+        return self.path / blob_hash[:2] / blob_hash
+
+    def put(self, data: bytes) -> str:
+        """Store ``data`` unless an identical blob exists, and return its hash."""
+        blob_hash = hashlib.sha256(data).hexdigest()[:32]
+        with self._lock:
+            if blob_hash in self.blobs:
+                self.blobs.move_to_end(blob_hash)
+                self.deduplicated += 1
+                return blob_hash
+            target = self._file(blob_hash)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            temp = target.with_suffix(".tmp")
+            temp.write_bytes(data)
+            os.replace(temp, target)
+            self.blobs[blob_hash] = len(data)
+            self.total_bytes += len(data)
+            self.stored += 1
+            self._evict()
+        return blob_hash
+
+    def put_many(self, blobs: Iterable[bytes]) -> list[str]:
+        """Store each of ``blobs`` like :meth:`put`, in one call so a worker thread can do all the writing."""
+        return [self.put(data) for data in blobs]
+
+    def get(self, blob_hash: str) -> Path | None:
+        """The file of a stored blob, marking it as recently used, or ``None`` if it is unknown or evicted."""
+        if not _blob_hash.fullmatch(blob_hash):
+            return None
+        with self._lock:
+            if blob_hash not in self.blobs:
+                return None
+            target = self._file(blob_hash)
+            try:
+                # The modification time orders blobs by use when the store is loaded again.
+                os.utime(target)
+            except OSError:
+                self._forget(blob_hash)
+                return None
+            self.blobs.move_to_end(blob_hash)
+        return target
+
+    def _forget(self, blob_hash: str):
+        self.total_bytes -= self.blobs.pop(blob_hash, 0)
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and len(self.blobs) > 1:
+            blob_hash = next(iter(self.blobs))
+            self._forget(blob_hash)
+            self._file(blob_hash).unlink(missing_ok=True)
+            self.evicted += 1
+
+    def stats(self) -> dict:
+        return {
+            "blobs": len(self.blobs),
+            "total_bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "stored": self.stored,
+            "deduplicated": self.deduplicated,
+            "evicted": self.evicted,
+        }
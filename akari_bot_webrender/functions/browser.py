@@ -1,13 +1,43 @@
-from pathlib import Path
-from typing import Literal
+from __future__ import annotations
 
-from playwright import async_api
-from playwright.async_api import Browser as BrowserProcess
-from playwright.async_api import BrowserContext, Playwright, ViewportSize
-from playwright_stealth import stealth_async
+import asyncio
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Literal
 
 from ..constants import base_height, base_width, browser_user_agent
 from .logger import LoggingLogger
+from .storage import StorageStateStore, site_for_url
+from .templates import context_init_script
+from .watchdog import BrowserWatchdog
+
+# Playwright and playwright_stealth are imported on first use, so remote-only clients never load them.
+if TYPE_CHECKING:
+    from playwright.async_api import APIRequestContext, BrowserContext, Page, Playwright
+    from playwright.async_api import Browser as BrowserProcess
+
+# Chromium command line switches per launch profile, added to Playwright's own. Playwright already turns off
+# background throttling, extensions and component updates, and owns ``--disable-features``, so the profiles leave
+# those alone. Other browsers always launch with their defaults.
+launch_profiles: dict[str, list[str]] = {
+    "default": [],
+    # Fewer renderer and GPU processes, one raster thread and caches given back eagerly, for small containers.
+    "low-memory": [
+        "--renderer-process-limit=2",
+        "--process-per-site",
+        "--disable-site-isolation-trials",
+        "--disable-gpu",
+        "--in-process-gpu",
+        "--num-raster-threads=1",
+        "--aggressive-cache-discard",
+        "--disk-cache-size=33554432",
+    ],
+    # No extra processes for cross-site frames, and more raster threads for long captures rendering at once.
+    "throughput": [
+        "--disable-site-isolation-trials",
+        "--num-raster-threads=4",
+    ],
+}
 
 
 def normalize_locale(locale: str) -> str:
@@ -25,6 +55,18 @@ def normalize_locale(locale: str) -> str:
     return "-".join(normalized)
 
 
+async def apply_stealth(context: BrowserContext):
+    """Install the playwright_stealth headers and evasion scripts once for the whole context."""
+    from playwright_stealth import StealthConfig
+    from playwright_stealth.properties import Properties
+    from playwright_stealth.stealth import combine_scripts
+
+    config = StealthConfig()
+    properties = Properties(browser_type=config.browser_type)
+    await context.set_extra_http_headers(properties.as_dict()["header"])
+    await context.add_init_script(combine_scripts(properties, config))
+
+
 class Browser:
     def __init__(
         self,
@@ -32,10 +74,61 @@ class Browser:
         export_logs: bool = False,
         logs_path: str | Path | None = None,
         headless: bool | None = None,
+        watchdog_interval: float = 0,
+        recycle_after_pages: int = 0,
+        recycle_memory_mb: float = 0,
+        drain_timeout: float = 60,
+        storage_state_path: str | Path | None = None,
+        storage_state_interval: float = 300,
+        max_site_contexts: int = 64,
+        log_mode: Literal["default", "production"] = "default",
+        log_sample_rate: float = 1.0,
+        launch_profile: str = "default",
+        page_max_age: float = 0,
     ):
+        """
+        :param launch_profile: Chromium switches to launch with, one of :data:`launch_profiles`. ``low-memory``
+            trades render speed for a smaller footprint, ``throughput`` keeps renders fast when many run at once.
+        :param page_max_age: Close pages that no request has held for longer than this many seconds, such as
+            pages kept open after rendering, popups or pages left behind by errors. ``0`` never closes them.
+        :param watchdog_interval: Seconds between browser health checks, ``0`` disables the watchdog.
+        :param recycle_after_pages: Relaunch the browser after this many pages, ``0`` disables the limit.
+        :param recycle_memory_mb: Relaunch the browser above this process tree RSS, ``0`` disables the limit.
+        :param drain_timeout: Seconds a replaced browser may keep serving in-flight pages before it is closed.
+        :param storage_state_path: Directory for per-site cookies and local storage. When set, every site gets its
+            own browser contexts, which start from the saved state of that site.
+        :param storage_state_interval: Seconds between saves of the storage state of open site contexts.
+        :param max_site_contexts: Idle site contexts beyond this number are saved and closed, least recently used
+            first.
+        :param log_mode: ``production`` enables non-blocking, sampled logging, see :class:`LoggingLogger`.
+        :param log_sample_rate: Share of requests whose per-request log lines are written in ``production`` mode.
+        """
+        if launch_profile not in launch_profiles:
+            raise ValueError(f"launch_profile must be one of {', '.join(launch_profiles)}")
+        self.launch_profile = launch_profile
         self.playwright: Playwright | None = None
         self.browser: BrowserProcess | None = None
         self.contexts: dict[str, BrowserContext] = {}
+        self.pages_served = 0
+        self.generation = 0
+        self.drain_timeout = drain_timeout
+        self._launch_options: dict = {}
+        self._recycle_lock = asyncio.Lock()
+        self._draining: set[asyncio.Task] = set()
+        self.storage_states = StorageStateStore(storage_state_path) if storage_state_path else None
+        self.storage_state_interval = storage_state_interval
+        self.max_site_contexts = max_site_contexts
+        self._context_last_used: dict[str, float] = {}
+        # Contexts being created, by generation and key, so concurrent requests for one key share a single context.
+        self._pending_contexts: dict[tuple[int, str], asyncio.Task] = {}
+        self._persist_task: asyncio.Task | None = None
+        self.page_max_age = page_max_age
+        self.pages_reaped = 0
+        # Open pages, kept up to date from page events so counting them is cheap, and when each was last released
+        # by a request, or opened if no request ever held it.
+        self._page_idle_since: dict[Page, float] = {}
+        self._held_pages: set[Page] = set()
+        self._reaper_task: asyncio.Task | None = None
         self.debug = debug
         # Before ``headless`` was configurable, debug mode also selected headed mode.
         self.headless = not debug if headless is None else headless
@@ -43,7 +136,17 @@ class Browser:
         self.logs_path = None
         if export_logs:
             self.logs_path = logs_path
-        self.logger = LoggingLogger(debug=debug, logs_path=logs_path)
+        self.logger = LoggingLogger(
+            debug=debug, logs_path=logs_path, log_mode=log_mode, log_sample_rate=log_sample_rate
+        )
+        self.watchdog = None
+        if watchdog_interval:
+            self.watchdog = BrowserWatchdog(
+                self,
+                interval=watchdog_interval,
+                recycle_after_pages=recycle_after_pages,
+                recycle_memory_mb=recycle_memory_mb,
+            )
 
     async def browser_init(
         self,
@@ -61,26 +164,111 @@ class Browser:
             self.logger.warning("Cleaning up stale browser state before relaunching.")
             await self.close()
 
+        self._launch_options = {"browser_type": browser_type, "executable_path": executable_path}
+        if not await self._start():
+            return False
+        if self.watchdog:
+            self.watchdog.start()
+        if self.storage_states and (self._persist_task is None or self._persist_task.done()):
+            self._persist_task = asyncio.create_task(self._persist_storage_loop())
+        if self.page_max_age and (self._reaper_task is None or self._reaper_task.done()):
+            self._reaper_task = asyncio.create_task(self._reap_pages_loop())
+        return True
+
+    async def _start(self):
         self.logger.info("Launching browser...")
         try:
-            _p = async_api.async_playwright()
+            from playwright.async_api import async_playwright
+
+            _p = async_playwright()
             self.playwright = await _p.start()
-            _b = None
-            if browser_type in ["chrome", "chromium"]:
-                _b = self.playwright.chromium
-            elif browser_type == "firefox":
-                _b = self.playwright.firefox
-            else:
-                raise ValueError('Unsupported browser type. Use "chromium" or "firefox".')
-            self.browser = await _b.launch(headless=self.headless, executable_path=executable_path)
+            self.browser = await self._launch()
             self.logger.success("Successfully launched browser.")
             return True
         except Exception:
             self.logger.exception("Failed to launch browser.")
-            await self.close()
+            await self._shutdown()
             return False
 
+    async def _launch(self) -> BrowserProcess:
+        browser_type = self._launch_options.get("browser_type", "chromium")
+        if browser_type in ["chrome", "chromium"]:
+            _b = self.playwright.chromium
+        elif browser_type == "firefox":
+            _b = self.playwright.firefox
+        else:
+            raise ValueError('Unsupported browser type. Use "chromium" or "firefox".')
+        args = launch_profiles[self.launch_profile] if _b is self.playwright.chromium else []
+        browser = await _b.launch(
+            headless=self.headless, executable_path=self._launch_options.get("executable_path"), args=args
+        )
+        browser.on("disconnected", self._on_disconnected)
+        self.generation += 1
+        self.pages_served = 0
+        return browser
+
+    def _on_disconnected(self, browser: BrowserProcess):
+        if browser is self.browser and self.watchdog:
+            self.logger.error("Browser disconnected unexpectedly.")
+            self.watchdog.wake()
+
+    async def recycle(self):
+        """
+        Replace the running browser with a freshly launched one. New pages go to the new browser at once, while
+        the old one keeps serving its open pages until they are closed or ``drain_timeout`` passes.
+        """
+        async with self._recycle_lock:
+            if not self.playwright:
+                return False
+            old_browser, old_contexts = self.browser, self.contexts
+            try:
+                new_browser = await self._launch()
+            except Exception:
+                self.logger.exception("Failed to launch a replacement browser, restarting Playwright.")
+                await self._shutdown()
+                return await self._start()
+            self.browser, self.contexts = new_browser, {}
+            task = asyncio.create_task(self._drain(old_browser, old_contexts))
+            self._draining.add(task)
+            task.add_done_callback(self._draining.discard)
+            self.logger.success(f"Browser recycled, now running generation {self.generation}.")
+            return True
+
+    async def _drain(self, browser: BrowserProcess | None, contexts: dict[str, BrowserContext]):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.drain_timeout
+        while browser and browser.is_connected() and loop.time() < deadline:
+            if not any(context.pages for context in contexts.values()):
+                break
+            await asyncio.sleep(0.5)
+        await self.persist_storage_states(contexts)
+        for context in contexts.values():
+            try:
+                await context.close()
+            except Exception:
+                self.logger.exception("Failed to close drained browser context.")
+        if browser:
+            try:
+                await browser.close()
+            except Exception:
+                self.logger.exception("Failed to close drained browser process.")
+        self.logger.info("Previous browser drained and closed.")
+
     async def close(self):
+        if self.watchdog:
+            await self.watchdog.stop()
+        if self._persist_task:
+            self._persist_task.cancel()
+            self._persist_task = None
+        if self._reaper_task:
+            self._reaper_task.cancel()
+            self._reaper_task = None
+        for task in list(self._draining):
+            task.cancel()
+        return await self._shutdown()
+
+    async def _shutdown(self):
+        await self.persist_storage_states(self.contexts)
         for context in list(self.contexts.values()):
             try:
                 await context.close()
@@ -99,26 +287,214 @@ class Browser:
                 self.logger.exception("Failed to stop Playwright.")
         self.browser = None
         self.playwright = None
+        self._page_idle_since.clear()
+        self._held_pages.clear()
         self.logger.info("Browser closed.")
         return True
 
-    async def new_page(
-        self, width: int = base_width, height: int = base_height, locale: str = "zh_cn", stealth: bool = True
-    ):
+    async def get_context(
+        self,
+        width: int = base_width,
+        height: int = base_height,
+        locale: str = "zh_cn",
+        stealth: bool = True,
+        url: str | None = None,
+    ) -> BrowserContext:
+        """
+        The pooled context for these settings. With persistent storage enabled, contexts are further split by
+        the site of ``url``, so that one site's cookies never reach another site's context.
+        """
         normalized_locale = normalize_locale(locale)
         ctx_key = f"{width}x{height}_{normalized_locale}{'_stealth' if stealth else ''}"
-        if self.browser and ctx_key not in self.contexts:
-            context_options = {
-                "viewport": ViewportSize(width=width, height=height),
-                "locale": normalized_locale,
-            }
-            if stealth:
-                context_options["user_agent"] = browser_user_agent
-            self.contexts[ctx_key] = await self.browser.new_context(**context_options)
-        page = await self.contexts[ctx_key].new_page()
+        site = site_for_url(url) if self.storage_states else None
+        if site:
+            ctx_key += f"@{site}"
+        # Keep references to the current generation so a concurrent recycle cannot mix old and new contexts.
+        browser, contexts = self.browser, self.contexts
+        if browser and ctx_key not in contexts:
+            pending_key = (id(contexts), ctx_key)
+            pending = self._pending_contexts.get(pending_key)
+            if pending is None:
+                # A task, so a cancelled first caller neither leaves the others waiting nor loses the context.
+                pending = asyncio.create_task(
+                    self._create_context(browser, contexts, ctx_key, width, height, normalized_locale, stealth, site)
+                )
+                self._pending_contexts[pending_key] = pending
+                pending.add_done_callback(lambda _task: self._pending_contexts.pop(pending_key, None))
+            await asyncio.shield(pending)
+        if site:
+            self._context_last_used[ctx_key] = time.monotonic()
+            await self._evict_site_contexts(contexts)
+        return contexts[ctx_key]
+
+    async def _create_context(
+        self,
+        browser: BrowserProcess,
+        contexts: dict[str, BrowserContext],
+        ctx_key: str,
+        width: int,
+        height: int,
+        locale: str,
+        stealth: bool,
+        site: str | None,
+    ):
+        context_options = {
+            "viewport": {"width": width, "height": height},
+            "locale": locale,
+        }
+        if stealth:
+            context_options["user_agent"] = browser_user_agent
+        if site:
+            storage_state = await asyncio.to_thread(self.storage_states.load, site)
+            if storage_state:
+                context_options["storage_state"] = storage_state
+        context = await browser.new_context(**context_options)
+        context.on("page", self._track_page)
+        # Everything a page needs is set up here once, so opening a page costs no extra round trips.
+        await context.add_init_script(context_init_script())
         if stealth:
-            await stealth_async(page)
+            await apply_stealth(context)
+        contexts[ctx_key] = context
+
+    async def _evict_site_contexts(self, contexts: dict[str, BrowserContext]):
+        site_keys = [key for key in contexts if "@" in key]
+        if len(site_keys) <= self.max_site_contexts:
+            return
+        idle_keys = sorted(
+            (key for key in site_keys if not contexts[key].pages),
+            key=lambda key: self._context_last_used.get(key, 0),
+        )
+        for key in idle_keys[: len(site_keys) - self.max_site_contexts]:
+            context = contexts.pop(key)
+            self._context_last_used.pop(key, None)
+            await self.persist_storage_states({key: context})
+            try:
+                await context.close()
+            except Exception:
+                self.logger.exception("Failed to close idle site context.")
+
+    async def persist_storage_states(self, contexts: dict[str, BrowserContext] | None = None):
+        """Save the storage state of every site context in ``contexts`` (defaults to the current ones)."""
+        if not self.storage_states:
+            return
+        for key, context in list((self.contexts if contexts is None else contexts).items()):
+            site = key.partition("@")[2]
+            if not site:
+                continue
+            try:
+                state = await context.storage_state()
+                await asyncio.to_thread(self.storage_states.save, site, state)
+            except Exception:
+                self.logger.exception(f"Failed to save storage state for {site}.")
+
+    async def _persist_storage_loop(self):
+        while True:
+            await asyncio.sleep(self.storage_state_interval)
+            await self.persist_storage_states()
+
+    async def new_page(
+        self,
+        width: int = base_width,
+        height: int = base_height,
+        locale: str = "zh_cn",
+        stealth: bool = True,
+        url: str | None = None,
+    ):
+        """A new page in the pooled context for these settings, held by the caller until :meth:`release_page`."""
+        page = await self._open_page(width=width, height=height, locale=locale, stealth=stealth, url=url)
+        self.pages_served += 1
+        return page
+
+    async def _open_page(self, **context_options) -> Page:
+        """Like :meth:`new_page`, without counting the page towards ``recycle_after_pages``."""
+        context = await self.get_context(**context_options)
+        page = await context.new_page()
+        self._track_page(page)
+        self._held_pages.add(page)
         return page
 
+    def release_page(self, page: Page):
+        """Mark ``page`` as no longer used by a request, so the reaper may close it once it was idle too long."""
+        self._held_pages.discard(page)
+        if page in self._page_idle_since:
+            self._page_idle_since[page] = time.monotonic()
+
+    @property
+    def open_pages(self) -> int:
+        return len(self._page_idle_since)
+
+    def _track_page(self, page: Page):
+        if page not in self._page_idle_since:
+            self._page_idle_since[page] = time.monotonic()
+            page.on("close", self._forget_page)
+
+    def _forget_page(self, page: Page):
+        self._page_idle_since.pop(page, None)
+        self._held_pages.discard(page)
+
+    async def reap_pages(self) -> int:
+        """Close the pages no request has held for ``page_max_age``. Returns how many were closed."""
+        now = time.monotonic()
+        reaped = 0
+        for page, idle_since in list(self._page_idle_since.items()):
+            if page.is_closed():
+                self._forget_page(page)
+                continue
+            if page in self._held_pages or now - idle_since < self.page_max_age:
+                continue
+            try:
+                await page.close()
+                reaped += 1
+            except Exception:
+                self.logger.debug("Failed to close a leaked page.")
+            self._forget_page(page)
+        if reaped:
+            self.pages_reaped += reaped
+            self.logger.warning(f"Closed {reaped} page(s) left idle for more than {self.page_max_age:.0f}s.")
+        return reaped
+
+    async def _reap_pages_loop(self):
+        while True:
+            await asyncio.sleep(max(self.page_max_age / 4, 1))
+            try:
+                await self.reap_pages()
+            except Exception:
+                self.logger.exception("Failed to reap leaked pages.")
+
+    async def request_context(
+        self,
+        width: int = base_width,
+        height: int = base_height,
+        locale: str = "zh_cn",
+        stealth: bool = True,
+        url: str | None = None,
+    ) -> APIRequestContext:
+        """
+        The API request context of the pooled browser context for these settings. It shares cookies with the
+        pages of that context, but needs no tab, so plain fetches skip page creation and stealth injection.
+        """
+        context = await self.get_context(width=width, height=height, locale=locale, stealth=stealth, url=url)
+        return context.request
+
+    async def probe(self, timeout: float = 10) -> bool:
+        """Render a trivial page to check that the browser still responds."""
+        page = None
+        try:
+            async with asyncio.timeout(timeout):
+                # Probe pages are not renders, so they do not bring the browser closer to being recycled.
+                page = await self._open_page(stealth=False)
+                await page.set_content("<p>ok</p>")
+                return await page.evaluate("1 + 1") == 2
+        except Exception:
+            self.logger.debug("Browser health probe raised an exception.")
+            return False
+        finally:
+            if page:
+                self.release_page(page)
+                try:
+                    await page.close()
+                except Exception:
+                    self.logger.debug("Failed to close browser health probe page.")
+
     async def check_status(self):
         return bool(self.playwright and self.browser and self.browser.is_connected())
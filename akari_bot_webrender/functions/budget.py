@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, replace
+from typing import TYPE_CHECKING, Literal
+
+from .templates import read_template
+
+if TYPE_CHECKING:
+    from playwright.async_api import Page, Request, Response, Route
+
+budget_limits = ("max_page_bytes", "max_page_requests", "max_dom_nodes", "max_js_heap_mb", "max_capture_height")
+
+
+@dataclass(frozen=True)
+class ResourceBudget:
+    """
+    Limits on what a single render may consume. ``None`` means no limit. ``on_budget_exceeded`` decides whether a
+    render over budget fails with :class:`ResourceLimitExceeded` or captures what loaded so far.
+    """
+
+    max_page_bytes: int | None = None
+    max_page_requests: int | None = None
+    max_dom_nodes: int | None = None
+    max_js_heap_mb: float | None = None
+    max_capture_height: int | None = None
+    on_budget_exceeded: Literal["fail", "partial"] = "fail"
+
+    def tighten(self, **limits) -> ResourceBudget:
+        """This budget with each of ``limits`` applied where it is stricter. Unset limits are ignored."""
+        changes = {}
+        for name, value in limits.items():
+            if name == "on_budget_exceeded":
+                if value:
+                    changes[name] = value
+                continue
+            current = getattr(self, name)
+            if value and (current is None or value < current):
+                changes[name] = value
+        return replace(self, **changes) if changes else self
+
+    def for_request(self, options) -> ResourceBudget:
+        """The budget of a request, from the limits and ``on_budget_exceeded`` set in its ``options``."""
+        names = (*budget_limits, "on_budget_exceeded")
+        return self.tighten(**{name: getattr(options, name, None) for name in names})
+
+    @property
+    def limits_network(self) -> bool:
+        return bool(self.max_page_bytes or self.max_page_requests)
+
+    @property
+    def partial(self) -> bool:
+        return self.on_budget_exceeded == "partial"
+
+
+request_budget: ContextVar[ResourceBudget] = ContextVar("request_budget", default=ResourceBudget())
+
+
+@contextmanager
+def budget_scope(budget: ResourceBudget):
+    """Apply ``budget`` to the renders of the current request."""
+    token = request_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        request_budget.reset(token)
+
+
+class PageBudget:
+    def __init__(self, page: Page, budget: ResourceBudget):
+        """
+        Counts the requests a page makes and the bytes it receives, and stops the page loading once it exceeds
+        ``budget``: further requests are blocked and media elements are unloaded, so a page that streams or
+        scrolls forever finishes loading with what it has. Bytes are counted as they arrive over CDP on Chromium,
+        and from ``Content-Length`` elsewhere.
+        """
+        self.page = page
+        self.budget = budget
+        self.requests = 0
+        self.bytes = 0
+        self.exceeded: str | None = None
+        self.reason: str | None = None
+        self._session = None
+        self._stopping: asyncio.Task | None = None
+
+    async def attach(self):
+        self.page.on("request", self._on_request)
+        if not self.budget.max_page_bytes:
+            return
+        try:
+            self._session = await self.page.context.new_cdp_session(self.page)
+            await self._session.send("Network.enable")
+        except Exception:
+            self._session = None
+            self.page.on("response", self._on_response)
+            return
+        self._session.on("Network.dataReceived", self._on_data_received)
+
+    def _on_request(self, request: Request):
+        self.requests += 1
+        limit = self.budget.max_page_requests
+        if limit and self.requests > limit:
+            self._exceed("max_page_requests", f"Page made more than {limit} requests")
+
+    def _on_data_received(self, event: dict):
+        self._add_bytes(event.get("encodedDataLength") or event.get("dataLength", 0))
+
+    def _on_response(self, response: Response):
+        try:
+            self._add_bytes(int(response.headers.get("content-length", 0)))
+        except ValueError:
+            pass
+
+    def _add_bytes(self, size: int):
+        self.bytes += size
+        limit = self.budget.max_page_bytes
+        if limit and self.bytes > limit:
+            self._exceed("max_page_bytes", f"Page received more than {limit} bytes")
+
+    def _exceed(self, limit: str, reason: str):
+        if self.exceeded:
+            return
+        self.exceeded = limit
+        self.reason = reason
+        self._stopping = asyncio.create_task(self._stop_loading())
+
+    async def _stop_loading(self):
+        try:
+            if self._session:
+                await self._session.send("Network.setBlockedURLs", {"urls": ["*"]})
+                await self._session.send("Page.stopLoading")
+            else:
+                await self.page.route("**/*", _abort)
+            await self.page.evaluate(read_template("stop_loading.js"))
+        except Exception:
+            # The page may be between documents or already closed; blocked requests still end the load.
+            pass
+
+    async def detach(self):
+        self.page.remove_listener("request", self._on_request)
+        if self.budget.max_page_bytes and not self._session:
+            self.page.remove_listener("response", self._on_response)
+        if self._stopping and not self._stopping.done():
+            self._stopping.cancel()
+        if self._session:
+            try:
+                await self._session.detach()
+            except Exception:
+                pass
+
+
+async def _abort(route: Route):
+    await route.abort()
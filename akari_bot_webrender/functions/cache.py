@@ -0,0 +1,346 @@
+import base64
+import hashlib
+import struct
+import time
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import orjson as json
+
+from .slices import SliceBuffer, slice_bytes
+
+# Options that change how a render is delivered but not what it shows.
+fingerprint_excluded_options = {"timeout"}
+
+
+def render_cache_key(endpoint: str, options) -> str:
+    """Identify a render by its endpoint and every option that affects the resulting images."""
+    values = options.model_dump(mode="json") if options is not None else {}
+    payload = json.dumps(
+        {name: value for name, value in values.items() if name not in fingerprint_excluded_options},
+        option=json.OPT_SORT_KEYS,
+    )
+    return hashlib.sha256(endpoint.encode() + b"\0" + payload).hexdigest()
+
+
+def render_etag(key: str, validator: str) -> str:
+    """Strong ETag of a render identified by ``key`` whose target is described by ``validator``."""
+    return '"' + hashlib.sha256(f"{key}\0{validator}".encode()).hexdigest()[:32] + '"'
+
+
+def parse_if_none_match(value: str | None) -> set[str] | None:
+    """The entity tags listed in an ``If-None-Match`` header, ``{"*"}`` for a wildcard."""
+    if not value:
+        return None
+    tags = set()
+    for tag in value.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag:
+            tags.add(tag)
+    return tags or None
+
+
+class ConditionalRender:
+    def __init__(self, if_none_match: str | None = None):
+        """
+        Revalidation state of one request. The screenshot methods fill in the ETag of their render, and raise
+        :class:`NotModified` when it matches ``if_none_match``.
+
+        :param if_none_match: Value of the client's ``If-None-Match`` header.
+        """
+        self.if_none_match = if_none_match
+        self.tags = parse_if_none_match(if_none_match)
+        self.key: str | None = None
+        self.validator: str | None = None
+        self.etag: str | None = None
+        self.cached = False
+        # Set by background refreshes: bypass cached results and store them again with a fresh TTL.
+        self.refresh = False
+
+    def matches(self, etag: str) -> bool:
+        return bool(self.tags) and ("*" in self.tags or etag in self.tags)
+
+
+conditional_render: ContextVar[ConditionalRender | None] = ContextVar("conditional_render", default=None)
+
+
+@contextmanager
+def conditional_scope(if_none_match: str | None = None):
+    """
+    Track revalidation for the renders in this block. Read ``etag`` of the yielded :class:`ConditionalRender`
+    afterwards to learn the ETag of the result. An outer scope is reused.
+    """
+    current = conditional_render.get()
+    if current is not None:
+        yield current
+        return
+    conditional = ConditionalRender(if_none_match)
+    token = conditional_render.set(conditional)
+    try:
+        yield conditional
+    finally:
+        conditional_render.reset(token)
+
+
+class CacheBackend(ABC):
+    """Storage behind :class:`RenderCache`. Values are opaque bytes that expire after ``ttl`` seconds."""
+
+    name = "none"
+
+    @abstractmethod
+    async def get(self, key: str) -> bytes | None:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl: float):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+    def stats(self) -> dict:
+        return {}
+
+
+class MemoryCacheBackend(CacheBackend):
+    name = "memory"
+
+    def __init__(self, max_entries: int = 64, max_bytes: int = 256 * 1024 * 1024):
+        """
+        A per-process cache, for single-node deployments.
+
+        :param max_entries: Values to keep, the least recently used are dropped first.
+        :param max_bytes: Total size of the kept values, the least recently used are dropped first.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self.size = 0
+
+    def _drop(self, key: str):
+        self.size -= len(self.entries.pop(key)[1])
+
+    async def get(self, key: str) -> bytes | None:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            self._drop(key)
+            return None
+        self.entries.move_to_end(key)
+        return entry[1]
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        if key in self.entries:
+            self._drop(key)
+        if len(value) > self.max_bytes:
+            return
+        self.entries[key] = (time.monotonic() + ttl, value)
+        self.size += len(value)
+        while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+            self._drop(next(iter(self.entries)))
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+        }
+
+
+class RedisCacheBackend(CacheBackend):
+    name = "redis"
+
+    def __init__(self, url: str | None = None, client=None, prefix: str = "webrender:", socket_timeout: float = 2):
+        """
+        A cache shared by every WebRender node through a Redis-protocol server. Requires the ``redis`` package.
+
+        :param url: Server URL such as ``redis://cache:6379/0``.
+        :param client: An existing ``redis.asyncio`` compatible client, used instead of ``url``.
+        :param prefix: Prepended to every key, so several deployments can share one server.
+        :param socket_timeout: Seconds a cache operation may take before it counts as a miss.
+        """
+        if client is None:
+            if not url:
+                raise ValueError("RedisCacheBackend requires a url or a client")
+            import redis.asyncio as redis
+
+            client = redis.Redis.from_url(url, socket_timeout=socket_timeout, socket_connect_timeout=socket_timeout)
+        self.client = client
+        self.prefix = prefix
+
+    async def get(self, key: str) -> bytes | None:
+        return await self.client.get(self.prefix + key)
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        await self.client.set(self.prefix + key, value, px=max(1, int(ttl * 1000)))
+
+    async def close(self):
+        await self.client.aclose()
+
+
+# Value layout version, bump when the encoding below changes so old entries are ignored.
+cache_format_version = 1
+_images_kind = 1
+_source_kind = 2
+_compressed_source_kind = 3
+
+
+def encode_images(etag: str, images: list[str] | SliceBuffer) -> bytes:
+    """Pack base64 screenshots as raw bytes behind a small header, a quarter smaller than the base64 text."""
+    etag_bytes = etag.encode()
+    parts = [struct.pack("!BBHH", cache_format_version, _images_kind, len(etag_bytes), len(images)), etag_bytes]
+    for raw in slice_bytes(images):
+        parts.append(struct.pack("!I", len(raw)))
+        parts.append(raw)
+    return b"".join(parts)
+
+
+def decode_images(data: bytes) -> tuple[str, list[str]] | None:
+    version, kind, etag_length, count = struct.unpack_from("!BBHH", data)
+    if version != cache_format_version or kind != _images_kind:
+        return None
+    offset = struct.calcsize("!BBHH")
+    etag = data[offset : offset + etag_length].decode()
+    offset += etag_length
+    images = []
+    for _ in range(count):
+        (length,) = struct.unpack_from("!I", data, offset)
+        offset += 4
+        images.append(base64.b64encode(data[offset : offset + length]).decode())
+        offset += length
+    return etag, images
+
+
+def encode_source(source: str) -> bytes:
+    """Pack page source, deflated when that makes it smaller."""
+    raw = source.encode()
+    compressed = zlib.compress(raw, 6)
+    if len(compressed) < len(raw):
+        return struct.pack("!BB", cache_format_version, _compressed_source_kind) + compressed
+    return struct.pack("!BB", cache_format_version, _source_kind) + raw
+
+
+def decode_source(data: bytes) -> str | None:
+    version, kind = struct.unpack_from("!BB", data)
+    if version != cache_format_version:
+        return None
+    if kind == _compressed_source_kind:
+        return zlib.decompress(data[2:]).decode()
+    if kind == _source_kind:
+        return data[2:].decode()
+    return None
+
+
+def size_aware_ttl(size: int, ttl: float, small_value_size: int = 256 * 1024, min_ttl: float = 60) -> float:
+    """
+    Shorten ``ttl`` for values larger than ``small_value_size`` in proportion to their size, so a few huge
+    renders cannot hold on to most of a shared cache.
+    """
+    if size <= small_value_size:
+        return ttl
+    return max(min(min_ttl, ttl), ttl * small_value_size / size)
+
+
+class RenderCache:
+    def __init__(
+        self,
+        backend: CacheBackend,
+        ttl: float = 3600,
+        source_ttl: float = 300,
+        max_value_size: int = 16 * 1024 * 1024,
+        logger=None,
+    ):
+        """
+        Captured images by render key, reused while the fingerprint of their target is unchanged, and recent
+        ``source`` results. Cache failures are logged and treated as misses.
+
+        :param backend: Where the values are stored, see :class:`MemoryCacheBackend` and :class:`RedisCacheBackend`.
+        :param ttl: Seconds to keep captured images, shortened for large values by :func:`size_aware_ttl`.
+        :param source_ttl: Seconds a ``source`` result is served without loading the page again.
+        :param max_value_size: Values larger than this many bytes are not cached.
+        """
+        self.backend = backend
+        self.ttl = ttl
+        self.source_ttl = source_ttl
+        self.max_value_size = max_value_size
+        self.logger = logger
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    async def _get(self, key: str) -> bytes | None:
+        try:
+            return await self.backend.get(key)
+        except Exception:
+            self.errors += 1
+            if self.logger:
+                self.logger.exception(f"Failed to read {self.backend.name} render cache:")
+            return None
+
+    async def _set(self, key: str, value: bytes, ttl: float):
+        if len(value) > self.max_value_size:
+            return
+        try:
+            await self.backend.set(key, value, size_aware_ttl(len(value), ttl))
+        except Exception:
+            self.errors += 1
+            if self.logger:
+                self.logger.exception(f"Failed to write {self.backend.name} render cache:")
+
+    def _decode(self, decode, data: bytes | None):
+        """Unpack a cached value with ``decode``. A corrupt or truncated value counts as an error and a miss."""
+        if not data:
+            return None
+        try:
+            return decode(data)
+        except (struct.error, zlib.error, UnicodeDecodeError):
+            self.errors += 1
+            if self.logger:
+                self.logger.warning(f"Ignoring an unreadable {self.backend.name} render cache value.")
+            return None
+
+    async def get(self, key: str, etag: str) -> list[str] | None:
+        data = await self._get("images:" + key)
+        entry = self._decode(decode_images, data)
+        if entry is None or entry[0] != etag:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1]
+
+    async def put(self, key: str, etag: str, images: list[str] | SliceBuffer):
+        if isinstance(images, SliceBuffer) and images.size > self.max_value_size:
+            return
+        await self._set("images:" + key, encode_images(etag, images), self.ttl)
+
+    async def get_source(self, key: str) -> str | None:
+        data = await self._get("source:" + key)
+        source = self._decode(decode_source, data)
+        if source is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return source
+
+    async def put_source(self, key: str, source: str):
+        if self.source_ttl:
+            await self._set("source:" + key, encode_source(source), self.source_ttl)
+
+    async def close(self):
+        await self.backend.close()
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            **self.backend.stats(),
+        }
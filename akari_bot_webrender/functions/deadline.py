@@ -0,0 +1,65 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from .exceptions import DeadlineExceeded
+
+request_deadline: ContextVar[float | None] = ContextVar("request_deadline", default=None)
+deadline_header = "X-WebRender-Timeout"
+
+
+def remaining_time() -> float | None:
+    """Seconds left before the current request deadline, or ``None`` when the request has no deadline."""
+    deadline = request_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def deadline_expired() -> bool:
+    remaining = remaining_time()
+    return remaining is not None and remaining <= 0
+
+
+def check_deadline():
+    if deadline_expired():
+        raise DeadlineExceeded
+
+
+@contextmanager
+def deadline_scope(timeout: float | None):
+    """Limit the current request to ``timeout`` seconds from now. An outer deadline is never extended."""
+    if timeout is None:
+        yield
+        return
+    deadline = time.monotonic() + timeout
+    current = request_deadline.get()
+    if current is not None:
+        deadline = min(deadline, current)
+    token = request_deadline.set(deadline)
+    try:
+        yield
+    finally:
+        request_deadline.reset(token)
+
+
+def playwright_timeout() -> dict:
+    """Keyword arguments that cap a Playwright call at the remaining request budget."""
+    remaining = remaining_time()
+    if remaining is None:
+        return {}
+    if remaining <= 0:
+        raise DeadlineExceeded
+    return {"timeout": remaining * 1000}
+
+
+async def with_deadline(awaitable):
+    """Await ``awaitable`` for at most the remaining request budget, for calls without a ``timeout`` option."""
+    remaining = remaining_time()
+    if remaining is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, max(remaining, 0))
+    except TimeoutError:
+        raise DeadlineExceeded from None
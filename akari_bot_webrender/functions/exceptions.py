@@ -4,3 +4,21 @@ class ElementNotFound(Exception):
 
 class RequiredURL(Exception):
     pass
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class ResourceLimitExceeded(Exception):
+    pass
+
+
+class ResponseTooLarge(Exception):
+    pass
+
+
+class NotModified(Exception):
+    def __init__(self, etag: str):
+        super().__init__(etag)
+        self.etag = etag
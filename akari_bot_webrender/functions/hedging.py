@@ -0,0 +1,46 @@
+from collections import deque
+
+from . import limiter
+
+
+class HedgePolicy:
+    def __init__(self, percentile: float = 0.95, initial_delay: float = 10, min_delay: float = 1, window: int = 100):
+        """
+        When to also send a request to the remote WebRender while the local render is still running. The delay is
+        a percentile of recent successful local render times per method, so only unusually slow renders are
+        hedged. A local render that loses to the remote counts with the time it ran until it was cancelled.
+
+        :param percentile: Percentile of local render times after which the remote is tried as well.
+        :param initial_delay: Delay in seconds until enough local render times are known.
+        :param min_delay: Lower bound of the delay in seconds.
+        :param window: Recent render times per method the percentile is computed over.
+        """
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.window = window
+        self.latencies: dict[str, deque[float]] = {}
+        self.requests = 0
+        self.hedged = 0
+        self.local_wins = 0
+        self.remote_wins = 0
+
+    def delay(self, method: str) -> float:
+        samples = self.latencies.get(method)
+        if not samples or len(samples) < 10:
+            return self.initial_delay
+        return max(self.min_delay, limiter.percentile(samples, self.percentile))
+
+    def record(self, method: str, latency: float):
+        self.latencies.setdefault(method, deque(maxlen=self.window)).append(latency)
+
+    def stats(self) -> dict:
+        return {
+            "percentile": self.percentile,
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "hedge_rate": self.hedged / self.requests if self.requests else 0,
+            "local_wins": self.local_wins,
+            "remote_wins": self.remote_wins,
+            "delays": {method: self.delay(method) for method in self.latencies},
+        }
@@ -0,0 +1,157 @@
+import asyncio
+import math
+import os
+import time
+from collections import deque
+
+from .deadline import with_deadline
+
+
+def host_load() -> tuple[float | None, float | None]:
+    """
+    CPU load (one minute load average per CPU) and the share of memory in use, as fractions. Either is ``None``
+    where it cannot be read.
+    """
+    cpu = None
+    try:
+        cpu = os.getloadavg()[0] / (os.cpu_count() or 1)
+    except OSError:
+        pass
+    memory = None
+    try:
+        with open("/proc/meminfo") as f:
+            info = {
+                line.split(":")[0]: int(line.split()[1])
+                for line in f
+                if line.split(":")[0] in {"MemTotal", "MemAvailable"}
+            }
+        memory = 1 - info["MemAvailable"] / info["MemTotal"]
+    except (OSError, KeyError, ValueError, ZeroDivisionError):
+        pass
+    return cpu, memory
+
+
+def percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class AdaptiveLimiter:
+    def __init__(
+        self,
+        max_limit: int = 16,
+        min_limit: int = 1,
+        initial_limit: int | None = None,
+        latency_target: float = 15,
+        cpu_threshold: float = 0.9,
+        memory_threshold: float = 0.9,
+        backoff: float = 0.7,
+        window: int = 50,
+        adjust_interval: float = 5,
+        load_probe=host_load,
+    ):
+        """
+        Additive-increase/multiplicative-decrease limit on concurrent renders. The limit grows by one while renders
+        are queueing and stay healthy, and shrinks by ``backoff`` when p95 render latency, host CPU or host memory
+        exceed their thresholds.
+
+        :param max_limit: Upper bound of the limit.
+        :param min_limit: Lower bound of the limit.
+        :param initial_limit: Starting limit, defaults to half of ``max_limit``.
+        :param latency_target: p95 render latency in seconds above which the limit shrinks.
+        :param cpu_threshold: Load average per CPU above which the limit shrinks.
+        :param memory_threshold: Share of host memory in use above which the limit shrinks.
+        :param backoff: Factor applied to the limit when backing off.
+        :param window: Recent render latencies the p95 is computed over.
+        :param adjust_interval: Minimum seconds between two adjustments.
+        :param load_probe: Returns the CPU and memory load as fractions, see :func:`host_load`.
+        """
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = initial_limit or max(min_limit, max_limit // 2)
+        self.latency_target = latency_target
+        self.cpu_threshold = cpu_threshold
+        self.memory_threshold = memory_threshold
+        self.backoff = backoff
+        self.adjust_interval = adjust_interval
+        self.load_probe = load_probe
+        self.latencies: deque[float] = deque(maxlen=window)
+        self.decisions: deque[dict] = deque(maxlen=20)
+        self.in_flight = 0
+        self.waiting = 0
+        self.increases = 0
+        self.decreases = 0
+        self.peak_waiting = 0
+        self._last_adjust = time.monotonic()
+        self._condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._condition:
+            if self.in_flight >= self.limit:
+                self.waiting += 1
+                self.peak_waiting = max(self.peak_waiting, self.waiting)
+                try:
+                    await with_deadline(self._condition.wait_for(lambda: self.in_flight < self.limit))
+                finally:
+                    self.waiting -= 1
+            self.in_flight += 1
+
+    async def release(self, latency: float | None = None):
+        """Free a slot, recording the render's duration unless it was abandoned."""
+        async with self._condition:
+            self.in_flight -= 1
+            if latency is not None:
+                self.latencies.append(latency)
+            self.maybe_adjust()
+            self._condition.notify(max(0, self.limit - self.in_flight))
+
+    def maybe_adjust(self):
+        now = time.monotonic()
+        if now - self._last_adjust < self.adjust_interval or len(self.latencies) < 5:
+            return
+        self._last_adjust = now
+        p95 = percentile(self.latencies, 0.95)
+        cpu, memory = self.load_probe()
+        reason = None
+        if p95 > self.latency_target:
+            reason = f"p95 latency {p95:.1f}s"
+        elif cpu is not None and cpu > self.cpu_threshold:
+            reason = f"cpu load {cpu:.2f}"
+        elif memory is not None and memory > self.memory_threshold:
+            reason = f"memory usage {memory:.0%}"
+
+        if reason:
+            new_limit = max(self.min_limit, math.floor(self.limit * self.backoff))
+            action = "decrease"
+        elif self.waiting and self.limit < self.max_limit:
+            new_limit = self.limit + 1
+            action = "increase"
+            reason = f"{self.waiting} renders queued"
+        else:
+            return
+        if new_limit == self.limit:
+            return
+        if action == "increase":
+            self.increases += 1
+        else:
+            self.decreases += 1
+        self.decisions.append(
+            {"time": time.time(), "action": action, "limit": new_limit, "previous": self.limit, "reason": reason}
+        )
+        self.limit = new_limit
+        # Judge the new limit by the renders that ran under it.
+        self.latencies.clear()
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "peak_waiting": self.peak_waiting,
+            "p95_latency": percentile(self.latencies, 0.95) if self.latencies else None,
+            "increases": self.increases,
+            "decreases": self.decreases,
+            "recent_decisions": list(self.decisions),
+        }
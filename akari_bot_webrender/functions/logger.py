@@ -1,8 +1,19 @@
+import random
 import sys
 import traceback
+from contextlib import contextmanager
+from contextvars import ContextVar
 from pathlib import Path
+from typing import Literal
+from urllib.parse import urlsplit, urlunsplit
 
 from loguru import logger
+from pydantic import BaseModel
+
+# Whether the per-request log lines of the current request are written, see :func:`request_log_scope`.
+request_log_sampled: ContextVar[bool] = ContextVar("request_log_sampled", default=True)
+# Options holding page payloads, logged by size only.
+redacted_options = {"content", "css"}
 
 
 def basic_logger_format():
@@ -14,8 +25,66 @@ def basic_logger_format():
     )
 
 
+def _redact_url(url: str) -> str:
+    parts = urlsplit(url)
+    if not parts.username and not parts.password:
+        return url
+    return urlunsplit(parts._replace(netloc=parts.hostname + (f":{parts.port}" if parts.port else "")))
+
+
+class OptionsSummary:
+    def __init__(self, options, max_length: int = 120):
+        """
+        Request options as a short log string. Page payloads are replaced by their length, URL credentials are
+        removed and other long values are truncated. Nothing is computed unless the message is actually written.
+        """
+        self.options = options
+        self.max_length = max_length
+
+    def __format__(self, format_spec: str) -> str:
+        return format(str(self), format_spec)
+
+    def __str__(self) -> str:
+        if not isinstance(self.options, BaseModel):
+            text = str(self.options)
+            return text if len(text) <= self.max_length else f"{text[: self.max_length]}…"
+        values = self.options.model_dump(exclude_defaults=True)
+        items = []
+        for name, value in values.items():
+            if name in redacted_options and isinstance(value, str):
+                text = f"<{len(value)} chars>"
+            else:
+                text = _redact_url(value) if name == "url" and isinstance(value, str) else repr(value)
+                if len(text) > self.max_length:
+                    text = f"{text[: self.max_length]}…(+{len(text) - self.max_length} chars)"
+            items.append(f"{name}={text}")
+        return " ".join(items)
+
+
+@contextmanager
+def request_log_scope(sample_rate: float = 1.0):
+    """Decide once whether the per-request log lines of this request are written, keeping them all or none."""
+    token = request_log_sampled.set(sample_rate >= 1 or random.random() < sample_rate)
+    try:
+        yield
+    finally:
+        request_log_sampled.reset(token)
+
+
 class LoggingLogger:
-    def __init__(self, debug: bool = False, logs_path: str | Path | None = None):
+    def __init__(
+        self,
+        debug: bool = False,
+        logs_path: str | Path | None = None,
+        log_mode: Literal["default", "production"] = "default",
+        log_sample_rate: float = 1.0,
+    ):
+        """
+        :param log_mode: ``production`` writes through background queues, so logging never blocks the event loop
+            on stdout or disk, and only writes the per-request lines of a ``log_sample_rate`` share of requests.
+        :param log_sample_rate: Share of requests whose per-request lines are written in ``production`` mode.
+            Warnings and errors are always written.
+        """
         try:
             logger.remove(0)
         except ValueError:
@@ -32,12 +101,16 @@ class LoggingLogger:
         self.critical = self.log.critical
         self.debug_flag = debug
         self.log_path = logs_path
+        self.log_mode = log_mode
+        self.sample_rate = log_sample_rate if log_mode == "production" else 1.0
+        enqueue = log_mode == "production"
 
         self.log.add(
             sys.stdout,
             format=basic_logger_format(),
             level="DEBUG" if debug else "INFO",
             colorize=True,
+            enqueue=enqueue,
             filter=lambda record: record["extra"].get("name") == "WebRender",
         )
 
@@ -50,6 +123,7 @@ class LoggingLogger:
                 level="DEBUG",
                 filter=lambda record: record["level"].name == "DEBUG" and record["extra"].get("name") == "WebRender",
                 encoding="utf8",
+                enqueue=enqueue,
             )
             self.log.add(
                 sink=Path(self.log_path) / "WebRender_{time:YYYY-MM-DD}.log",
@@ -58,11 +132,24 @@ class LoggingLogger:
                 retention="10 days",
                 level="INFO",
                 encoding="utf8",
+                enqueue=enqueue,
                 filter=lambda record: record["extra"].get("name") == "WebRender",
             )
         if debug:
             self.log.debug("Debug mode is enabled.")
 
+    def request_info(self, message: str, *args):
+        """
+        Log a per-request line, skipped for requests outside the sample. ``args`` are formatted into ``message``
+        only when the line is written.
+        """
+        if request_log_sampled.get():
+            self.log.opt(depth=1).info(message, *args)
+
+    def request_debug(self, message: str, *args):
+        if request_log_sampled.get():
+            self.log.opt(depth=1).debug(message, *args)
+
     def exception(self, message: str | None = None):
         if message:
             self.error(f"{message}\n{traceback.format_exc()}")
@@ -1,20 +1,61 @@
+from __future__ import annotations
+
+import asyncio
 import base64
+import hashlib
 import math
 import time
-from contextlib import asynccontextmanager
+from contextlib import AsyncExitStack, asynccontextmanager, nullcontext
 from contextvars import ContextVar
 from functools import wraps
 from pathlib import Path
-from typing import Literal
+from typing import TYPE_CHECKING, Literal
 
 import httpx
 import orjson as json
-from jinja2 import Environment, FileSystemLoader
-from playwright.async_api import ElementHandle, FloatRect, Page
 
-from ..constants import base_height, base_width, elements_to_disable, max_screenshot_height, templates_path
+from ..constants import (
+    base_height,
+    base_user_agent,
+    base_width,
+    browser_user_agent,
+    elements_to_disable,
+    max_screenshot_height,
+)
 from .browser import Browser
-from .exceptions import ElementNotFound, RequiredURL
+from .budget import PageBudget, ResourceBudget, budget_limits, budget_scope, request_budget
+from .cache import (
+    CacheBackend,
+    ConditionalRender,
+    MemoryCacheBackend,
+    RenderCache,
+    conditional_render,
+    conditional_scope,
+    render_cache_key,
+    render_etag,
+)
+from .deadline import (
+    check_deadline,
+    deadline_expired,
+    deadline_header,
+    deadline_scope,
+    playwright_timeout,
+    remaining_time,
+    with_deadline,
+)
+from .exceptions import (
+    DeadlineExceeded,
+    ElementNotFound,
+    NotModified,
+    RequiredURL,
+    ResourceLimitExceeded,
+    ResponseTooLarge,
+)
+from .hedging import HedgePolicy
+from .limiter import AdaptiveLimiter
+from .logger import OptionsSummary, request_log_scope
+from .multiplex import MultiplexClient, report_progress, websocket_path
+from .metrics import PageMetricsRecorder, collect_page_metrics, metrics_host, render_prometheus
 from .options import (
     ElementScreenshotOptions,
     LegacyScreenshotOptions,
@@ -24,12 +65,17 @@ from .options import (
     SourceOptions,
     StatusOptions,
 )
+from .prerender import Prerenderer
+from .raw_stream import RawStream, cookies_to_jar, open_http_stream, raw_stream_timeout, upstream_status_header
+from .shm import import_slices, slice_transport_header
+from .slices import SliceBuffer, slice_spill
+from .snapshots import PageLoad, PageSnapshotCache, page_snapshot_key
+from .throttle import HostThrottle
+from .tracing import TraceRecorder
+from .templates import content_style_tag, read_template, template_env
 
-env = Environment(loader=FileSystemLoader(templates_path), autoescape=True, enable_async=True)
-custom_css = (templates_path / "custom.css").read_text(encoding="utf-8")
-add_count_box_script = (templates_path / "add_count_box.js").read_text(encoding="utf-8")
-element_screenshot_script = (templates_path / "element_screenshot_evaluate.js").read_text(encoding="utf-8")
-section_screenshot_script = (templates_path / "section_screenshot_evaluate.js").read_text(encoding="utf-8")
+if TYPE_CHECKING:
+    from playwright.async_api import ElementHandle, Page
 
 remote_endpoints = {
     "legacy_screenshot": "legacy_screenshot",
@@ -41,41 +87,145 @@ remote_endpoints = {
     "status": "status",
 }
 remote_fallback_hop = ContextVar("remote_fallback_hop", default=0)
+# Mixed-script sample content, so warm-up also loads the CJK and Latin fonts used by real renders.
+warmup_content = "<p>AkariBot WebRender 预热 · warm-up · ウォームアップ</p>"
 remote_fallback_header = "X-WebRender-Fallback-Hop"
+# Exceptions that describe the request itself rather than a local failure, so retrying remotely cannot help.
+passthrough_exceptions = (DeadlineExceeded, ResourceLimitExceeded, NotModified)
+# Methods whose images are fingerprinted, so they can be revalidated and served from the render cache.
+conditional_methods = {"legacy_screenshot", "page_screenshot", "element_screenshot", "section_screenshot"}
+prerender_methods = conditional_methods | {"source"}
 
 
 def webrender_fallback(func):
     @wraps(func)
     async def wrapper(self, options=None):
-        remote_endpoint = remote_endpoints.get(func.__name__, func.__name__)
+        with (
+            deadline_scope(getattr(options, "timeout", None)),
+            conditional_scope() as conditional,
+            request_log_scope(self.logger.sample_rate),
+            budget_scope(self.resource_budget.for_request(options)),
+        ):
+            conditional.key = render_cache_key(func.__name__, options) if func.__name__ in conditional_methods else None
+            if self.prerenderer and not conditional.refresh and func.__name__ in prerender_methods:
+                self.prerenderer.record(func.__name__, options)
+            result = await _call_with_fallback(self, func, options)
+            if result is None:
+                check_deadline()
+            return result
 
-        if self.remote_only:
-            if not self.remote_webrender_url:
-                self.logger.error("Remote-only mode is enabled, but no remote WebRender URL is configured.")
-                return None
-            self.logger.info("Local WebRender is disabled, using remote WebRender only.")
-            return await self._request_remote(remote_endpoint, options)
+    return wrapper
 
-        if not await self.browser.check_status():
-            self.logger.warning("WebRender browser is not initialized.")
-            if self.remote_webrender_url:
-                return await self._request_remote(remote_endpoint, options)
+
+async def _call_with_fallback(self, func, options=None):
+    remote_endpoint = remote_endpoints.get(func.__name__, func.__name__)
+
+    if self.remote_only:
+        if not self.remote_webrender_url:
+            self.logger.error("Remote-only mode is enabled, but no remote WebRender URL is configured.")
             return None
+        self.logger.request_info("Local WebRender is disabled, using remote WebRender only.")
+        return await self._request_remote(remote_endpoint, options)
 
-        try:
-            self.logger.info(func.__name__ + " function called with options: " + str(options))
-            result = await func(self, options)
-            if result is not None:
-                return result
-            self.logger.warning(f"Local WebRender returned no result for {func.__name__}.")
-        except Exception:
-            self.logger.exception(f"WebRender processing failed with options: {options}:")
+    # Background refreshes only keep this node's cache warm, so they never hand the render to the remote.
+    conditional = conditional_render.get()
+    use_remote = bool(self.remote_webrender_url) and not (conditional and conditional.refresh)
 
-        if self.remote_webrender_url:
+    if not await self.browser.check_status():
+        self.logger.warning("WebRender browser is not initialized.")
+        if use_remote:
             return await self._request_remote(remote_endpoint, options)
         return None
 
-    return wrapper
+    if self.hedge_policy and use_remote and remote_fallback_hop.get() == 0 and func.__name__ != "status":
+        return await _call_hedged(self, func, remote_endpoint, options)
+
+    try:
+        self.logger.request_info("{} function called with options: {}", func.__name__, OptionsSummary(options))
+        result = await func(self, options)
+        if result is not None:
+            return result
+        self.logger.warning(f"Local WebRender returned no result for {func.__name__}.")
+    except passthrough_exceptions:
+        raise
+    except Exception:
+        if deadline_expired():
+            raise DeadlineExceeded from None
+        self.logger.exception(f"WebRender processing failed with options: {OptionsSummary(options)}:")
+
+    if use_remote:
+        return await self._request_remote(remote_endpoint, options)
+    return None
+
+
+def close_discarded_capture(task: asyncio.Task):
+    """Delete the temporary file of a spilled capture whose render finished after it was no longer needed."""
+    if not task.cancelled() and task.exception() is None and isinstance(task.result(), SliceBuffer):
+        task.result().close()
+
+
+async def _call_hedged(self, func, remote_endpoint: str, options=None):
+    """
+    Render locally, and also ask the remote WebRender once the local render takes longer than the hedge delay.
+    Returns the first result and cancels the other request.
+    """
+    policy = self.hedge_policy
+    policy.requests += 1
+    started = time.monotonic()
+    self.logger.request_info("{} function called with options: {}", func.__name__, OptionsSummary(options))
+    local = asyncio.create_task(func(self, options))
+
+    def record_local(task: asyncio.Task):
+        # Every local render that completes counts, including one that loses to the remote after it was hedged.
+        if not task.cancelled() and task.exception() is None and task.result() is not None:
+            policy.record(func.__name__, time.monotonic() - started)
+
+    local.add_done_callback(record_local)
+    remote = None
+    try:
+        delay = policy.delay(func.__name__)
+        done, _pending = await asyncio.wait({local}, timeout=delay)
+        if not done:
+            policy.hedged += 1
+            self.logger.request_info(
+                "Local {} is slower than {:.1f}s, hedging to remote WebRender.", func.__name__, delay
+            )
+            remote = asyncio.create_task(self._request_remote(remote_endpoint, options))
+            done, _pending = await asyncio.wait({local, remote}, return_when=asyncio.FIRST_COMPLETED)
+            if local not in done and remote.result() is not None:
+                policy.remote_wins += 1
+                # The local render is cancelled below but has run at least this long. Leaving it out would pull
+                # the delay down to the renders fast enough to win, and hedge ever more of them.
+                local.remove_done_callback(record_local)
+                policy.record(func.__name__, time.monotonic() - started)
+                local.add_done_callback(close_discarded_capture)
+                return remote.result()
+
+        try:
+            result = await local
+        except passthrough_exceptions:
+            raise
+        except Exception:
+            if deadline_expired():
+                raise DeadlineExceeded from None
+            self.logger.exception(f"WebRender processing failed with options: {OptionsSummary(options)}:")
+            result = None
+        if result is not None:
+            if remote:
+                policy.local_wins += 1
+            return result
+
+        self.logger.warning(f"Local WebRender returned no result for {func.__name__}.")
+        if remote is None:
+            return await self._request_remote(remote_endpoint, options)
+        result = await remote
+        if result is not None:
+            policy.remote_wins += 1
+        return result
+    finally:
+        for task in (local, remote):
+            if task and not task.done():
+                task.cancel()
 
 
 class WebRender:
@@ -92,6 +242,49 @@ class WebRender:
         headless: bool | None = None,
         keep_pages_open: bool | None = None,
         remote_timeout: float = 30,
+        watchdog_interval: float = 0,
+        recycle_after_pages: int = 0,
+        recycle_memory_mb: float = 0,
+        page_metrics: bool = False,
+        raw_max_size: int = 0,
+        storage_state_path: str | Path | None = None,
+        storage_state_interval: float = 300,
+        render_cache_size: int = 0,
+        render_cache_max_bytes: int = 256 * 1024 * 1024,
+        cache_backend: CacheBackend | None = None,
+        cache_ttl: float = 3600,
+        source_cache_ttl: float = 300,
+        log_mode: Literal["default", "production"] = "default",
+        log_sample_rate: float = 1.0,
+        remote_uds_path: str | Path | None = None,
+        remote_shm_path: str | Path | None = None,
+        remote_shm_handover: bool = False,
+        prerender_top_k: int = 0,
+        prerender_interval: float = 60,
+        max_concurrency: int = 0,
+        render_latency_target: float = 15,
+        hedge_percentile: float = 0,
+        hedge_initial_delay: float = 10,
+        page_snapshot_ttl: float = 0,
+        page_snapshot_max_bytes: int = 64 * 1024 * 1024,
+        remote_transport: Literal["http", "websocket"] = "http",
+        host_rate: float = 0,
+        host_burst: int = 5,
+        host_max_concurrency: int = 0,
+        host_limits: dict[str, dict] | None = None,
+        trace_path: str | Path | None = None,
+        trace_sample_rate: float = 0.05,
+        trace_slow_threshold: float = 20,
+        slice_memory_threshold: int = 32 * 1024 * 1024,
+        slice_spill_path: str | Path | None = None,
+        launch_profile: str = "default",
+        max_page_bytes: int = 0,
+        max_page_requests: int = 0,
+        max_dom_nodes: int = 0,
+        max_js_heap_mb: float = 0,
+        max_capture_height: int = 0,
+        on_budget_exceeded: Literal["fail", "partial"] = "fail",
+        page_max_age: float = 0,
     ):
         """
         :param debug: Enable debug logging. For backward compatibility, it also enables headed mode and keeps pages open
@@ -99,11 +292,92 @@ class WebRender:
         :param headless: Run the browser without a visible window. Defaults to the inverse of ``debug``.
         :param keep_pages_open: Keep rendered pages open after requests. Defaults to ``debug``.
         :param remote_timeout: Timeout in seconds for requests to the remote WebRender service.
+        :param remote_uds_path: Reach the remote WebRender through this Unix domain socket instead of TCP, for a
+            service on the same host. ``remote_webrender_url`` then defaults to ``http://localhost/`` and only
+            supplies the path and ``Host`` header.
+        :param remote_transport: ``websocket`` sends all requests to the remote WebRender over one multiplexed
+            WebSocket connection instead of an HTTP request each, see :class:`MultiplexClient`. Raw streams always
+            use HTTP.
+        :param remote_shm_path: Directory the remote WebRender writes handed-over slices to, defaults to
+            ``/dev/shm/akari-bot-webrender``.
+        :param remote_shm_handover: Ask the remote WebRender behind ``remote_uds_path`` to hand large screenshot
+            slices over as files in ``remote_shm_path`` instead of inline. Only when both share that directory,
+            i.e. not across containers with separate ``/dev/shm``.
+        :param prerender_top_k: Keep the cached results of this many of the most requested screenshots and sources
+            fresh by re-rendering them in the background while the browser is idle, ``0`` disables it. Requires
+            the render cache. Start it with ``prerenderer.start()``.
+        :param prerender_interval: Seconds between background pre-rendering rounds.
+        :param max_concurrency: Upper bound of an adaptive limit on concurrent renders, ``0`` disables the limit.
+            The limit grows while renders queue and stay healthy, and backs off when p95 render latency exceeds
+            ``render_latency_target`` or the host runs short of CPU or memory.
+        :param render_latency_target: p95 render latency in seconds the concurrency limit aims to stay under.
+        :param hedge_percentile: Also send a request to the remote WebRender once the local render is slower than
+            this percentile of recent local renders, and return whichever result arrives first. ``0`` disables
+            hedging, so the remote is only used after the local render failed.
+        :param hedge_initial_delay: Seconds before hedging while too few local render times are known.
+        :param page_snapshot_ttl: Seconds to keep a DOM snapshot of each page navigated for an element or section
+            screenshot, so further element and section requests for the same URL and context restore it instead of
+            loading the page again. ``0`` disables it.
+        :param page_snapshot_max_bytes: Total size of the snapshots to keep.
+        :param host_rate: Navigations and fetches per second to each target host, ``0`` means no rate limit.
+        :param host_burst: Requests a host may receive at once after being idle.
+        :param host_max_concurrency: Concurrent navigations and fetches to each target host, ``0`` means no limit.
+        :param host_limits: Per-domain overrides of the three settings above, see :class:`HostThrottle`.
+        :param trace_path: Record Playwright traces of a sample of renders and keep those of failed or slow renders
+            in this directory, see :class:`TraceRecorder`. Disabled when unset.
+        :param trace_sample_rate: Share of renders to trace.
+        :param trace_slow_threshold: Seconds after which the trace of a successful render is kept.
+        :param slice_memory_threshold: Bytes of screenshot slices a capture taken inside
+            :func:`~akari_bot_webrender.functions.slices.spill_scope` keeps in memory. Longer captures move their
+            slices to a temporary file and are returned as a :class:`SliceBuffer` instead of a list, ``0`` keeps
+            every capture in memory. Captures taken outside of the scope are always kept in memory.
+        :param slice_spill_path: Directory for the temporary files, defaults to the system temporary directory.
+        :param launch_profile: Chromium launch profile, ``default``, ``low-memory`` or ``throughput``, see
+            :data:`launch_profiles`.
+        :param max_page_bytes: Bytes a page may receive before it is stopped loading, ``0`` means no limit.
+        :param max_page_requests: Requests a page may make before it is stopped loading, ``0`` means no limit.
+        :param max_dom_nodes: DOM nodes a loaded page may have, ``0`` means no limit.
+        :param max_js_heap_mb: JS heap a loaded page may use, ``0`` means no limit.
+        :param max_capture_height: Height in CSS pixels a capture may have, ``0`` means no limit.
+        :param on_budget_exceeded: ``fail`` aborts a render over one of the limits above with
+            :class:`ResourceLimitExceeded`, ``partial`` renders what loaded, cut at ``max_capture_height``. Requests
+            may set stricter limits and choose the behaviour themselves, see :class:`ResourceBudget`.
+        :param page_max_age: Close pages that stayed open for longer than this many seconds after their request
+            released them, e.g. with ``keep_pages_open``, ``0`` keeps them. See :meth:`Browser.reap_pages`.
+        :param watchdog_interval: Seconds between browser health probes, ``0`` disables the watchdog. The watchdog
+            relaunches a crashed or unresponsive browser and recycles it according to the limits below.
+        :param recycle_after_pages: Gracefully recycle the browser after this many pages, ``0`` disables the limit.
+        :param recycle_memory_mb: Gracefully recycle the browser once its processes use more memory than this,
+            ``0`` disables the limit.
+        :param page_metrics: Collect JS heap, DOM node and timing metrics of every rendered page over CDP and
+            aggregate them per target host. Only supported on Chromium.
+        :param raw_max_size: Largest body in bytes that :meth:`get_raw_stream` will relay, ``0`` means no limit.
+            Requests may lower it with ``max_size``.
+        :param storage_state_path: Directory to persist cookies and local storage per site, so solved challenges
+            survive restarts. Enabling it gives every site its own browser contexts.
+        :param storage_state_interval: Seconds between periodic saves of the per-site storage state.
+        :param render_cache_size: Screenshots to keep and serve again while the ETag/Last-Modified of the page or
+            the HTML of the captured element is unchanged, ``0`` disables the cache. Revalidation with
+            ``If-None-Match`` works either way, see :func:`conditional_scope`.
+        :param render_cache_max_bytes: Total size of the screenshots kept by the in-process render cache.
+        :param cache_backend: Store the render cache here instead of in process memory, e.g. a
+            :class:`RedisCacheBackend` shared by several WebRender nodes. Overrides ``render_cache_size``.
+        :param cache_ttl: Seconds to keep cached screenshots. Large values expire sooner.
+        :param source_cache_ttl: Seconds to serve a cached ``source`` result without loading the page, ``0``
+            disables caching of ``source``.
+        :param log_mode: ``production`` writes logs through background queues and samples per-request log lines.
+        :param log_sample_rate: Share of requests whose per-request log lines are written in ``production`` mode.
+            Warnings and errors are always written.
         """
         self.debug = debug
         self.headless = not debug if headless is None else headless
         self.keep_pages_open = debug if keep_pages_open is None else keep_pages_open
         self.remote_webrender_url = None
+        self.remote_uds_path = str(remote_uds_path) if remote_uds_path else None
+        self.remote_shm_path = remote_shm_path
+        self.remote_shm_handover = remote_shm_handover
+        if self.remote_uds_path and not (remote_webrender_url and remote_webrender_url.strip()):
+            remote_webrender_url = "http://localhost/"
         if remote_webrender_url and remote_webrender_url.strip():
             parsed_remote_url = httpx.URL(remote_webrender_url.strip())
             if parsed_remote_url.scheme not in {"http", "https"} or not parsed_remote_url.host:
@@ -113,6 +387,8 @@ class WebRender:
             remote_raw_path = parsed_remote_url.raw_path.rstrip(b"/") + b"/"
             self.remote_webrender_url = str(parsed_remote_url.copy_with(raw_path=remote_raw_path))
         self.remote_only = remote_only
+        if remote_transport not in {"http", "websocket"}:
+            raise ValueError("remote_transport must be http or websocket")
         self.remote_timeout = float(remote_timeout)
         if not math.isfinite(self.remote_timeout) or self.remote_timeout <= 0:
             raise ValueError("remote_timeout must be a finite number greater than zero")
@@ -125,46 +401,181 @@ class WebRender:
                 self.logs_path = (Path(__file__).parent.parent.parent / "logs").resolve()
         if name:
             self.name = name
+        self.started_at = time.monotonic()
+        self.first_render_seconds: float | None = None
+        self.warmup_seconds: float | None = None
+        self.page_metrics = page_metrics
+        self.raw_max_size = raw_max_size
+        self.page_metrics_recorder = PageMetricsRecorder()
+        self.slice_memory_threshold = slice_memory_threshold
+        self.slice_spill_path = slice_spill_path
+        self.spilled_captures = 0
+        if on_budget_exceeded not in {"fail", "partial"}:
+            raise ValueError("on_budget_exceeded must be fail or partial")
+        self.resource_budget = ResourceBudget(on_budget_exceeded=on_budget_exceeded).tighten(
+            max_page_bytes=max_page_bytes,
+            max_page_requests=max_page_requests,
+            max_dom_nodes=max_dom_nodes,
+            max_js_heap_mb=max_js_heap_mb,
+            max_capture_height=max_capture_height,
+        )
+        self.page_budgets: dict[Page, PageBudget] = {}
+        self.budget_exceeded = dict.fromkeys(budget_limits, 0)
+        if cache_backend is None and render_cache_size:
+            cache_backend = MemoryCacheBackend(render_cache_size, render_cache_max_bytes)
+        self.render_cache = None
+        self.not_modified_responses = 0
+        self.active_renders = 0
+        self.limiter = (
+            AdaptiveLimiter(max_limit=max_concurrency, latency_target=render_latency_target)
+            if max_concurrency
+            else None
+        )
+        self.prerenderer = None
+        self.page_snapshots = (
+            PageSnapshotCache(ttl=page_snapshot_ttl, max_bytes=page_snapshot_max_bytes) if page_snapshot_ttl else None
+        )
+        self.host_throttle = None
+        if host_rate or host_max_concurrency or host_limits:
+            self.host_throttle = HostThrottle(
+                rate=host_rate, burst=host_burst, max_concurrency=host_max_concurrency, hosts=host_limits
+            )
+        self.hedge_policy = (
+            HedgePolicy(percentile=hedge_percentile, initial_delay=hedge_initial_delay) if hedge_percentile else None
+        )
 
         self.browser = Browser(
             debug=debug,
             export_logs=export_logs,
             logs_path=self.logs_path,
             headless=self.headless,
+            watchdog_interval=watchdog_interval,
+            recycle_after_pages=recycle_after_pages,
+            recycle_memory_mb=recycle_memory_mb,
+            storage_state_path=storage_state_path,
+            storage_state_interval=storage_state_interval,
+            log_mode=log_mode,
+            log_sample_rate=log_sample_rate,
+            launch_profile=launch_profile,
+            page_max_age=page_max_age,
         )
         self.browser_init = self.browser.browser_init
-        self.browser_close = self.browser.close
         self.logger = self.browser.logger
+        self.multiplex_client = None
+        if remote_transport == "websocket" and self.remote_webrender_url:
+            remote_url = httpx.URL(self.remote_webrender_url + websocket_path)
+            self.multiplex_client = MultiplexClient(
+                str(remote_url.copy_with(scheme="wss" if remote_url.scheme == "https" else "ws")),
+                uds_path=self.remote_uds_path,
+                logger=self.logger,
+            )
+        self.trace_recorder = (
+            TraceRecorder(
+                trace_path, sample_rate=trace_sample_rate, slow_threshold=trace_slow_threshold, logger=self.logger
+            )
+            if trace_path
+            else None
+        )
+        if cache_backend is not None:
+            self.render_cache = RenderCache(
+                cache_backend, ttl=cache_ttl, source_ttl=source_cache_ttl, logger=self.logger
+            )
+            if prerender_top_k:
+                self.prerenderer = Prerenderer(self, top_k=prerender_top_k, interval=prerender_interval)
 
-    async def _request_remote(self, endpoint: str, options=None):
-        if not self.remote_webrender_url:
-            return None
+    async def browser_close(self):
+        if self.prerenderer:
+            await self.prerenderer.stop()
+        await self.browser.close()
+        if self.multiplex_client:
+            await self.multiplex_client.close()
+        if self.render_cache:
+            await self.render_cache.close()
 
+    def _remote_request_settings(self) -> tuple[float, dict] | None:
+        """Timeout and headers for a request to the remote WebRender, or ``None`` if it must not be sent."""
         current_hop = remote_fallback_hop.get()
         if current_hop >= 1:
             self.logger.error("Remote WebRender fallback limit reached; refusing to forward the request again.")
             return None
 
+        timeout = self.remote_timeout
+        headers = {remote_fallback_header: str(current_hop + 1)}
+        remaining = remaining_time()
+        if remaining is not None:
+            if remaining <= 0:
+                self.logger.warning("Request deadline exceeded; skipping remote WebRender.")
+                return None
+            timeout = min(timeout, remaining)
+            headers[deadline_header] = f"{remaining:.3f}"
+        return timeout, headers
+
+    def _remote_transport_options(self) -> dict:
+        if self.remote_uds_path:
+            return {"transport": httpx.AsyncHTTPTransport(uds=self.remote_uds_path)}
+        return {}
+
+    def _remote_endpoint_url(self, endpoint: str) -> str:
         remote_url = f"{self.remote_webrender_url}{endpoint}/"
+        safe_remote_url = httpx.URL(remote_url).copy_with(
+            username=None,
+            password=None,
+            query=None,
+            fragment=None,
+        )
+        self.logger.request_info("Trying remote WebRender: {}", safe_remote_url)
+        return remote_url
+
+    async def _request_remote(self, endpoint: str, options=None):
+        if not self.remote_webrender_url:
+            return None
+
+        settings = self._remote_request_settings()
+        if settings is None:
+            return None
+        timeout, headers = settings
+        conditional = conditional_render.get()
+        if conditional and not conditional.key:
+            conditional = None
+        if conditional and conditional.if_none_match:
+            headers["If-None-Match"] = conditional.if_none_match
+        if self.remote_uds_path and self.remote_shm_handover and conditional:
+            headers[slice_transport_header] = "shm"
+
         payload = options.model_dump(mode="json", exclude_none=True) if options is not None else {}
         try:
-            safe_remote_url = httpx.URL(remote_url).copy_with(
-                username=None,
-                password=None,
-                query=None,
-                fragment=None,
-            )
-            self.logger.info(f"Trying remote WebRender: {safe_remote_url}")
-            async with httpx.AsyncClient(timeout=self.remote_timeout, follow_redirects=True) as client:
-                resp = await client.post(
-                    remote_url,
-                    json=payload,
-                    headers={remote_fallback_header: str(current_hop + 1)},
+            remote_url = self._remote_endpoint_url(endpoint)
+            if self.multiplex_client:
+                reply = await self.multiplex_client.request(
+                    endpoint,
+                    payload,
+                    timeout,
+                    hop=int(headers[remote_fallback_header]),
+                    deadline=float(headers[deadline_header]) if deadline_header in headers else None,
+                    if_none_match=headers.get("If-None-Match"),
                 )
-            if resp.status_code != 200:
-                self.logger.error(f"Remote WebRender failed: {resp.text}, status code: {resp.status_code}")
+                status_code, etag, detail = reply.get("status"), reply.get("etag"), reply.get("detail")
+            else:
+                async with httpx.AsyncClient(
+                    timeout=timeout, follow_redirects=True, **self._remote_transport_options()
+                ) as client:
+                    resp = await client.post(remote_url, json=payload, headers=headers)
+                status_code, etag, detail = resp.status_code, resp.headers.get("etag"), resp.text
+            if status_code == 304 and conditional:
+                raise NotModified(etag or conditional.if_none_match)
+            if status_code != 200:
+                self.logger.error(f"Remote WebRender failed: {detail}, status code: {status_code}")
                 return None
-            return json.loads(resp.read())
+            if conditional:
+                conditional.etag = etag
+            if self.multiplex_client:
+                return reply.get("content")
+            result = json.loads(resp.read())
+            if slice_transport_header in headers and isinstance(result, list):
+                result = await asyncio.to_thread(import_slices, result, self.remote_shm_path)
+            return result
+        except NotModified:
+            raise
         except Exception:
             self.logger.exception("Remote WebRender processing failed:")
             return None
@@ -181,26 +592,230 @@ class WebRender:
         stealth=True,
         wait_until: Literal["commit", "domcontentloaded", "load", "networkidle"] = "networkidle",
         wait_after_load: int = 0,
+        max_dom_nodes: int | None = None,
+        max_js_heap_mb: float | None = None,
+        reuse_snapshot: bool = False,
+        context_url: str | None = None,
     ):
+        """
+        :param max_dom_nodes: Tightens the request's :class:`ResourceBudget`, as does ``max_js_heap_mb``.
+        :param reuse_snapshot: Restore ``url`` from a recent snapshot of the same page and context if there is one,
+            and take a snapshot after navigating otherwise. Only for renders that do not depend on the page's
+            scripts running again, see :class:`PageSnapshotCache`.
+        :param context_url: Open the page in the browser context of this URL's site without navigating to it, for
+            callers that navigate themselves. Defaults to ``url``.
+        """
+        context_url = context_url or url
         page = None
+        page_budget = None
+        budget = request_budget.get().tighten(max_dom_nodes=max_dom_nodes, max_js_heap_mb=max_js_heap_mb)
         if self.browser:
+            if self.limiter:
+                await self.limiter.acquire()
+            slot_started = time.monotonic()
+            cancelled = False
+            failed = False
+            trace = None
+            self.active_renders += 1
             try:
                 start_time = time.time()
-                page = await self.browser.new_page(width=width, height=height, locale=locale, stealth=stealth)
-                if content:
-                    await page.set_content(content, wait_until=wait_until)
-                if url:
-                    await page.goto(url, wait_until=wait_until)
+                page = await self.browser.new_page(
+                    width=width, height=height, locale=locale, stealth=stealth, url=context_url
+                )
+                if budget.limits_network:
+                    page_budget = self.page_budgets[page] = PageBudget(page, budget)
+                    await page_budget.attach()
+                if self.trace_recorder:
+                    trace = await self.trace_recorder.start(page, url)
+                conditional = conditional_render.get()
+                if conditional:
+                    conditional.validator = None
+                load = None
+                try:
+                    # The shared stylesheet comes from the context init script on navigation. ``set_content`` does
+                    # not run init scripts, so inline content carries it as a trailing <style> element instead.
+                    if content:
+                        await page.set_content(
+                            content + content_style_tag(), wait_until=wait_until, **playwright_timeout()
+                        )
+                    if url:
+                        snapshot_key = None
+                        if reuse_snapshot and self.page_snapshots:
+                            snapshot_key = page_snapshot_key(
+                                url, width, height, locale, stealth, wait_until, wait_after_load, css
+                            )
+                        load = await self.load_url(page, url, wait_until, snapshot_key)
+                        if conditional:
+                            conditional.validator = load.validator
+                except Exception:
+                    self.check_stopped_navigation(page)
+                    raise
                 if content or url:
-                    await page.add_style_tag(content=custom_css)
-                    if css:
-                        await page.add_style_tag(content=css)
-                    if wait_after_load:
-                        await page.wait_for_timeout(wait_after_load)
+                    report_progress("navigated")
+                    if not (load and load.restored):
+                        if css:
+                            await page.add_style_tag(content=css)
+                        if wait_after_load:
+                            await with_deadline(page.wait_for_timeout(wait_after_load))
+                if load and load.snapshot_key:
+                    await self.take_snapshot(page, url, load)
+                if page_budget:
+                    self.check_page_budget(page)
+                if budget.max_dom_nodes or budget.max_js_heap_mb:
+                    await self.check_resource_limits(page, budget)
                 yield page, start_time
+                if self.first_render_seconds is None:
+                    self.first_render_seconds = time.monotonic() - self.started_at
+                    self.logger.info(f"First successful render {self.first_render_seconds:.2f}s after start.")
+            except asyncio.CancelledError:
+                cancelled = True
+                raise
+            except NotModified:
+                raise
+            except Exception:
+                failed = True
+                raise
             finally:
-                if not self.keep_pages_open and page:
-                    await page.close()
+                self.active_renders -= 1
+                elapsed = time.monotonic() - slot_started
+                # Each step runs even when an earlier one raises, so the page and the limiter slot are never leaked.
+                # Steps are pushed in reverse, the exit stack runs them from the last pushed to the first.
+                async with AsyncExitStack() as cleanup:
+                    # A cancelled request has nobody waiting for it, so its tab is freed even when pages are kept open.
+                    if page and (cancelled or not self.keep_pages_open):
+                        cleanup.push_async_callback(page.close)
+                    if page and self.page_metrics and not cancelled:
+                        cleanup.push_async_callback(self.record_page_metrics, page, url)
+                    if self.limiter:
+                        cleanup.push_async_callback(self.limiter.release, None if cancelled else elapsed)
+                    if trace:
+                        cleanup.push_async_callback(
+                            self.trace_recorder.stop, trace, elapsed, failed=failed, discard=cancelled
+                        )
+                    if page:
+                        cleanup.callback(self.browser.release_page, page)
+                    if page_budget:
+                        cleanup.push_async_callback(page_budget.detach)
+                        cleanup.callback(self.page_budgets.pop, page, None)
+
+    async def load_url(self, page: Page, url: str, wait_until: str, snapshot_key: str | None = None) -> PageLoad:
+        """
+        Navigate ``page`` to ``url``, or restore it from the snapshot under ``snapshot_key``. Returns the ETag or
+        Last-Modified of the page, and the key to snapshot it under once it has settled if it was navigated.
+        """
+        conditional = conditional_render.get()
+        snapshot = None
+        if snapshot_key and not (conditional and conditional.refresh):
+            snapshot = self.page_snapshots.get(snapshot_key)
+        if snapshot:
+            self.logger.request_debug("Restoring {} from a page snapshot.", url)
+            await page.set_content(snapshot.html + content_style_tag(), wait_until=wait_until, **playwright_timeout())
+            return PageLoad(snapshot.validator, restored=True)
+
+        async with self.host_slot(url):
+            response = await page.goto(url, wait_until=wait_until, **playwright_timeout())
+        if response:
+            self.record_host_status(url, response.status)
+        validator = None
+        if response and response.status == 200:
+            validator = response.headers.get("etag") or response.headers.get("last-modified")
+        return PageLoad(validator, snapshot_key=snapshot_key if response and response.ok else None)
+
+    async def take_snapshot(self, page: Page, url: str, load: PageLoad):
+        """Save the DOM of ``page`` after the CSS and the wait after load, so restored pages look the same."""
+        try:
+            html = await with_deadline(page.evaluate(read_template("page_snapshot.js")))
+            self.page_snapshots.put(load.snapshot_key, html, load.validator)
+        except DeadlineExceeded:
+            raise
+        except Exception:
+            self.logger.warning(f"Failed to take a snapshot of {url}.")
+
+    def host_slot(self, url: str):
+        """Wait for the turn of ``url``'s host and hold its slot inside the block, when per-host limits are set."""
+        return self.host_throttle.slot(url) if self.host_throttle else nullcontext()
+
+    def record_host_status(self, url: str, status: int):
+        if self.host_throttle:
+            self.host_throttle.record_status(url, status)
+
+    async def warmup(self, contexts: list[dict] | None = None) -> bool:
+        """
+        Create the given browser contexts ahead of time and render a sample page in each, so the first requests
+        do not pay for context creation, stealth setup and font loading.
+
+        :param contexts: ``render_page`` settings (``width``, ``height``, ``locale``, ``stealth``) of each
+            context to prepare. Defaults to one context with the default settings.
+        """
+        if not await self.browser.check_status():
+            return False
+        started = time.monotonic()
+        content = (
+            await template_env().get_template("content.html").render_async(language="zh-CN", contents=warmup_content)
+        )
+        for settings in contexts or [{}]:
+            try:
+                async with self.render_page(content=content, **settings) as (page, start_time):
+                    await self.select_element_and_screenshot("body", page, start_time, count_time=False)
+            except Exception:
+                self.logger.exception(f"WebRender warm-up failed for context {settings}:")
+                return False
+        self.warmup_seconds = time.monotonic() - started
+        self.logger.success(f"WebRender warmed up {len(contexts or [{}])} context(s) in {self.warmup_seconds:.2f}s.")
+        return True
+
+    async def check_resource_limits(self, page: Page, budget: ResourceBudget):
+        metrics = await with_deadline(collect_page_metrics(page))
+        if metrics is None:
+            self.logger.warning("Page resource limits are only supported on Chromium, ignoring them.")
+            return
+        dom_nodes = metrics.get("dom_nodes", 0)
+        if budget.max_dom_nodes and dom_nodes > budget.max_dom_nodes:
+            self.over_budget("max_dom_nodes", f"Page has {int(dom_nodes)} DOM nodes, limit is {budget.max_dom_nodes}")
+        js_heap_mb = metrics.get("js_heap_used", 0) / 1024 / 1024
+        if budget.max_js_heap_mb and js_heap_mb > budget.max_js_heap_mb:
+            self.over_budget(
+                "max_js_heap_mb", f"Page uses {js_heap_mb:.1f} MB of JS heap, limit is {budget.max_js_heap_mb} MB"
+            )
+
+    def check_page_budget(self, page: Page):
+        """Handle a page that was stopped loading because it went over its request or byte budget."""
+        page_budget = self.page_budgets.get(page)
+        if page_budget and page_budget.exceeded:
+            self.over_budget(page_budget.exceeded, page_budget.reason)
+
+    def check_stopped_navigation(self, page: Page):
+        """
+        Called when loading ``page`` failed. Stopping a page over budget can abort its navigation, which leaves
+        nothing to render, so that fails with :class:`ResourceLimitExceeded` whatever the budget allows.
+        """
+        page_budget = self.page_budgets.get(page)
+        if page_budget and page_budget.exceeded:
+            self.budget_exceeded[page_budget.exceeded] += 1
+            raise ResourceLimitExceeded(page_budget.reason) from None
+
+    def over_budget(self, limit: str, reason: str):
+        """
+        Fail the render with :class:`ResourceLimitExceeded`, or carry on with what loaded when the request's
+        budget allows partial renders. A partial render gets no ETag and is not cached.
+        """
+        self.budget_exceeded[limit] += 1
+        if not request_budget.get().partial:
+            raise ResourceLimitExceeded(reason)
+        self.logger.warning(f"{reason}, rendering what loaded.")
+        conditional = conditional_render.get()
+        if conditional:
+            conditional.key = None
+            conditional.etag = None
+
+    async def record_page_metrics(self, page: Page, url: str | None):
+        try:
+            metrics = await collect_page_metrics(page)
+        except Exception:
+            self.logger.exception("Failed to collect page metrics:")
+            return
+        if metrics is not None:
+            self.page_metrics_recorder.record(metrics_host(url), metrics)
 
     @staticmethod
     async def select_element(el: str | list, pg: Page) -> tuple[ElementHandle | None, str | None]:
@@ -219,61 +834,93 @@ class WebRender:
         screenshot_height: int = max_screenshot_height,
         output_type: Literal["png", "jpeg"] = "jpeg",
         output_quality: int = 90,
-    ) -> list[str]:
-        await page.evaluate("window.scroll(0, 0)")
+    ) -> list[str] | SliceBuffer:
+        await with_deadline(page.evaluate("window.scroll(0, 0)"))
         content_size = await el.bounding_box()
         dpr = page.viewport_size.get("deviceScaleFactor", 1)
         screenshot_height = math.floor(screenshot_height / dpr)
-        self.logger.info(f"Content size: {content_size}, DPR: {dpr}, Screenshot height: {screenshot_height}")
+        self.logger.request_info(
+            "Content size: {}, DPR: {}, Screenshot height: {}", content_size, dpr, screenshot_height
+        )
+
+        max_capture_height = request_budget.get().max_capture_height
+        truncated = bool(max_capture_height and content_size.get("height") > max_capture_height)
+        if truncated:
+            self.over_budget(
+                "max_capture_height",
+                f"Capture is {content_size.get('height'):.0f} px tall, limit is {max_capture_height} px",
+            )
+            content_size = {**content_size, "height": max_capture_height}
 
         # If content height is less than max screenshot height, take a single screenshot and return as a list with one item
 
-        if content_size.get("height") < max_screenshot_height:
-            self.logger.info("Content height is less than max screenshot height, taking single screenshot.")
-            img = await el.screenshot(type=output_type, quality=output_quality if output_type == "jpeg" else None)
+        if not truncated and content_size.get("height") < max_screenshot_height:
+            self.logger.request_info("Content height is less than max screenshot height, taking single screenshot.")
+            img = await el.screenshot(
+                type=output_type,
+                quality=output_quality if output_type == "jpeg" else None,
+                **playwright_timeout(),
+            )
+            report_progress("slice", index=1, total=1)
             return [base64.b64encode(img).decode()]
 
         # Otherwise, take multiple screenshots and return as a list with multiple items
 
         y_pos = content_size.get("y")
         total_content_height = content_size.get("y")
-        images = []
-        while y_pos < content_size.get("height") + content_size.get("y"):
-            total_content_height += max_screenshot_height
-            content_height = max_screenshot_height
-            if total_content_height > content_size.get("height") + content_size.get("y"):
-                content_height = (
-                    content_size.get("height") + content_size.get("y") - total_content_height + max_screenshot_height
+        images = SliceBuffer(self.slice_memory_threshold if slice_spill.get() else 0, self.slice_spill_path)
+        total = math.ceil(content_size.get("height") / screenshot_height)
+        try:
+            while y_pos < content_size.get("height") + content_size.get("y"):
+                total_content_height += max_screenshot_height
+                content_height = max_screenshot_height
+                if total_content_height > content_size.get("height") + content_size.get("y"):
+                    content_height = (
+                        content_size.get("height")
+                        + content_size.get("y")
+                        - total_content_height
+                        + max_screenshot_height
+                    )
+                await with_deadline(page.evaluate(f"window.scroll({content_size.get('x')}, {y_pos})"))
+                self.logger.request_debug(
+                    "X:{} Y:{} Width:{} Height:{}",
+                    content_size.get("x"),
+                    y_pos,
+                    content_size.get("width"),
+                    content_height,
                 )
-            await page.evaluate(f"window.scroll({content_size.get('x')}, {y_pos})")
-            self.logger.info(
-                "X:"
-                + str(content_size.get("x"))
-                + " Y:"
-                + str(y_pos)
-                + " Width:"
-                + str(content_size.get("width"))
-                + " Height:"
-                + str(content_height)
-            )
 
-            img = await page.screenshot(
-                type=output_type,
-                quality=output_quality if output_type == "jpeg" else None,
-                clip=FloatRect(
-                    x=content_size.get("x"), y=y_pos, width=content_size.get("width"), height=content_height
-                ),
-                full_page=True,
-            )
-            images.append(base64.b64encode(img).decode())
-            y_pos += screenshot_height
-        return images
+                img = await page.screenshot(
+                    type=output_type,
+                    quality=output_quality if output_type == "jpeg" else None,
+                    clip={
+                        "x": content_size.get("x"),
+                        "y": y_pos,
+                        "width": content_size.get("width"),
+                        "height": content_height,
+                    },
+                    full_page=True,
+                    **playwright_timeout(),
+                )
+                images.append(img)
+                report_progress("slice", index=len(images), total=total)
+                y_pos += screenshot_height
+        except BaseException:
+            # A cancelled or failed capture deletes its temporary file now rather than whenever it is collected.
+            images.close()
+            raise
+        if images.spilled:
+            self.spilled_captures += 1
+            self.logger.request_info("Capture of {} bytes was spilled to disk.", images.size)
+        return images.result()
 
     @classmethod
     async def add_count_box(cls, page: Page, element: str, start_time: float = time.time()):
-        return await page.evaluate(
-            add_count_box_script,
-            {"selected_element": element, "start_time": int(start_time * 1000), "name": cls.name},
+        return await with_deadline(
+            page.evaluate(
+                read_template("add_count_box.js"),
+                {"selected_element": element, "start_time": int(start_time * 1000), "name": cls.name},
+            )
         )
 
     async def select_element_and_screenshot(
@@ -288,23 +935,57 @@ class WebRender:
         el, selected_ = await self.select_element(elements, page)
         if not el:
             raise ElementNotFound
+        conditional = conditional_render.get()
+        etag = None
+        if conditional and conditional.key:
+            etag = await self.render_fingerprint(el, conditional)
+            if conditional.matches(etag):
+                self.not_modified_responses += 1
+                raise NotModified(etag)
+            if self.render_cache:
+                images = await self.render_cache.get(conditional.key, etag)
+                if images is not None:
+                    conditional.cached = True
+                    if conditional.refresh:
+                        await self.render_cache.put(conditional.key, etag, images)
+                    return images
         if count_time:
             await self.add_count_box(page, selected_, start_time)
         images = await self.make_screenshot(page, el, output_type=output_type, output_quality=output_quality)
+        # A capture cut at the budget's height clears the ETag, and is not cached under it either.
+        if etag and self.render_cache and conditional.etag:
+            await self.render_cache.put(conditional.key, etag, images)
         return images
 
+    @staticmethod
+    async def render_fingerprint(el: ElementHandle, conditional: ConditionalRender) -> str:
+        """
+        ETag of the render about to be captured. Uses the ETag or Last-Modified of the navigation when the server
+        sent one, otherwise a hash of the element's HTML.
+        """
+        validator = conditional.validator
+        if validator is None:
+            html = await with_deadline(el.evaluate("element => element.outerHTML"))
+            validator = hashlib.sha256(html.encode()).hexdigest()
+        conditional.etag = render_etag(conditional.key, validator)
+        return conditional.etag
+
     @webrender_fallback
     async def legacy_screenshot(self, options: LegacyScreenshotOptions):
         async with self.render_page(
             width=options.width,
             height=options.height,
             locale=options.locale,
-            content=await env.get_template("content.html").render_async(language="zh-CN", contents=options.content),
+            content=await template_env()
+            .get_template("content.html")
+            .render_async(language="zh-CN", contents=options.content),
             url=options.url,
             css=options.css,
             stealth=options.stealth,
             wait_until=options.wait_until,
             wait_after_load=options.wait_after_load,
+            max_dom_nodes=options.max_dom_nodes,
+            max_js_heap_mb=options.max_js_heap_mb,
         ) as (page, start_time):
             images = await self.select_element_and_screenshot(
                 elements=[
@@ -333,6 +1014,8 @@ class WebRender:
             stealth=options.stealth,
             wait_until=options.wait_until,
             wait_after_load=options.wait_after_load,
+            max_dom_nodes=options.max_dom_nodes,
+            max_js_heap_mb=options.max_js_heap_mb,
         ) as (page, start_time):
             images = await self.select_element_and_screenshot(
                 elements=["body"],
@@ -356,8 +1039,11 @@ class WebRender:
             stealth=options.stealth,
             wait_until=options.wait_until,
             wait_after_load=options.wait_after_load,
+            max_dom_nodes=options.max_dom_nodes,
+            max_js_heap_mb=options.max_js_heap_mb,
+            reuse_snapshot=True,
         ) as (page, start_time):
-            await page.evaluate(element_screenshot_script, elements_to_disable)
+            await with_deadline(page.evaluate(read_template("element_screenshot_evaluate.js"), elements_to_disable))
             images = await self.select_element_and_screenshot(
                 elements=options.element,
                 page=page,
@@ -380,10 +1066,15 @@ class WebRender:
             stealth=options.stealth,
             wait_until=options.wait_until,
             wait_after_load=options.wait_after_load,
+            max_dom_nodes=options.max_dom_nodes,
+            max_js_heap_mb=options.max_js_heap_mb,
+            reuse_snapshot=True,
         ) as (page, start_time):
-            await page.evaluate(
-                section_screenshot_script,
-                {"section": options.section, "elements_to_disable": elements_to_disable},
+            await with_deadline(
+                page.evaluate(
+                    read_template("section_screenshot_evaluate.js"),
+                    {"section": options.section, "elements_to_disable": elements_to_disable},
+                )
             )
             images = await self.select_element_and_screenshot(
                 elements=".bot-sectionbox",
@@ -397,19 +1088,45 @@ class WebRender:
 
     @webrender_fallback
     async def source(self, options: SourceOptions):
-        url = options.url
-        if not url:
+        if not options.url:
             raise RequiredURL
-        async with self.render_page(locale=options.locale, stealth=options.stealth) as (page, _start_time):
-            resp = await page.goto(url, wait_until=options.wait_until)
+        key = render_cache_key("source", options) if self.render_cache and self.render_cache.source_ttl else None
+        conditional = conditional_render.get()
+        if key and not (conditional and conditional.refresh):
+            cached = await self.render_cache.get_source(key)
+            if cached is not None:
+                return cached
+        result = await self.load_source(options)
+        if key and result is not None:
+            await self.render_cache.put_source(key, result)
+        return result
+
+    async def load_source(self, options: SourceOptions) -> str | None:
+        url = options.url
+        # The page and the fallback fetch below use the same site context, so they share its stored cookies.
+        render = self.render_page(locale=options.locale, stealth=options.stealth, context_url=url)
+        async with render as (page, _start_time):
+            async with self.host_slot(url):
+                try:
+                    resp = await page.goto(url, wait_until=options.wait_until, **playwright_timeout())
+                except Exception:
+                    self.check_stopped_navigation(page)
+                    raise
+            self.record_host_status(url, resp.status)
             if options.wait_after_load:
-                await page.wait_for_timeout(options.wait_after_load)
+                await with_deadline(page.wait_for_timeout(options.wait_after_load))
+            self.check_page_budget(page)
             if resp.status != 200:  # attempt to fetch the url content using fetch
-                get = await page.request.fetch(url)
-                if get.status == 200:
-                    return get.text()
-                self.logger.error(f"Failed to fetch URL: {url}, status code: {get.status}")
-                return None
+                request = await self.browser.request_context(locale=options.locale, stealth=options.stealth, url=url)
+                async with self.host_slot(url):
+                    get = await request.fetch(url, **playwright_timeout())
+                try:
+                    if get.status == 200:
+                        return await get.text()
+                    self.logger.error(f"Failed to fetch URL: {url}, status code: {get.status}")
+                    return None
+                finally:
+                    await get.dispose()
 
             _source = await page.content()
             if options.raw_text:
@@ -423,14 +1140,83 @@ class WebRender:
         url = options.url
         if not url:
             raise RequiredURL
-        async with self.render_page(locale=options.locale, stealth=options.stealth) as (page, _start_time):
-            resp = await page.request.fetch(url)
+        request = await self.browser.request_context(locale=options.locale, stealth=options.stealth, url=url)
+        async with self.host_slot(url):
+            resp = await request.fetch(url, **playwright_timeout())
+        self.record_host_status(url, resp.status)
+        try:
             body = await resp.body()
-            return {
-                "status": resp.status,
-                "content_type": resp.headers.get("content-type", "application/octet-stream"),
-                "data": base64.b64encode(body).decode(),
-            }
+        finally:
+            await resp.dispose()
+        return {
+            "status": resp.status,
+            "content_type": resp.headers.get("content-type", "application/octet-stream"),
+            "data": base64.b64encode(body).decode(),
+        }
+
+    async def get_raw_stream(self, options: RawOptions) -> RawStream | None:
+        """
+        Fetch ``options.url`` with the cookies and user agent of the matching browser context and stream the body
+        instead of buffering it. Falls back to the remote WebRender's streaming ``get_raw`` like the other methods.
+
+        :raises ResponseTooLarge: The announced body size exceeds the size limit. A body that grows past the
+            limit while streaming raises the same error from the iterator.
+        """
+        if not options.url:
+            raise RequiredURL
+        max_size = min(filter(None, (options.max_size, self.raw_max_size)), default=None)
+        with deadline_scope(options.timeout), request_log_scope(self.logger.sample_rate):
+            if not self.remote_only and await self.browser.check_status():
+                try:
+                    return await self._open_local_raw_stream(options, max_size)
+                except (*passthrough_exceptions, ResponseTooLarge):
+                    raise
+                except Exception:
+                    check_deadline()
+                    self.logger.exception(f"WebRender raw streaming failed with options: {OptionsSummary(options)}:")
+            if self.remote_webrender_url:
+                return await self._open_remote_raw_stream(options, max_size)
+            return None
+
+    async def _open_local_raw_stream(self, options: RawOptions, max_size: int | None) -> RawStream:
+        context = await self.browser.get_context(locale=options.locale, stealth=options.stealth, url=options.url)
+        cookies = cookies_to_jar(await context.cookies())
+        async with self.host_slot(options.url):
+            remaining = remaining_time()
+            response, stream = await open_http_stream(
+                "GET",
+                options.url,
+                timeout=raw_stream_timeout if remaining is None else min(raw_stream_timeout, remaining),
+                max_size=max_size,
+                headers={"User-Agent": browser_user_agent if options.stealth else base_user_agent},
+                cookies=cookies,
+            )
+        self.record_host_status(options.url, response.status_code)
+        return stream
+
+    async def _open_remote_raw_stream(self, options: RawOptions, max_size: int | None) -> RawStream | None:
+        settings = self._remote_request_settings()
+        if settings is None:
+            return None
+        timeout, headers = settings
+        payload = options.model_dump(mode="json", exclude_none=True) | {"stream": True}
+        if max_size:
+            payload["max_size"] = max_size
+        response, stream = await open_http_stream(
+            "POST",
+            self._remote_endpoint_url("get_raw"),
+            timeout=timeout,
+            max_size=max_size,
+            headers=headers,
+            json=payload,
+            **self._remote_transport_options(),
+        )
+        if response.status_code != 200 or upstream_status_header not in response.headers:
+            await stream.aclose()
+            self.logger.error(f"Remote WebRender raw streaming failed, status code: {response.status_code}")
+            return None
+        stream.status = int(response.headers[upstream_status_header])
+        return stream
 
     @webrender_fallback
     async def status(self, options: StatusOptions | None = None):
@@ -450,14 +1236,201 @@ class WebRender:
                 "debug_mode": self.debug,
                 "headless": self.headless,
                 "browser_mode": "headless" if self.headless else "headed",
+                "launch_profile": self.browser.launch_profile,
                 "keep_pages_open": self.keep_pages_open,
                 "remote_only": self.remote_only,
                 "remote_configured": bool(self.remote_webrender_url),
                 "remote_timeout": self.remote_timeout,
+                "remote_uds_path": self.remote_uds_path,
                 "export_logs": self.export_logs,
                 "logs_path": str(self.logs_path) if self.logs_path else None,
                 "name": self.name,
                 "contexts_open_sorted": contexts_open,
                 "contexts_total": contexts_total,
                 "leaked": len(contexts_open) != contexts_total,
+                "warmup_seconds": self.warmup_seconds,
+                "time_to_first_render": self.first_render_seconds,
+                "browser_generation": self.browser.generation,
+                "pages_served": self.browser.pages_served,
+                "watchdog": self.browser.watchdog.stats() if self.browser.watchdog else None,
+                "page_metrics_top_hosts": self.page_metrics_recorder.top(),
+                "render_cache": self.render_cache.stats() if self.render_cache else None,
+                "not_modified_responses": self.not_modified_responses,
+                "active_renders": self.active_renders,
+                "prerender": self.prerenderer.stats() if self.prerenderer else None,
+                "concurrency": self.limiter.stats() if self.limiter else None,
+                "hedging": self.hedge_policy.stats() if self.hedge_policy else None,
+                "page_snapshots": self.page_snapshots.stats() if self.page_snapshots else None,
+                "remote_websocket": self.multiplex_client.stats() if self.multiplex_client else None,
+                "host_throttle": self.host_throttle.stats() if self.host_throttle else None,
+                "tracing": self.trace_recorder.stats() if self.trace_recorder else None,
+                "spilled_captures": self.spilled_captures,
+                "open_pages": self.browser.open_pages,
+                "pages_reaped": self.browser.pages_reaped,
+                "resource_budget": {
+                    **{name: getattr(self.resource_budget, name) for name in budget_limits},
+                    "on_budget_exceeded": self.resource_budget.on_budget_exceeded,
+                    "exceeded": self.budget_exceeded,
+                },
             }
+
+    async def health(self) -> dict:
+        """
+        Liveness summary for load balancer health checks, read from counters kept up to date as pages and renders
+        come and go. Unlike :meth:`status`, it never enumerates pages and is never forwarded to the remote WebRender.
+        """
+        browser_connected = await self.browser.check_status()
+        return {
+            "healthy": browser_connected or (self.remote_only and bool(self.remote_webrender_url)),
+            "browser_connected": browser_connected,
+            "remote_only": self.remote_only,
+            "browser_generation": self.browser.generation,
+            "active_renders": self.active_renders,
+            "open_pages": self.browser.open_pages,
+            "pages_reaped": self.browser.pages_reaped,
+            "uptime": time.monotonic() - self.started_at,
+        }
+
+    def metrics(self) -> str:
+        """Local counters in Prometheus text format. Never forwarded to the remote WebRender."""
+        # Counters cover every tracked host, so their sums do not jump as hosts enter and leave the top ten.
+        tracked_hosts = self.page_metrics_recorder.hosts.items()
+        top_hosts = self.page_metrics_recorder.top()
+        hosts = self.host_throttle.hosts.items() if self.host_throttle else []
+        families = [
+            ("webrender_browser_generation", "gauge", "Number of browser launches.", [({}, self.browser.generation)]),
+            (
+                "webrender_pages_served",
+                "gauge",
+                "Pages opened by the current browser generation.",
+                [({}, self.browser.pages_served)],
+            ),
+            (
+                "webrender_browser_recycles_total",
+                "counter",
+                "Browser recycles performed by the watchdog.",
+                [({}, self.browser.watchdog.recycles if self.browser.watchdog else 0)],
+            ),
+            (
+                "webrender_host_renders_total",
+                "counter",
+                "Renders with collected page metrics, by target host.",
+                [({"host": host}, stats["renders"]) for host, stats in tracked_hosts],
+            ),
+            (
+                "webrender_host_max_js_heap_bytes",
+                "gauge",
+                "Largest JS heap seen per target host.",
+                [({"host": item["host"]}, item["max_js_heap_used"]) for item in top_hosts],
+            ),
+            (
+                "webrender_host_max_dom_nodes",
+                "gauge",
+                "Largest DOM node count seen per target host.",
+                [({"host": item["host"]}, item["max_dom_nodes"]) for item in top_hosts],
+            ),
+            (
+                "webrender_host_task_seconds_total",
+                "counter",
+                "Main thread task time per target host.",
+                [({"host": host}, stats["total_task_duration"]) for host, stats in tracked_hosts],
+            ),
+            (
+                "webrender_concurrency_limit",
+                "gauge",
+                "Current adaptive limit on concurrent renders.",
+                [({}, self.limiter.limit)] if self.limiter else [],
+            ),
+            (
+                "webrender_renders_in_flight",
+                "gauge",
+                "Renders currently running.",
+                [({}, self.active_renders)],
+            ),
+            (
+                "webrender_renders_waiting",
+                "gauge",
+                "Renders waiting for a concurrency slot.",
+                [({}, self.limiter.waiting)] if self.limiter else [],
+            ),
+            (
+                "webrender_concurrency_adjustments_total",
+                "counter",
+                "Adaptive concurrency limit changes, by direction.",
+                [({"action": "increase"}, self.limiter.increases), ({"action": "decrease"}, self.limiter.decreases)]
+                if self.limiter
+                else [],
+            ),
+            (
+                "webrender_hedged_requests_total",
+                "counter",
+                "Requests sent to the remote WebRender while the local render was still running.",
+                [({}, self.hedge_policy.hedged)] if self.hedge_policy else [],
+            ),
+            (
+                "webrender_hedge_wins_total",
+                "counter",
+                "Hedged requests by the side that returned the result.",
+                [
+                    ({"winner": "local"}, self.hedge_policy.local_wins),
+                    ({"winner": "remote"}, self.hedge_policy.remote_wins),
+                ]
+                if self.hedge_policy
+                else [],
+            ),
+            (
+                "webrender_host_throttled_total",
+                "counter",
+                "Navigations and fetches that waited for their target host's rate or concurrency limit.",
+                [({"host": host}, state.throttled) for host, state in hosts],
+            ),
+            (
+                "webrender_host_throttle_wait_seconds_total",
+                "counter",
+                "Seconds navigations and fetches waited for their target host's limits.",
+                [({"host": host}, state.wait_seconds) for host, state in hosts],
+            ),
+            (
+                "webrender_open_pages",
+                "gauge",
+                "Pages currently open in the browser.",
+                [({}, self.browser.open_pages)],
+            ),
+            (
+                "webrender_pages_reaped_total",
+                "counter",
+                "Pages closed by the reaper after staying open too long.",
+                [({}, self.browser.pages_reaped)],
+            ),
+            (
+                "webrender_budget_exceeded_total",
+                "counter",
+                "Renders that went over a resource budget, by limit.",
+                [({"limit": limit}, count) for limit, count in self.budget_exceeded.items()],
+            ),
+            (
+                "webrender_page_snapshot_hits_total",
+                "counter",
+                "Element and section renders restored from a page snapshot instead of loading the page.",
+                [({}, self.page_snapshots.hits)] if self.page_snapshots else [],
+            ),
+            (
+                "webrender_render_cache_hits_total",
+                "counter",
+                "Screenshots served from the render cache.",
+                [({}, self.render_cache.hits if self.render_cache else 0)],
+            ),
+            (
+                "webrender_render_cache_misses_total",
+                "counter",
+                "Fingerprinted screenshots that had to be captured.",
+                [({}, self.render_cache.misses if self.render_cache else 0)],
+            ),
+            (
+                "webrender_not_modified_total",
+                "counter",
+                "Screenshot requests answered with 304 Not Modified.",
+                [({}, self.not_modified_responses)],
+            ),
+        ]
+        return render_prometheus(families)
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+from urllib.parse import urlsplit
+
+if TYPE_CHECKING:
+    from playwright.async_api import Page
+
+# Chromium ``Performance.getMetrics`` names and the keys they are reported under.
+cdp_metric_names = {
+    "JSHeapUsedSize": "js_heap_used",
+    "JSHeapTotalSize": "js_heap_total",
+    "Nodes": "dom_nodes",
+    "LayoutDuration": "layout_duration",
+    "TaskDuration": "task_duration",
+}
+
+
+def metrics_host(url: str | None) -> str:
+    """Aggregation key for a render: the target host, or ``(content)`` for renders of inline HTML."""
+    if not url:
+        return "(content)"
+    return urlsplit(url).hostname or "(unknown)"
+
+
+async def collect_page_metrics(page: Page) -> dict | None:
+    """Read heap, DOM and timing metrics of ``page`` over CDP. Returns ``None`` on browsers without CDP."""
+    try:
+        session = await page.context.new_cdp_session(page)
+    except Exception:
+        return None
+    try:
+        await session.send("Performance.enable")
+        result = await session.send("Performance.getMetrics")
+    finally:
+        await session.detach()
+    metrics = {}
+    for metric in result.get("metrics", []):
+        key = cdp_metric_names.get(metric.get("name"))
+        if key:
+            metrics[key] = metric.get("value", 0)
+    return metrics
+
+
+class PageMetricsRecorder:
+    def __init__(self, max_hosts: int = 256):
+        self.max_hosts = max_hosts
+        self.hosts: OrderedDict[str, dict] = OrderedDict()
+
+    def record(self, host: str, metrics: dict):
+        stats = self.hosts.pop(host, None)
+        if stats is None:
+            stats = {
+                "renders": 0,
+                "max_js_heap_used": 0,
+                "total_js_heap_used": 0,
+                "max_dom_nodes": 0,
+                "total_layout_duration": 0.0,
+                "total_task_duration": 0.0,
+            }
+        stats["renders"] += 1
+        stats["max_js_heap_used"] = max(stats["max_js_heap_used"], metrics.get("js_heap_used", 0))
+        stats["total_js_heap_used"] += metrics.get("js_heap_used", 0)
+        stats["max_dom_nodes"] = max(stats["max_dom_nodes"], metrics.get("dom_nodes", 0))
+        stats["total_layout_duration"] += metrics.get("layout_duration", 0)
+        stats["total_task_duration"] += metrics.get("task_duration", 0)
+        self.hosts[host] = stats
+        while len(self.hosts) > self.max_hosts:
+            self.hosts.popitem(last=False)
+
+    def top(self, count: int = 10, key: str = "max_js_heap_used") -> list[dict]:
+        """The ``count`` hosts with the highest ``key``, heaviest first."""
+        ranked = sorted(self.hosts.items(), key=lambda item: item[1][key], reverse=True)[:count]
+        return [
+            {
+                "host": host,
+                **stats,
+                "avg_js_heap_used": stats["total_js_heap_used"] / stats["renders"],
+            }
+            for host, stats in ranked
+        ]
+
+
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_prometheus(families: list[tuple[str, str, str, list[tuple[dict, float]]]]) -> str:
+    """
+    Format metric families as Prometheus text exposition.
+
+    :param families: ``(name, type, help, samples)`` tuples, where each sample is a ``(labels, value)`` pair.
+    """
+    lines = []
+    for name, metric_type, help_text, samples in families:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for labels, value in samples:
+            if labels:
+                label_text = ",".join(f'{key}="{_escape_label(label)}"' for key, label in labels.items())
+                lines.append(f"{name}{{{label_text}}} {float(value)}")
+            else:
+                lines.append(f"{name} {float(value)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,201 @@
+import asyncio
+import base64
+import contextlib
+import itertools
+import struct
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+import orjson as json
+
+# Many renders share one WebSocket connection to ``/ws/``. The client sends text frames
+#   {"id": "1", "op": "render", "endpoint": "page", "options": {...}, "timeout": 30, "hop": 1}
+#   {"id": "1", "op": "cancel"}
+# and the server answers each render with optional progress frames
+#   {"id": "1", "event": "progress", "stage": "slice", "index": 2, "total": 5}
+# the screenshot slices as binary frames (see :func:`encode_slice`), and one result frame that mirrors the
+# HTTP response, e.g. {"id": "1", "event": "result", "status": 200, "slices": 5, "etag": "..."}. A render sent
+# with the id of one still running is refused with {"id": "1", "event": "error", "status": 409, "detail": "..."}.
+websocket_path = "ws/"
+# Binary frame header: length of the request id, index of the slice. The id and the image bytes follow.
+_slice_header = struct.Struct("!HH")
+
+render_progress: ContextVar = ContextVar("render_progress", default=None)
+
+
+def report_progress(stage: str, **details):
+    """Tell the client of the current request how far its render got, if it listens for progress."""
+    callback = render_progress.get()
+    if callback is not None:
+        callback(stage, details)
+
+
+@contextmanager
+def progress_scope(callback):
+    """Send :func:`report_progress` calls of the renders started inside to ``callback(stage, details)``."""
+    token = render_progress.set(callback)
+    try:
+        yield
+    finally:
+        render_progress.reset(token)
+
+
+def encode_slice(request_id: str, index: int, data: bytes) -> bytes:
+    request_id_bytes = request_id.encode()
+    return _slice_header.pack(len(request_id_bytes), index) + request_id_bytes + data
+
+
+def decode_slice(frame: bytes) -> tuple[str, int, bytes]:
+    id_length, index = _slice_header.unpack_from(frame)
+    offset = _slice_header.size + id_length
+    return frame[_slice_header.size : offset].decode(), index, frame[offset:]
+
+
+@dataclass
+class _PendingRequest:
+    result: asyncio.Future
+    progress: object = None
+    slices: dict[int, bytes] = field(default_factory=dict)
+
+
+class MultiplexClient:
+    def __init__(
+        self,
+        url: str,
+        uds_path: str | None = None,
+        max_size: int = 64 * 1024 * 1024,
+        connect=None,
+        logger=None,
+    ):
+        """
+        Sends requests to a remote WebRender over a single WebSocket connection, so concurrent renders neither
+        wait for each other nor open a connection each. The connection is opened on first use and again after it
+        was lost. Requires the ``websockets`` package.
+
+        :param url: ``ws://`` or ``wss://`` URL of the remote ``/ws/`` endpoint.
+        :param uds_path: Connect through this Unix domain socket, ``url`` then only supplies the path.
+        :param max_size: Largest frame in bytes to accept.
+        :param connect: Coroutine function returning an open connection, used instead of ``websockets``.
+        :param logger: Where errors that end the connection are logged.
+        """
+        self.url = url
+        self.uds_path = uds_path
+        self.max_size = max_size
+        self._connect = connect or self._open
+        self.logger = logger
+        self.connection = None
+        self.pending: dict[str, _PendingRequest] = {}
+        self.requests = 0
+        self.cancelled = 0
+        self.connections = 0
+        self._ids = itertools.count(1)
+        self._lock = asyncio.Lock()
+        self._reader: asyncio.Task | None = None
+
+    async def _open(self):
+        from websockets.asyncio.client import connect, unix_connect
+
+        if self.uds_path:
+            return await unix_connect(self.uds_path, self.url, max_size=self.max_size)
+        return await connect(self.url, max_size=self.max_size)
+
+    async def _connection(self):
+        async with self._lock:
+            if self.connection is None:
+                self.connection = await self._connect()
+                self.connections += 1
+                self._reader = asyncio.create_task(self._read(self.connection))
+            return self.connection
+
+    async def _read(self, connection):
+        error = ConnectionError("WebRender WebSocket connection closed")
+        try:
+            async for frame in connection:
+                if isinstance(frame, bytes):
+                    request_id, index, data = decode_slice(frame)
+                    pending = self.pending.get(request_id)
+                    if pending:
+                        pending.slices[index] = data
+                    continue
+                message = json.loads(frame)
+                pending = self.pending.get(message.get("id"))
+                if pending is None:
+                    continue
+                if message.get("event") == "progress":
+                    if pending.progress:
+                        details = {k: v for k, v in message.items() if k not in {"id", "event", "stage"}}
+                        pending.progress(message.get("stage"), details)
+                elif message.get("event") == "result" and not pending.result.done():
+                    pending.result.set_result(message)
+        except Exception as e:
+            error = e
+            if self.logger:
+                self.logger.exception("WebRender WebSocket connection failed:")
+            # The connection may still be open after a frame that could not be read; it is not used again.
+            with contextlib.suppress(Exception):
+                await connection.close()
+        finally:
+            if self.connection is connection:
+                self.connection = None
+            for pending in self.pending.values():
+                if not pending.result.done():
+                    pending.result.set_exception(error)
+
+    async def request(
+        self,
+        endpoint: str,
+        options: dict,
+        timeout: float,
+        hop: int = 1,
+        deadline: float | None = None,
+        if_none_match: str | None = None,
+    ) -> dict:
+        """
+        Run a render on the remote WebRender and return its result frame. Screenshot slices are returned as
+        base64 strings under ``content``, like the HTTP API returns them. Progress reported by the remote is
+        passed on to the caller's :func:`progress_scope`.
+        """
+        connection = await self._connection()
+        request_id = str(next(self._ids))
+        pending = _PendingRequest(asyncio.get_running_loop().create_future(), render_progress.get())
+        self.pending[request_id] = pending
+        self.requests += 1
+        message = {"id": request_id, "op": "render", "endpoint": endpoint, "options": options, "hop": hop}
+        if deadline is not None:
+            message["timeout"] = deadline
+        if if_none_match:
+            message["if_none_match"] = if_none_match
+        try:
+            await connection.send(json.dumps(message).decode())
+            async with asyncio.timeout(timeout):
+                result = await pending.result
+        except (asyncio.CancelledError, TimeoutError):
+            # Nobody waits for the render any more, so the remote can close its page.
+            self.cancelled += 1
+            with contextlib.suppress(Exception):
+                await connection.send(json.dumps({"id": request_id, "op": "cancel"}).decode())
+            raise
+        finally:
+            del self.pending[request_id]
+        if result.get("slices") is not None:
+            result["content"] = [base64.b64encode(pending.slices[i]).decode() for i in range(result["slices"])]
+        return result
+
+    async def close(self):
+        async with self._lock:
+            connection, self.connection = self.connection, None
+        if connection is not None:
+            await connection.close()
+        if self._reader:
+            await asyncio.gather(self._reader, return_exceptions=True)
+            self._reader = None
+
+    def stats(self) -> dict:
+        return {
+            "connected": self.connection is not None,
+            "connections": self.connections,
+            "requests": self.requests,
+            "in_flight": len(self.pending),
+            "cancelled": self.cancelled,
+        }
@@ -20,6 +20,13 @@ class BaseOptions(BaseModel):
     stealth: bool = True
     wait_until: WaitUntil = "networkidle"
     wait_after_load: int = Field(default=0, ge=0, le=60000)
+    timeout: float | None = Field(default=None, gt=0, le=600)
+    max_dom_nodes: int | None = Field(default=None, gt=0)
+    max_js_heap_mb: float | None = Field(default=None, gt=0)
+    max_page_bytes: int | None = Field(default=None, gt=0)
+    max_page_requests: int | None = Field(default=None, gt=0)
+    max_capture_height: int | None = Field(default=None, gt=0)
+    on_budget_exceeded: Literal["fail", "partial"] | None = None
 
 
 class LegacyScreenshotOptions(BaseOptions):
@@ -47,12 +54,19 @@ class SourceOptions(BaseModel):
     stealth: bool = True
     wait_until: WaitUntil = "networkidle"
     wait_after_load: int = Field(default=0, ge=0, le=60000)
+    timeout: float | None = Field(default=None, gt=0, le=600)
+    max_page_bytes: int | None = Field(default=None, gt=0)
+    max_page_requests: int | None = Field(default=None, gt=0)
+    on_budget_exceeded: Literal["fail", "partial"] | None = None
 
 
 class RawOptions(BaseModel):
     url: str | None = None
     locale: str = "zh_cn"
     stealth: bool = True
+    timeout: float | None = Field(default=None, gt=0, le=600)
+    stream: bool = False
+    max_size: int | None = Field(default=None, gt=0)
 
 
 class StatusOptions(BaseModel):
@@ -0,0 +1,146 @@
+import asyncio
+import time
+
+from .cache import conditional_scope, render_cache_key
+from .deadline import deadline_scope
+
+
+class PopularityTracker:
+    def __init__(self, max_keys: int = 1024, half_life: float = 3600):
+        """
+        Exponentially decaying request counts per canonical options key.
+
+        :param max_keys: Keys to track, the least popular are dropped first.
+        :param half_life: Seconds after which a request counts half as much.
+        """
+        self.max_keys = max_keys
+        self.half_life = half_life
+        # key -> [score, time of score, method name, options, time of the last (pre-)render]
+        self.entries: dict[str, list] = {}
+
+    def _score(self, entry: list, now: float) -> float:
+        return entry[0] * 0.5 ** ((now - entry[1]) / self.half_life)
+
+    def record(self, method: str, options):
+        # Only renders of a URL are tracked. Inline content is rarely requested twice and would be kept in memory.
+        if getattr(options, "content", None) or not getattr(options, "url", None):
+            return
+        now = time.monotonic()
+        key = render_cache_key(method, options)
+        entry = self.entries.get(key)
+        if entry is None:
+            if len(self.entries) >= self.max_keys:
+                del self.entries[min(self.entries, key=lambda item: self._score(self.entries[item], now))]
+            self.entries[key] = [1.0, now, method, options, now]
+            return
+        entry[0] = self._score(entry, now) + 1
+        entry[1] = now
+
+    def top(self, count: int, min_score: float = 0) -> list[tuple[str, float, list]]:
+        """The ``count`` most popular keys with at least ``min_score``, most popular first."""
+        now = time.monotonic()
+        scored = [(key, self._score(entry, now), entry) for key, entry in self.entries.items()]
+        scored = [item for item in scored if item[1] >= min_score]
+        return sorted(scored, key=lambda item: item[1], reverse=True)[:count]
+
+
+class Prerenderer:
+    def __init__(
+        self,
+        webrender,
+        top_k: int = 10,
+        interval: float = 60,
+        refresh_ratio: float = 0.8,
+        max_active_renders: int = 0,
+        min_score: float = 1.5,
+        timeout: float = 60,
+    ):
+        """
+        Re-renders the most requested screenshots and sources of URLs in the background before their cached
+        results expire, so popular requests are served from the cache. Runs one render at a time, only while no
+        more than ``max_active_renders`` requests are rendering, and never on the remote WebRender.
+
+        :param webrender: The :class:`WebRender` whose requests are tracked and whose cache is refreshed.
+        :param top_k: Keys to keep fresh.
+        :param interval: Seconds between refresh rounds.
+        :param refresh_ratio: Share of the cache TTL after which a key is rendered again.
+        :param max_active_renders: Foreground renders above which pre-rendering waits for the next round.
+        :param min_score: Decayed request count a key needs before it is pre-rendered. The default skips keys that
+            were requested only once.
+        :param timeout: Seconds a single pre-render may take.
+        """
+        self.webrender = webrender
+        self.top_k = top_k
+        self.interval = interval
+        self.refresh_ratio = refresh_ratio
+        self.max_active_renders = max_active_renders
+        self.min_score = min_score
+        self.timeout = timeout
+        self.popularity = PopularityTracker()
+        self.prerendered = 0
+        self.failures = 0
+        self.skipped_busy = 0
+        self.last_round: float | None = None
+        self._task: asyncio.Task | None = None
+
+    def record(self, method: str, options):
+        self.popularity.record(method, options)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_round()
+            except Exception:
+                self.webrender.logger.exception("Pre-rendering round failed.")
+
+    def _refresh_after(self, method: str) -> float:
+        cache = self.webrender.render_cache
+        return (cache.source_ttl if method == "source" else cache.ttl) * self.refresh_ratio
+
+    async def run_round(self):
+        self.last_round = time.time()
+        cache = self.webrender.render_cache
+        if not cache or self.webrender.remote_only or not await self.webrender.browser.check_status():
+            return
+        now = time.monotonic()
+        for _key, _score, entry in self.popularity.top(self.top_k, self.min_score):
+            method, options, last_rendered = entry[2], entry[3], entry[4]
+            if now - last_rendered < self._refresh_after(method):
+                continue
+            if self.webrender.active_renders > self.max_active_renders:
+                self.skipped_busy += 1
+                return
+            entry[4] = time.monotonic()
+            try:
+                with deadline_scope(self.timeout), conditional_scope() as conditional:
+                    conditional.refresh = True
+                    await getattr(self.webrender, method)(options)
+                self.prerendered += 1
+            except Exception:
+                self.failures += 1
+                self.webrender.logger.warning(f"Pre-rendering {method} failed.")
+
+    def stats(self) -> dict:
+        return {
+            "top_k": self.top_k,
+            "running": bool(self._task and not self._task.done()),
+            "tracked_keys": len(self.popularity.entries),
+            "prerendered": self.prerendered,
+            "failures": self.failures,
+            "skipped_busy": self.skipped_busy,
+            "last_round": self.last_round,
+        }
@@ -0,0 +1,116 @@
+from collections.abc import AsyncIterator, Awaitable, Callable
+from http.cookiejar import Cookie
+
+import httpx
+
+from .exceptions import ResponseTooLarge
+
+raw_stream_chunk_size = 64 * 1024
+# Per-operation timeout in seconds for streamed fetches without a request deadline.
+raw_stream_timeout = 30
+upstream_status_header = "X-WebRender-Upstream-Status"
+
+
+class RawStream:
+    """
+    A streamed ``get_raw`` response. ``status`` and ``content_type`` describe the upstream response, and iterating
+    the object yields the body in chunks. The stream is closed once iteration ends; call :meth:`aclose` when
+    abandoning it early.
+    """
+
+    def __init__(
+        self,
+        status: int,
+        content_type: str,
+        chunks: AsyncIterator[bytes],
+        close: Callable[[], Awaitable[None]],
+        max_size: int | None = None,
+    ):
+        self.status = status
+        self.content_type = content_type
+        self.max_size = max_size
+        self.bytes_read = 0
+        self._chunks = chunks
+        self._close = close
+        self._closed = False
+
+    async def __aiter__(self):
+        try:
+            async for chunk in self._chunks:
+                self.bytes_read += len(chunk)
+                if self.max_size and self.bytes_read > self.max_size:
+                    raise ResponseTooLarge(f"Response body exceeds {self.max_size} bytes")
+                yield chunk
+        finally:
+            await self.aclose()
+
+    async def aclose(self):
+        if not self._closed:
+            self._closed = True
+            await self._close()
+
+
+async def open_http_stream(
+    method: str,
+    url: str,
+    *,
+    timeout: float | None,
+    max_size: int | None = None,
+    headers: dict | None = None,
+    cookies: httpx.Cookies | None = None,
+    json=None,
+    transport: httpx.AsyncBaseTransport | None = None,
+) -> tuple[httpx.Response, RawStream]:
+    """Send a request and return the response with its body wrapped as a :class:`RawStream`."""
+    transport_options = {"transport": transport} if transport else {}
+    client = httpx.AsyncClient(timeout=timeout, follow_redirects=True, cookies=cookies, **transport_options)
+    try:
+        response = await client.send(client.build_request(method, url, headers=headers, json=json), stream=True)
+    except BaseException:
+        await client.aclose()
+        raise
+
+    async def close():
+        await response.aclose()
+        await client.aclose()
+
+    content_length = response.headers.get("content-length")
+    if max_size and content_length and content_length.isdigit() and int(content_length) > max_size:
+        await close()
+        raise ResponseTooLarge(f"Response body of {content_length} bytes exceeds {max_size} bytes")
+    stream = RawStream(
+        status=response.status_code,
+        content_type=response.headers.get("content-type", "application/octet-stream"),
+        chunks=response.aiter_bytes(raw_stream_chunk_size),
+        close=close,
+        max_size=max_size,
+    )
+    return response, stream
+
+
+def cookies_to_jar(cookies: list[dict]) -> httpx.Cookies:
+    """Copy Playwright context cookies into an httpx jar, keeping their domain and path scope."""
+    jar = httpx.Cookies()
+    for cookie in cookies:
+        domain = cookie.get("domain", "")
+        jar.jar.set_cookie(
+            Cookie(
+                version=0,
+                name=cookie["name"],
+                value=cookie["value"],
+                port=None,
+                port_specified=False,
+                domain=domain,
+                domain_specified=bool(domain),
+                domain_initial_dot=domain.startswith("."),
+                path=cookie.get("path", "/"),
+                path_specified=True,
+                secure=cookie.get("secure", False),
+                expires=None,
+                discard=True,
+                comment=None,
+                comment_url=None,
+                rest={},
+            )
+        )
+    return jar
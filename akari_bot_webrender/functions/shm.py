@@ -0,0 +1,92 @@
+import base64
+import os
+import re
+import secrets
+import tempfile
+import time
+from pathlib import Path
+
+from .slices import SliceBuffer, slice_bytes
+
+slice_transport_header = "X-WebRender-Slice-Transport"
+_slice_name = re.compile(r"[0-9a-f]{32}\.bin")
+
+
+def default_shm_path() -> Path:
+    """A directory in shared memory where available, so handed-over slices never touch the disk."""
+    base = Path("/dev/shm")
+    if not base.is_dir():
+        base = Path(tempfile.gettempdir())
+    return base / "akari-bot-webrender"
+
+
+class SliceHandover:
+    def __init__(self, path: str | Path | None = None, min_size: int = 256 * 1024, ttl: float = 60):
+        """
+        Hands large screenshot slices to a client on the same host as files in shared memory, instead of inlining
+        them as base64 in the response. The client reads and deletes each file, see :func:`import_slices`.
+
+        :param path: Directory for the slice files, defaults to :func:`default_shm_path`.
+        :param min_size: Slices with less base64 text than this stay inline.
+        :param ttl: Seconds after which files a client never collected are deleted.
+        """
+        self.path = Path(path) if path else default_shm_path()
+        self.min_size = min_size
+        self.ttl = ttl
+        self._last_sweep = 0.0
+
+    def export(self, images: list[str] | SliceBuffer) -> list:
+        """
+        Replace large slices by ``{"shm": path, "size": bytes}`` references. Every slice of a capture that was
+        spilled to disk is handed over this way.
+        """
+        if isinstance(images, SliceBuffer):
+            self.path.mkdir(mode=0o711, parents=True, exist_ok=True)
+            self.sweep()
+            return [self._write(raw) for raw in slice_bytes(images)]
+        if not any(len(image) >= self.min_size for image in images):
+            return images
+        self.path.mkdir(mode=0o711, parents=True, exist_ok=True)
+        self.sweep()
+        return [image if len(image) < self.min_size else self._write(base64.b64decode(image)) for image in images]
+
+    def _write(self, raw: bytes) -> dict:
+        target = self.path / f"{secrets.token_hex(16)}.bin"
+        fd = os.open(target, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        with os.fdopen(fd, "wb") as f:
+            f.write(raw)
+        return {"shm": str(target), "size": len(raw)}
+
+    def sweep(self):
+        """Delete slice files older than ``ttl``, at most once per ``ttl / 2`` seconds."""
+        now = time.time()
+        if now - self._last_sweep < self.ttl / 2:
+            return
+        self._last_sweep = now
+        for entry in self.path.glob("*.bin"):
+            try:
+                if now - entry.stat().st_mtime > self.ttl:
+                    entry.unlink()
+            except OSError:
+                pass
+
+
+def import_slices(items: list, path: str | Path | None = None) -> list[str]:
+    """
+    Resolve the slice references of a response produced by :meth:`SliceHandover.export` back to base64 strings,
+    deleting the files. Only files directly inside ``path`` are accepted.
+    """
+    directory = (Path(path) if path else default_shm_path()).resolve()
+    images = []
+    for item in items:
+        if not isinstance(item, dict):
+            images.append(item)
+            continue
+        target = Path(item["shm"])
+        if target.parent.resolve() != directory or not _slice_name.fullmatch(target.name):
+            raise ValueError(f"Refusing to read slice outside {directory}: {target}")
+        try:
+            images.append(base64.b64encode(target.read_bytes()).decode())
+        finally:
+            target.unlink(missing_ok=True)
+    return images
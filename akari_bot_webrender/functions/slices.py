@@ -0,0 +1,105 @@
+import base64
+import os
+import tempfile
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+# Whether captures taken in the current context may be returned as a spilled SliceBuffer, see :func:`spill_scope`.
+slice_spill: ContextVar[bool] = ContextVar("slice_spill", default=False)
+
+
+@contextmanager
+def spill_scope():
+    """
+    Let the captures taken inside move their slices to disk past ``slice_memory_threshold`` and return a
+    :class:`SliceBuffer`, which the caller has to :meth:`~SliceBuffer.close` once sent. Outside of it,
+    :meth:`WebRender.make_screenshot` always returns a list.
+    """
+    token = slice_spill.set(True)
+    try:
+        yield
+    finally:
+        slice_spill.reset(token)
+
+
+class SliceBuffer(Sequence):
+    def __init__(self, memory_threshold: int = 32 * 1024 * 1024, directory: str | Path | None = None):
+        """
+        Collects the slices of a capture. Slices stay in memory until they add up to more than
+        ``memory_threshold`` bytes, then all of them move to an anonymous temporary file, so a capture of any
+        length holds only the slice being written or read in memory. Reading gives the slices as base64 strings,
+        like the list :meth:`WebRender.make_screenshot` returns for shorter captures, see :meth:`result` and
+        :func:`spill_scope`.
+
+        :param memory_threshold: Bytes of slices to keep in memory, ``0`` never spills to disk.
+        :param directory: Where to create the temporary file, defaults to the system temporary directory.
+        """
+        self.memory_threshold = memory_threshold
+        self.directory = directory
+        self.size = 0
+        self._memory: list[bytes] = []
+        self._file = None
+        self._offsets: list[tuple[int, int]] = []
+
+    @property
+    def spilled(self) -> bool:
+        return self._file is not None
+
+    def append(self, data: bytes):
+        if self._file is None and self.memory_threshold and self.size + len(data) > self.memory_threshold:
+            # Already unlinked on POSIX, so the file goes away with the buffer even if the process dies.
+            self._file = tempfile.TemporaryFile(dir=self.directory)
+            for held in self._memory:
+                self._write(held)
+            self._memory = []
+        if self._file is None:
+            self._memory.append(data)
+        else:
+            self._write(data)
+        self.size += len(data)
+
+    def _write(self, data: bytes):
+        offset = self._offsets[-1][0] + self._offsets[-1][1] if self._offsets else 0
+        os.pwrite(self._file.fileno(), data, offset)
+        self._offsets.append((offset, len(data)))
+
+    def raw(self, index: int) -> bytes:
+        if self._file is None:
+            return self._memory[index]
+        offset, length = self._offsets[index]
+        return os.pread(self._file.fileno(), length, offset)
+
+    def __len__(self) -> int:
+        return len(self._offsets) if self._file is not None else len(self._memory)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        return base64.b64encode(self.raw(index)).decode()
+
+    def result(self) -> "list[str] | SliceBuffer":
+        """A plain list of base64 strings while the slices are in memory, otherwise the buffer itself."""
+        return self if self.spilled else list(self)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+        self._memory = []
+
+
+def slice_bytes(images: Sequence[str]) -> Iterator[bytes]:
+    """The raw bytes of each slice, without decoding a spilled capture's base64 on the way."""
+    for index, image in enumerate(images):
+        yield images.raw(index) if isinstance(images, SliceBuffer) else base64.b64decode(image)
+
+
+def iter_json_slices(images: Sequence[str]) -> Iterator[bytes]:
+    """``images`` as a JSON array, one slice at a time, for streaming a spilled capture in a response."""
+    yield b"["
+    for index in range(len(images)):
+        yield (b',"' if index else b'"') + images[index].encode() + b'"'
+    yield b"]"
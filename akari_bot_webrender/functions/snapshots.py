@@ -0,0 +1,98 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import NamedTuple
+
+import orjson as json
+
+
+def page_snapshot_key(
+    url: str,
+    width: int,
+    height: int,
+    locale: str,
+    stealth: bool,
+    wait_until: str,
+    wait_after_load: int = 0,
+    css: str | None = None,
+) -> str:
+    """
+    Loaded pages can be shared by requests for the same URL that would get the same browser context and wait for
+    the page in the same way. The snapshot is taken after ``css`` is injected, so it is part of the key too.
+    """
+    return json.dumps([url, width, height, locale, stealth, wait_until, wait_after_load, css]).decode()
+
+
+class PageLoad(NamedTuple):
+    validator: str | None
+    # The page was restored from a snapshot, which already has the injected CSS and waited for the page to settle.
+    restored: bool = False
+    # Set when the page was navigated and a snapshot should be taken under this key once it is ready.
+    snapshot_key: str | None = None
+
+
+@dataclass
+class PageSnapshot:
+    html: str
+    validator: str | None
+    size: int
+    expires: float
+
+
+class PageSnapshotCache:
+    def __init__(self, ttl: float = 60, max_bytes: int = 64 * 1024 * 1024):
+        """
+        DOM snapshots of freshly navigated pages, so element and section requests for a page that was loaded a
+        moment ago restore it with ``set_content`` instead of loading it again. Snapshots are short-lived and the
+        least recently used are dropped once their total size exceeds ``max_bytes``.
+
+        :param ttl: Seconds a snapshot is reused after the navigation it was taken from.
+        :param max_bytes: Total size of the HTML of all snapshots to keep.
+        """
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.snapshots: OrderedDict[str, PageSnapshot] = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def get(self, key: str) -> PageSnapshot | None:
+        snapshot = self.snapshots.get(key)
+        if snapshot is not None and snapshot.expires <= time.monotonic():
+            self._remove(key)
+            snapshot = None
+        if snapshot is None:
+            self.misses += 1
+            return None
+        self.snapshots.move_to_end(key)
+        self.hits += 1
+        return snapshot
+
+    def put(self, key: str, html: str, validator: str | None = None):
+        size = len(html.encode())
+        if size > self.max_bytes // 4:
+            return
+        if key in self.snapshots:
+            self._remove(key)
+        now = time.monotonic()
+        for expired in [key for key, snapshot in self.snapshots.items() if snapshot.expires <= now]:
+            self._remove(expired)
+        self.snapshots[key] = PageSnapshot(html, validator, size, now + self.ttl)
+        self.total_bytes += size
+        while self.total_bytes > self.max_bytes:
+            self._remove(next(iter(self.snapshots)))
+            self.evicted += 1
+
+    def _remove(self, key: str):
+        self.total_bytes -= self.snapshots.pop(key).size
+
+    def stats(self) -> dict:
+        return {
+            "snapshots": len(self.snapshots),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evicted": self.evicted,
+        }
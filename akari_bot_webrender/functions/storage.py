@@ -0,0 +1,64 @@
+import hashlib
+import os
+import re
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import orjson as json
+
+
+def site_for_url(url: str | None) -> str | None:
+    """The storage scope of ``url``: its lowercased host name, or ``None`` for non-HTTP URLs."""
+    if not url:
+        return None
+    parts = urlsplit(url)
+    if parts.scheme not in {"http", "https"} or not parts.hostname:
+        return None
+    return parts.hostname.lower()
+
+
+def _domain_applies(domain: str, site: str) -> bool:
+    domain = domain.lstrip(".").lower()
+    return site == domain or site.endswith("." + domain)
+
+
+def scope_storage_state(state: dict, site: str) -> dict:
+    """Drop cookies and origins from ``state`` that the browser would never send to or expose on ``site``."""
+    return {
+        "cookies": [cookie for cookie in state.get("cookies", []) if _domain_applies(cookie.get("domain", ""), site)],
+        "origins": [origin for origin in state.get("origins", []) if site_for_url(origin.get("origin")) == site],
+    }
+
+
+class StorageStateStore:
+    def __init__(self, path: str | Path):
+        """
+        Browser storage state (cookies and local storage) persisted per site, so solved anti-bot challenges and
+        sessions survive restarts. Each site is stored in its own file and only ever loaded into its own context.
+
+        :param path: Directory holding one JSON file per site.
+        """
+        self.path = Path(path)
+
+    def _file(self, site: str) -> Path:
+        if re.fullmatch(r"[a-z0-9.-]{1,200}", site) and not site.startswith("."):
+            name = site
+        else:
+            name = hashlib.sha256(site.encode()).hexdigest()
+        return self.path / f"{name}.json"
+
+    def load(self, site: str) -> dict | None:
+        try:
+            state = json.loads(self._file(site).read_bytes())
+        except (OSError, json.JSONDecodeError):
+            return None
+        return scope_storage_state(state, site)
+
+    def save(self, site: str, state: dict):
+        self.path.mkdir(parents=True, exist_ok=True)
+        target = self._file(site)
+        temp = target.with_suffix(".tmp")
+        fd = os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(json.dumps(scope_storage_state(state, site)))
+        os.replace(temp, target)
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+from functools import cache
+from typing import TYPE_CHECKING
+
+import orjson as json
+
+from ..constants import templates_path
+
+if TYPE_CHECKING:
+    from jinja2 import Environment
+
+
+# Templates and jinja2 are loaded on first use, so importing the package stays cheap for remote-only clients.
+@cache
+def template_env() -> Environment:
+    from jinja2 import Environment, FileSystemLoader
+
+    return Environment(loader=FileSystemLoader(templates_path), autoescape=True, enable_async=True)
+
+
+@cache
+def read_template(name: str) -> str:
+    return (templates_path / name).read_text(encoding="utf-8")
+
+
+@cache
+def page_stylesheet() -> str:
+    """``custom.css``, the stylesheet every rendered page gets."""
+    return read_template("custom.css")
+
+
+@cache
+def context_init_script() -> str:
+    """Init script registered once per browser context, which installs :func:`page_stylesheet` on every page."""
+    return f"({read_template('context_init.js')})({json.dumps({'css': page_stylesheet()}).decode()});"
+
+
+@cache
+def content_style_tag() -> str:
+    """
+    :func:`page_stylesheet` as a ``<style>`` element for ``set_content`` renders, which replace the document
+    without running init scripts. Appended to the content, it lands at the end of the body.
+    """
+    return f"<style>{page_stylesheet()}</style>"
@@ -0,0 +1,172 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+from .deadline import remaining_time, with_deadline
+from .exceptions import DeadlineExceeded
+
+
+@dataclass
+class HostLimit:
+    rate: float = 0
+    burst: int = 5
+    max_concurrency: int = 0
+
+
+class _HostState:
+    def __init__(self, limit: HostLimit):
+        self.limit = limit
+        self.tokens = float(limit.burst)
+        self.refilled = time.monotonic()
+        self.last_used = self.refilled
+        self.in_flight = 0
+        self.waiting = 0
+        self.condition = asyncio.Condition()
+        self.requests = 0
+        self.throttled = 0
+        self.rejected = 0
+        self.rate_limited = 0
+        self.wait_seconds = 0.0
+        self.max_wait = 0.0
+
+    def reserve_token(self) -> float:
+        """Take a token, and return how many seconds to wait until it is actually available."""
+        if not self.limit.rate:
+            return 0
+        now = time.monotonic()
+        self.tokens = min(self.limit.burst, self.tokens + (now - self.refilled) * self.limit.rate)
+        self.refilled = now
+        self.tokens -= 1
+        return max(0.0, -self.tokens / self.limit.rate)
+
+    def idle(self) -> bool:
+        if self.in_flight or self.waiting:
+            return False
+        # Tokens are only refilled when one is taken, so count what has accrued since.
+        tokens = self.tokens + (time.monotonic() - self.refilled) * self.limit.rate
+        return tokens >= self.limit.burst - 1
+
+    def stats(self) -> dict:
+        return {
+            "rate": self.limit.rate,
+            "max_concurrency": self.limit.max_concurrency,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "rejected": self.rejected,
+            "rate_limited": self.rate_limited,
+            "wait_seconds": round(self.wait_seconds, 3),
+            "max_wait": round(self.max_wait, 3),
+        }
+
+
+class HostThrottle:
+    def __init__(
+        self,
+        rate: float = 2,
+        burst: int = 5,
+        max_concurrency: int = 4,
+        hosts: dict[str, dict] | None = None,
+        max_hosts: int = 1024,
+    ):
+        """
+        Per target host token bucket and concurrency limit for navigations and fetches, so bulk jobs against one
+        site do not run into its rate limits or challenge pages. Waiting counts against the request deadline, and a
+        request whose deadline would pass before its turn fails right away.
+
+        :param rate: Requests per second to each host, ``0`` means no rate limit.
+        :param burst: Requests a host may receive at once after being idle.
+        :param max_concurrency: Concurrent requests to each host, ``0`` means no limit.
+        :param hosts: Limits overriding the defaults above for a domain and its subdomains, e.g.
+            ``{"wiki.example": {"rate": 0.5, "max_concurrency": 1}}``. The longest matching domain wins.
+        :param max_hosts: Idle hosts beyond this many are forgotten.
+        """
+        self.default = HostLimit(rate=rate, burst=burst, max_concurrency=max_concurrency)
+        self.domains = {
+            domain.lower().lstrip("."): HostLimit(
+                **({"rate": rate, "burst": burst, "max_concurrency": max_concurrency} | limit)
+            )
+            for domain, limit in (hosts or {}).items()
+        }
+        self.max_hosts = max_hosts
+        self.hosts: dict[str, _HostState] = {}
+
+    def limit_for(self, host: str) -> HostLimit:
+        labels = host.split(".")
+        for i in range(len(labels)):
+            limit = self.domains.get(".".join(labels[i:]))
+            if limit is not None:
+                return limit
+        return self.default
+
+    def _state(self, host: str) -> _HostState:
+        state = self.hosts.get(host)
+        if state is None:
+            if len(self.hosts) >= self.max_hosts:
+                idle = sorted((s.last_used, h) for h, s in self.hosts.items() if s.idle())
+                for _last_used, idle_host in idle[: len(self.hosts) - self.max_hosts + 1]:
+                    del self.hosts[idle_host]
+            state = self.hosts[host] = _HostState(self.limit_for(host))
+        state.last_used = time.monotonic()
+        return state
+
+    @asynccontextmanager
+    async def slot(self, url: str):
+        """Wait for the turn of ``url``'s host, and hold one of its concurrent request slots inside the block."""
+        host = urlsplit(url).hostname
+        if not host:
+            yield
+            return
+        state = self._state(host.lower())
+        state.requests += 1
+        started = time.monotonic()
+        limit = state.limit
+        async with state.condition:
+            if limit.max_concurrency and state.in_flight >= limit.max_concurrency:
+                state.waiting += 1
+                try:
+                    await with_deadline(state.condition.wait_for(lambda: state.in_flight < limit.max_concurrency))
+                except DeadlineExceeded:
+                    state.rejected += 1
+                    raise
+                finally:
+                    state.waiting -= 1
+            state.in_flight += 1
+        try:
+            delay = state.reserve_token()
+            if delay:
+                remaining = remaining_time()
+                if remaining is not None and remaining <= delay:
+                    state.tokens += 1
+                    state.rejected += 1
+                    raise DeadlineExceeded
+                await asyncio.sleep(delay)
+            waited = time.monotonic() - started
+            if waited > 0.001:
+                state.throttled += 1
+                state.wait_seconds += waited
+                state.max_wait = max(state.max_wait, waited)
+            yield
+        finally:
+            async with state.condition:
+                state.in_flight -= 1
+                state.condition.notify()
+
+    def record_status(self, url: str, status: int):
+        """Count responses telling us to slow down, so hosts needing a stricter limit show up in the stats."""
+        host = urlsplit(url).hostname
+        if status in {429, 503} and host and host.lower() in self.hosts:
+            self.hosts[host.lower()].rate_limited += 1
+
+    def stats(self, top: int = 20) -> dict:
+        busiest = sorted(self.hosts.items(), key=lambda item: item[1].requests, reverse=True)[:top]
+        return {
+            "rate": self.default.rate,
+            "burst": self.default.burst,
+            "max_concurrency": self.default.max_concurrency,
+            "tracked_hosts": len(self.hosts),
+            "hosts": {host: state.stats() for host, state in busiest},
+        }
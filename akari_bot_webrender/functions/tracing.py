@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import random
+import re
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from .metrics import metrics_host
+
+if TYPE_CHECKING:
+    from playwright.async_api import BrowserContext, Page
+
+_trace_name = re.compile(r"[\w.-]+\.zip")
+
+
+@dataclass
+class TraceSession:
+    context: BrowserContext
+    url: str | None
+
+
+class TraceRecorder:
+    def __init__(
+        self,
+        path: str | Path,
+        sample_rate: float = 0.05,
+        slow_threshold: float = 20,
+        max_traces: int = 50,
+        max_bytes: int = 512 * 1024 * 1024,
+        logger=None,
+    ):
+        """
+        Records Playwright traces (screenshots, DOM snapshots, network and console) of a sample of renders, and
+        keeps those of renders that failed or took at least ``slow_threshold`` seconds. Traces of the other renders
+        are discarded. Tracing is per browser context, so a context already being traced is not traced again, and
+        the trace also contains other pages that rendered in the same context meanwhile.
+
+        :param path: Directory the kept traces are written to. The oldest are deleted beyond the limits below.
+        :param sample_rate: Share of renders to trace.
+        :param slow_threshold: Seconds after which a traced render is kept although it succeeded.
+        :param max_traces: Traces to keep.
+        :param max_bytes: Total size of the traces to keep.
+        """
+        self.path = Path(path)
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold
+        self.max_traces = max_traces
+        self.max_bytes = max_bytes
+        self.logger = logger
+        self.traced = 0
+        self.kept = 0
+        self.discarded = 0
+        self.errors = 0
+        self._active: set = set()
+
+    async def start(self, page: Page, url: str | None) -> TraceSession | None:
+        """Start tracing the context of ``page`` if this render is sampled."""
+        if random.random() >= self.sample_rate:
+            return None
+        context = page.context
+        if context in self._active:
+            return None
+        self._active.add(context)
+        try:
+            await context.tracing.start(screenshots=True, snapshots=True, title=url)
+        except Exception:
+            self._active.discard(context)
+            self.errors += 1
+            return None
+        self.traced += 1
+        return TraceSession(context, url)
+
+    async def stop(self, session: TraceSession, duration: float, failed: bool = False, discard: bool = False):
+        """Stop tracing, and write the trace if the render failed or was slow."""
+        reason = None
+        if not discard:
+            reason = "failed" if failed else "slow" if duration >= self.slow_threshold else None
+        try:
+            if reason is None:
+                await session.context.tracing.stop()
+                self.discarded += 1
+                return
+            self.path.mkdir(parents=True, exist_ok=True)
+            name = f"{time.strftime('%Y%m%dT%H%M%S')}-{reason}-{metrics_host(session.url)}-{uuid.uuid4().hex[:8]}"
+            name = re.sub(r"[^\w.-]", "_", name) + ".zip"
+            await session.context.tracing.stop(path=self.path / name)
+            self.kept += 1
+            if self.logger:
+                self.logger.info(f"Kept trace of a {reason} render ({duration:.1f}s): {name}")
+            self._rotate()
+        except Exception:
+            self.errors += 1
+            if self.logger:
+                self.logger.exception("Failed to save Playwright trace:")
+        finally:
+            self._active.discard(session.context)
+
+    def _rotate(self):
+        traces = sorted(self.path.glob("*.zip"), key=lambda trace: trace.stat().st_mtime, reverse=True)
+        total = 0
+        for index, trace in enumerate(traces):
+            total += trace.stat().st_size
+            if index >= self.max_traces or total > self.max_bytes:
+                trace.unlink(missing_ok=True)
+
+    def list(self) -> list[dict]:
+        """Kept traces, newest first."""
+        traces = []
+        for trace in self.path.glob("*.zip"):
+            stat = trace.stat()
+            traces.append({"name": trace.name, "size": stat.st_size, "created": stat.st_mtime})
+        return sorted(traces, key=lambda trace: trace["created"], reverse=True)
+
+    def get(self, name: str) -> Path | None:
+        if not _trace_name.fullmatch(name):
+            return None
+        trace = self.path / name
+        return trace if trace.is_file() else None
+
+    def stats(self) -> dict:
+        return {
+            "sample_rate": self.sample_rate,
+            "slow_threshold": self.slow_threshold,
+            "traced": self.traced,
+            "kept": self.kept,
+            "discarded": self.discarded,
+            "errors": self.errors,
+            "active": len(self._active),
+        }
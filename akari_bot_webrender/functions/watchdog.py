@@ -0,0 +1,143 @@
+import asyncio
+import os
+import time
+from pathlib import Path
+
+
+def process_tree_rss(root_pid: int | None = None) -> int | None:
+    """
+    Approximate resident memory in bytes of every descendant of ``root_pid`` (defaults to this process), which
+    covers the Playwright driver and all browser processes. Shared pages are counted once per process.
+    Returns ``None`` where ``/proc`` is unavailable.
+    """
+    proc = Path("/proc")
+    if not proc.is_dir():
+        return None
+    root_pid = os.getpid() if root_pid is None else root_pid
+    children: dict[int, list[int]] = {}
+    rss: dict[int, int] = {}
+    for entry in proc.iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            status = (entry / "status").read_text()
+        except OSError:
+            continue
+        ppid = None
+        for line in status.splitlines():
+            if line.startswith("PPid:"):
+                ppid = int(line.split()[1])
+            elif line.startswith("VmRSS:"):
+                rss[int(entry.name)] = int(line.split()[1]) * 1024
+        if ppid is not None:
+            children.setdefault(ppid, []).append(int(entry.name))
+
+    total = 0
+    pending = list(children.get(root_pid, []))
+    while pending:
+        pid = pending.pop()
+        total += rss.get(pid, 0)
+        pending.extend(children.get(pid, []))
+    return total
+
+
+class BrowserWatchdog:
+    def __init__(
+        self,
+        browser,
+        interval: float = 30,
+        probe_timeout: float = 10,
+        failure_threshold: int = 2,
+        recycle_after_pages: int = 0,
+        recycle_memory_mb: float = 0,
+    ):
+        """
+        :param browser: The :class:`Browser` to supervise.
+        :param interval: Seconds between health checks.
+        :param probe_timeout: Seconds a trivial probe render may take before it counts as a failure.
+        :param failure_threshold: Consecutive failed probes before the browser is recycled.
+        :param recycle_after_pages: Recycle after this many pages were opened, ``0`` disables the limit.
+        :param recycle_memory_mb: Recycle once the browser process tree exceeds this RSS, ``0`` disables the limit.
+        """
+        self.browser = browser
+        self.interval = interval
+        self.probe_timeout = probe_timeout
+        self.failure_threshold = failure_threshold
+        self.recycle_after_pages = recycle_after_pages
+        self.recycle_memory_mb = recycle_memory_mb
+        self.consecutive_failures = 0
+        self.recycles = 0
+        self.last_check: float | None = None
+        self.last_recycle_reason: str | None = None
+        self._task: asyncio.Task | None = None
+        self._wakeup = asyncio.Event()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    def wake(self):
+        """Run the next check immediately, e.g. right after the browser disconnected."""
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.check()
+            except Exception:
+                self.browser.logger.exception("Browser watchdog check failed.")
+
+    async def check(self):
+        self.last_check = time.time()
+        if not self.browser.playwright:
+            return
+        reason = None
+        if not await self.browser.check_status():
+            reason = "browser disconnected"
+        elif not await self.browser.probe(self.probe_timeout):
+            self.consecutive_failures += 1
+            self.browser.logger.warning(
+                f"Browser health probe failed ({self.consecutive_failures}/{self.failure_threshold})."
+            )
+            if self.consecutive_failures >= self.failure_threshold:
+                reason = "health probe failed"
+        else:
+            self.consecutive_failures = 0
+            if self.recycle_after_pages and self.browser.pages_served >= self.recycle_after_pages:
+                reason = f"served {self.browser.pages_served} pages"
+            elif self.recycle_memory_mb:
+                # Walking /proc reads a file per process, which takes a while with many renderers open.
+                rss = await asyncio.to_thread(process_tree_rss)
+                if rss is not None and rss > self.recycle_memory_mb * 1024 * 1024:
+                    reason = f"memory usage {rss // (1024 * 1024)} MB"
+
+        if reason:
+            self.browser.logger.warning(f"Recycling browser: {reason}.")
+            if await self.browser.recycle():
+                self.recycles += 1
+                self.consecutive_failures = 0
+                self.last_recycle_reason = reason
+
+    def stats(self) -> dict:
+        return {
+            "interval": self.interval,
+            "running": bool(self._task and not self._task.done()),
+            "last_check": self.last_check,
+            "consecutive_failures": self.consecutive_failures,
+            "recycles": self.recycles,
+            "last_recycle_reason": self.last_recycle_reason,
+        }
@@ -1,13 +1,32 @@
+import asyncio
+import base64
+import math
 import os
-from contextlib import asynccontextmanager
+import socket
+import stat
+import time
+from collections.abc import Iterator
+from contextlib import asynccontextmanager, suppress
 from pathlib import Path
 
 import orjson as json
-from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import FileResponse, ORJSONResponse
-
-from ..functions.exceptions import ElementNotFound, RequiredURL
-from ..functions.main import WebRender, remote_fallback_header, remote_fallback_hop
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, ORJSONResponse, PlainTextResponse, Response, StreamingResponse
+from pydantic import ValidationError
+
+from ..functions.blobs import BlobStore, blob_media_type
+from ..functions.cache import RedisCacheBackend, conditional_scope
+from ..functions.deadline import deadline_header, request_deadline
+from ..functions.exceptions import (
+    DeadlineExceeded,
+    ElementNotFound,
+    NotModified,
+    RequiredURL,
+    ResourceLimitExceeded,
+    ResponseTooLarge,
+)
+from ..functions.main import WebRender, conditional_methods, remote_fallback_header, remote_fallback_hop
+from ..functions.multiplex import encode_slice, progress_scope
 from ..functions.options import (
     ElementScreenshotOptions,
     LegacyScreenshotOptions,
@@ -17,6 +36,9 @@ from ..functions.options import (
     SourceOptions,
     StatusOptions,
 )
+from ..functions.raw_stream import upstream_status_header
+from ..functions.shm import SliceHandover, slice_transport_header
+from ..functions.slices import SliceBuffer, iter_json_slices, slice_bytes, spill_scope
 
 with open("config.json", "r") as f:
     config = json.loads(f.read())["server"]
@@ -50,10 +72,88 @@ config["executable_path"] = env_value("WEBRENDER_EXECUTABLE_PATH", config.get("e
 remote_webrender_url = env_value("WEBRENDER_REMOTE_URL", config.get("remote_webrender_url"))
 config["remote_webrender_url"] = remote_webrender_url.strip() if remote_webrender_url else None
 config["remote_only"] = env_bool("WEBRENDER_REMOTE_ONLY", config.get("remote_only", False))
+config["remote_uds_path"] = env_value("WEBRENDER_REMOTE_UDS_PATH", config.get("remote_uds_path")) or None
+config["remote_shm_handover"] = env_bool("WEBRENDER_REMOTE_SHM_HANDOVER", config.get("remote_shm_handover", False))
+config["uds_path"] = env_value("WEBRENDER_UDS_PATH", config.get("uds_path")) or None
+config["shm_path"] = env_value("WEBRENDER_SHM_PATH", config.get("shm_path")) or None
+config["shm_min_slice_size"] = int(
+    env_value("WEBRENDER_SHM_MIN_SLICE_SIZE", config.get("shm_min_slice_size", 256 * 1024))
+)
+config["blob_store_path"] = env_value("WEBRENDER_BLOB_STORE_PATH", config.get("blob_store_path")) or None
+config["blob_store_max_bytes"] = int(
+    env_value("WEBRENDER_BLOB_STORE_MAX_BYTES", config.get("blob_store_max_bytes", 1024 * 1024 * 1024))
+)
 config["remote_timeout"] = float(env_value("WEBRENDER_REMOTE_TIMEOUT", config.get("remote_timeout", 30)))
+config["remote_transport"] = env_value("WEBRENDER_REMOTE_TRANSPORT", config.get("remote_transport", "http"))
+config["watchdog_interval"] = float(env_value("WEBRENDER_WATCHDOG_INTERVAL", config.get("watchdog_interval", 30)))
+config["recycle_after_pages"] = int(env_value("WEBRENDER_RECYCLE_AFTER_PAGES", config.get("recycle_after_pages", 0)))
+config["recycle_memory_mb"] = float(env_value("WEBRENDER_RECYCLE_MEMORY_MB", config.get("recycle_memory_mb", 0)))
+config["page_metrics"] = env_bool("WEBRENDER_PAGE_METRICS", config.get("page_metrics", False))
+config["storage_state_path"] = env_value("WEBRENDER_STORAGE_STATE_PATH", config.get("storage_state_path")) or None
+config["storage_state_interval"] = float(
+    env_value("WEBRENDER_STORAGE_STATE_INTERVAL", config.get("storage_state_interval", 300))
+)
+config["warmup"] = env_bool("WEBRENDER_WARMUP", config.get("warmup", True))
+config["warmup_contexts"] = config.get("warmup_contexts") or [{}]
+config["raw_max_size"] = int(env_value("WEBRENDER_RAW_MAX_SIZE", config.get("raw_max_size", 100 * 1024 * 1024)))
+config["render_cache_size"] = int(env_value("WEBRENDER_RENDER_CACHE_SIZE", config.get("render_cache_size", 64)))
+config["render_cache_max_bytes"] = int(
+    env_value("WEBRENDER_RENDER_CACHE_MAX_BYTES", config.get("render_cache_max_bytes", 256 * 1024 * 1024))
+)
+config["cache_backend"] = env_value("WEBRENDER_CACHE_BACKEND", config.get("cache_backend", "memory"))
+config["cache_redis_url"] = env_value("WEBRENDER_CACHE_REDIS_URL", config.get("cache_redis_url")) or None
+config["cache_ttl"] = float(env_value("WEBRENDER_CACHE_TTL", config.get("cache_ttl", 3600)))
+config["prerender_top_k"] = int(env_value("WEBRENDER_PRERENDER_TOP_K", config.get("prerender_top_k", 0)))
+config["prerender_interval"] = float(env_value("WEBRENDER_PRERENDER_INTERVAL", config.get("prerender_interval", 60)))
+config["max_concurrency"] = int(env_value("WEBRENDER_MAX_CONCURRENCY", config.get("max_concurrency", 0)))
+config["render_latency_target"] = float(
+    env_value("WEBRENDER_RENDER_LATENCY_TARGET", config.get("render_latency_target", 15))
+)
+config["hedge_percentile"] = float(env_value("WEBRENDER_HEDGE_PERCENTILE", config.get("hedge_percentile", 0)))
+config["hedge_initial_delay"] = float(env_value("WEBRENDER_HEDGE_INITIAL_DELAY", config.get("hedge_initial_delay", 10)))
+config["page_snapshot_ttl"] = float(env_value("WEBRENDER_PAGE_SNAPSHOT_TTL", config.get("page_snapshot_ttl", 0)))
+config["page_snapshot_max_bytes"] = int(
+    env_value("WEBRENDER_PAGE_SNAPSHOT_MAX_BYTES", config.get("page_snapshot_max_bytes", 64 * 1024 * 1024))
+)
+config["host_rate"] = float(env_value("WEBRENDER_HOST_RATE", config.get("host_rate", 0)))
+config["host_burst"] = int(env_value("WEBRENDER_HOST_BURST", config.get("host_burst", 5)))
+config["host_max_concurrency"] = int(env_value("WEBRENDER_HOST_MAX_CONCURRENCY", config.get("host_max_concurrency", 0)))
+config["host_limits"] = config.get("host_limits") or {}
+config["trace_path"] = env_value("WEBRENDER_TRACE_PATH", config.get("trace_path")) or None
+config["trace_sample_rate"] = float(env_value("WEBRENDER_TRACE_SAMPLE_RATE", config.get("trace_sample_rate", 0.05)))
+config["trace_slow_threshold"] = float(
+    env_value("WEBRENDER_TRACE_SLOW_THRESHOLD", config.get("trace_slow_threshold", 20))
+)
+config["slice_memory_threshold"] = int(
+    env_value("WEBRENDER_SLICE_MEMORY_THRESHOLD", config.get("slice_memory_threshold", 32 * 1024 * 1024))
+)
+config["slice_spill_path"] = env_value("WEBRENDER_SLICE_SPILL_PATH", config.get("slice_spill_path")) or None
+config["launch_profile"] = env_value("WEBRENDER_LAUNCH_PROFILE", config.get("launch_profile", "default"))
+config["max_page_bytes"] = int(env_value("WEBRENDER_MAX_PAGE_BYTES", config.get("max_page_bytes", 0)))
+config["max_page_requests"] = int(env_value("WEBRENDER_MAX_PAGE_REQUESTS", config.get("max_page_requests", 0)))
+config["max_dom_nodes"] = int(env_value("WEBRENDER_MAX_DOM_NODES", config.get("max_dom_nodes", 0)))
+config["max_js_heap_mb"] = float(env_value("WEBRENDER_MAX_JS_HEAP_MB", config.get("max_js_heap_mb", 0)))
+config["max_capture_height"] = int(env_value("WEBRENDER_MAX_CAPTURE_HEIGHT", config.get("max_capture_height", 0)))
+config["on_budget_exceeded"] = env_value("WEBRENDER_ON_BUDGET_EXCEEDED", config.get("on_budget_exceeded", "fail"))
+config["page_max_age"] = float(env_value("WEBRENDER_PAGE_MAX_AGE", config.get("page_max_age", 600)))
+config["log_mode"] = env_value("WEBRENDER_LOG_MODE", config.get("log_mode", "default"))
+config["log_sample_rate"] = float(env_value("WEBRENDER_LOG_SAMPLE_RATE", config.get("log_sample_rate", 0.1)))
+config["source_cache_ttl"] = float(env_value("WEBRENDER_SOURCE_CACHE_TTL", config.get("source_cache_ttl", 300)))
 
 if config["remote_only"] and not config["remote_webrender_url"]:
     raise ValueError("remote_only requires remote_webrender_url or WEBRENDER_REMOTE_URL")
+if not 0 <= config["hedge_percentile"] < 1:
+    raise ValueError("hedge_percentile must be at least 0 and less than 1")
+if config["remote_transport"] not in {"http", "websocket"}:
+    raise ValueError("remote_transport must be http or websocket")
+if config["on_budget_exceeded"] not in {"fail", "partial"}:
+    raise ValueError("on_budget_exceeded must be fail or partial")
+if config["log_mode"] not in {"default", "production"}:
+    raise ValueError("log_mode must be default or production")
+if config["cache_backend"] not in {"memory", "redis"}:
+    raise ValueError("cache_backend must be memory or redis")
+if config["cache_backend"] == "redis" and not config["cache_redis_url"]:
+    raise ValueError("The redis cache backend requires cache_redis_url or WEBRENDER_CACHE_REDIS_URL")
 
 
 webrender = WebRender(
@@ -64,7 +164,58 @@ webrender = WebRender(
     remote_webrender_url=config["remote_webrender_url"],
     remote_only=config["remote_only"],
     remote_timeout=config["remote_timeout"],
+    remote_uds_path=config["remote_uds_path"],
+    remote_transport=config["remote_transport"],
+    host_rate=config["host_rate"],
+    host_burst=config["host_burst"],
+    host_max_concurrency=config["host_max_concurrency"],
+    host_limits=config["host_limits"],
+    trace_path=config["trace_path"],
+    trace_sample_rate=config["trace_sample_rate"],
+    trace_slow_threshold=config["trace_slow_threshold"],
+    slice_memory_threshold=config["slice_memory_threshold"],
+    slice_spill_path=config["slice_spill_path"],
+    launch_profile=config["launch_profile"],
+    max_page_bytes=config["max_page_bytes"],
+    max_page_requests=config["max_page_requests"],
+    max_dom_nodes=config["max_dom_nodes"],
+    max_js_heap_mb=config["max_js_heap_mb"],
+    max_capture_height=config["max_capture_height"],
+    on_budget_exceeded=config["on_budget_exceeded"],
+    page_max_age=config["page_max_age"],
+    remote_shm_path=config["shm_path"],
+    remote_shm_handover=config["remote_shm_handover"],
+    watchdog_interval=config["watchdog_interval"],
+    recycle_after_pages=config["recycle_after_pages"],
+    recycle_memory_mb=config["recycle_memory_mb"],
+    page_metrics=config["page_metrics"],
+    raw_max_size=config["raw_max_size"],
+    storage_state_path=config["storage_state_path"],
+    storage_state_interval=config["storage_state_interval"],
+    render_cache_size=config["render_cache_size"],
+    render_cache_max_bytes=config["render_cache_max_bytes"],
+    cache_backend=RedisCacheBackend(config["cache_redis_url"]) if config["cache_backend"] == "redis" else None,
+    cache_ttl=config["cache_ttl"],
+    source_cache_ttl=config["source_cache_ttl"],
+    log_mode=config["log_mode"],
+    log_sample_rate=config["log_sample_rate"],
+    prerender_top_k=config["prerender_top_k"],
+    prerender_interval=config["prerender_interval"],
+    max_concurrency=config["max_concurrency"],
+    render_latency_target=config["render_latency_target"],
+    hedge_percentile=config["hedge_percentile"],
+    hedge_initial_delay=config["hedge_initial_delay"],
+    page_snapshot_ttl=config["page_snapshot_ttl"],
+    page_snapshot_max_bytes=config["page_snapshot_max_bytes"],
 )
+slice_handover = SliceHandover(config["shm_path"], min_size=config["shm_min_slice_size"])
+blob_store = (
+    BlobStore(config["blob_store_path"], max_bytes=config["blob_store_max_bytes"])
+    if config["blob_store_path"]
+    else None
+)
+# Blobs are addressed by content, so a URL always refers to the same bytes.
+blob_cache_control = "public, max-age=31536000, immutable"
 
 
 @asynccontextmanager
@@ -80,6 +231,10 @@ async def lifespan(app: FastAPI):
                 webrender.logger.warning("Local browser initialization failed; continuing with remote fallback only.")
             else:
                 raise RuntimeError("Failed to initialize WebRender browser")
+        elif config["warmup"] and not await webrender.warmup(config["warmup_contexts"]):
+            webrender.logger.warning("WebRender warm-up failed; the first requests may be slower.")
+        if initialized and webrender.prerenderer:
+            webrender.prerenderer.start()
     try:
         yield
     finally:
@@ -88,6 +243,10 @@ async def lifespan(app: FastAPI):
 
 app = FastAPI(lifespan=lifespan)
 
+# How often a running render checks whether its HTTP client is still connected, in seconds.
+disconnect_poll_interval = 0.5
+render_cache_header = "X-WebRender-Cache"
+
 
 @app.middleware("http")
 async def remote_fallback_hop_middleware(request: Request, call_next):
@@ -102,61 +261,368 @@ async def remote_fallback_hop_middleware(request: Request, call_next):
         remote_fallback_hop.reset(token)
 
 
+@app.middleware("http")
+async def deadline_middleware(request: Request, call_next):
+    try:
+        timeout = float(request.headers.get(deadline_header, ""))
+    except ValueError:
+        timeout = None
+    if timeout is None or not math.isfinite(timeout) or timeout <= 0:
+        return await call_next(request)
+    token = request_deadline.set(time.monotonic() + timeout)
+    try:
+        return await call_next(request)
+    finally:
+        request_deadline.reset(token)
+
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded):
+    return ORJSONResponse(status_code=504, content={"detail": "Request deadline exceeded"})
+
+
+@app.exception_handler(ResourceLimitExceeded)
+async def resource_limit_exceeded_handler(request: Request, exc: ResourceLimitExceeded):
+    return ORJSONResponse(status_code=422, content={"detail": str(exc) or "Page resource limit exceeded"})
+
+
+@app.exception_handler(NotModified)
+async def not_modified_handler(request: Request, exc: NotModified):
+    return Response(status_code=304, headers={"ETag": exc.etag})
+
+
+async def cancel_on_disconnect(request: Request, awaitable):
+    """Run ``awaitable`` and cancel it once the HTTP client disconnects, so its page is closed right away."""
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while not task.done():
+            await asyncio.wait({task}, timeout=disconnect_poll_interval)
+            if not task.done() and await request.is_disconnected():
+                webrender.logger.info("Client disconnected; cancelling the running request.")
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+                raise HTTPException(status_code=499, detail="Client closed request")
+        return task.result()
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+def is_unix_socket_request(request: Request) -> bool:
+    """Whether the request arrived over the Unix domain socket, so the client shares this host's filesystem."""
+    server = request.scope.get("server")
+    return bool(config["uds_path"]) and bool(server) and server[1] is None
+
+
+async def conditional_response(request: Request, awaitable) -> ORJSONResponse:
+    """Run a screenshot honouring ``If-None-Match`` and return its images with their ``ETag``."""
+    with conditional_scope(request.headers.get("if-none-match")) as conditional, spill_scope():
+        images = await cancel_on_disconnect(request, awaitable)
+    spilled = images if isinstance(images, SliceBuffer) else None
+    streamed = False
+    try:
+        slice_transport = request.headers.get(slice_transport_header)
+        if images and slice_transport == "shm" and is_unix_socket_request(request):
+            images = await asyncio.to_thread(slice_handover.export, images)
+        elif images and slice_transport == "url" and blob_store:
+            root_path = request.scope.get("root_path", "")
+            # Hashing and writing the slices, and reading a spilled capture back, stay off the event loop.
+            blob_hashes = await asyncio.to_thread(blob_store.put_many, slice_bytes(images))
+            images = [f"{root_path}/blob/{blob_hash}" for blob_hash in blob_hashes]
+        headers = {}
+        if conditional.etag:
+            headers["ETag"] = conditional.etag
+            headers[render_cache_header] = "hit" if conditional.cached else "miss"
+        if isinstance(images, SliceBuffer):
+            streamed = True
+            # Read back and sent one slice at a time, so the response never holds the whole capture in memory.
+            return StreamingResponse(stream_json_slices(images), media_type="application/json", headers=headers)
+        return ORJSONResponse(content=images, headers=headers)
+    finally:
+        # A streamed capture is closed by its stream; any other was copied out by now, or failed to be.
+        if spilled is not None and not streamed:
+            spilled.close()
+
+
+def stream_json_slices(images: SliceBuffer) -> Iterator[bytes]:
+    """Stream a spilled capture as a JSON array, and delete its temporary file once it was sent or abandoned."""
+    try:
+        yield from iter_json_slices(images)
+    finally:
+        images.close()
+
+
+async def send_slices(websocket: WebSocket, request_id: str, images: list[str] | SliceBuffer):
+    """
+    Send a capture as binary ``/ws/`` frames. Slices of a spilled capture are read back from disk off the event
+    loop, and its temporary file is deleted once they were sent or abandoned.
+    """
+    try:
+        for index in range(len(images)):
+            if isinstance(images, SliceBuffer):
+                raw = await asyncio.to_thread(images.raw, index)
+            else:
+                raw = base64.b64decode(images[index])
+            await websocket.send_bytes(encode_slice(request_id, index, raw))
+    finally:
+        if isinstance(images, SliceBuffer):
+            images.close()
+
+
 @app.post("/legacy_screenshot/")
-async def legacy_screenshot(options: LegacyScreenshotOptions):
+async def legacy_screenshot(options: LegacyScreenshotOptions, request: Request):
     try:
-        images = await webrender.legacy_screenshot(options)
+        return await conditional_response(request, webrender.legacy_screenshot(options))
     except ElementNotFound:
         raise HTTPException(status_code=404, detail="Element not found")
-    return ORJSONResponse(content=images)
 
 
 @app.post("/page/")
-async def page_screenshot(options: PageScreenshotOptions):
-    screenshot = await webrender.page_screenshot(options)
-    return ORJSONResponse(content=screenshot)
+async def page_screenshot(options: PageScreenshotOptions, request: Request):
+    return await conditional_response(request, webrender.page_screenshot(options))
 
 
 @app.post("/element_screenshot/")
-async def element_screenshot(options: ElementScreenshotOptions):
+async def element_screenshot(options: ElementScreenshotOptions, request: Request):
     try:
-        images = await webrender.element_screenshot(options)
+        return await conditional_response(request, webrender.element_screenshot(options))
     except ElementNotFound:
         raise HTTPException(status_code=404, detail="Element not found")
-    return ORJSONResponse(content=images)
 
 
 @app.post("/section_screenshot/")
-async def section_screenshot(options: SectionScreenshotOptions):
+async def section_screenshot(options: SectionScreenshotOptions, request: Request):
     try:
-        images = await webrender.section_screenshot(options)
+        return await conditional_response(request, webrender.section_screenshot(options))
     except ElementNotFound:
         raise HTTPException(status_code=404, detail="Section not found")
-    return ORJSONResponse(content=images)
 
 
 @app.post("/source/")
-async def source(options: SourceOptions):
+async def source(options: SourceOptions, request: Request):
     try:
-        source_content = await webrender.source(options)
+        source_content = await cancel_on_disconnect(request, webrender.source(options))
     except RequiredURL:
         raise HTTPException(status_code=400, detail="URL parameter is required")
     return ORJSONResponse(content=source_content)
 
 
 @app.post("/get_raw/")
-async def get_raw(options: RawOptions):
+async def get_raw(options: RawOptions, request: Request):
     try:
-        result = await webrender.get_raw(options)
+        if options.stream:
+            stream = await cancel_on_disconnect(request, webrender.get_raw_stream(options))
+            if stream is None:
+                return ORJSONResponse(content=None)
+            return StreamingResponse(
+                stream,
+                media_type=stream.content_type,
+                headers={upstream_status_header: str(stream.status)},
+            )
+        result = await cancel_on_disconnect(request, webrender.get_raw(options))
     except RequiredURL:
         raise HTTPException(status_code=400, detail="URL parameter is required")
+    except ResponseTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     return ORJSONResponse(content=result)
 
 
 @app.get("/status/")
 @app.post("/status/")
 async def status(options: StatusOptions | None = None):
-    return ORJSONResponse(content=await webrender.status(options))
+    content = await webrender.status(options)
+    if blob_store and isinstance(content, dict):
+        content["blob_store"] = blob_store.stats()
+    return ORJSONResponse(content=content)
+
+
+@app.get("/healthz")
+async def healthz():
+    content = await webrender.health()
+    return ORJSONResponse(status_code=200 if content["healthy"] else 503, content=content)
+
+
+def blob_file(blob_hash: str) -> tuple[Path, str] | None:
+    """The file of a stored blob and its media type, sniffed from the first bytes."""
+    path = blob_store.get(blob_hash)
+    if path is None:
+        return None
+    with open(path, "rb") as f:
+        return path, blob_media_type(f.read(8))
+
+
+@app.get("/blob/{blob_hash}")
+async def blob(blob_hash: str, request: Request):
+    found = await asyncio.to_thread(blob_file, blob_hash) if blob_store else None
+    if found is None:
+        raise HTTPException(status_code=404, detail="Blob not found")
+    headers = {"ETag": f'"{blob_hash}"', "Cache-Control": blob_cache_control}
+    if f'"{blob_hash}"' in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    path, media_type = found
+    return FileResponse(path, media_type=media_type, headers=headers)
+
+
+@app.get("/debug/traces/")
+async def traces():
+    if not webrender.trace_recorder:
+        raise HTTPException(status_code=404, detail="Tracing is disabled")
+    return ORJSONResponse(content=webrender.trace_recorder.list())
+
+
+@app.get("/debug/traces/{name}")
+async def trace(name: str):
+    path = webrender.trace_recorder.get(name) if webrender.trace_recorder else None
+    if path is None:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return FileResponse(path, media_type="application/zip", filename=name)
+
+
+# WebSocket endpoint name -> WebRender method and its options, matching the HTTP routes above.
+websocket_endpoints = {
+    "legacy_screenshot": ("legacy_screenshot", LegacyScreenshotOptions),
+    "page": ("page_screenshot", PageScreenshotOptions),
+    "element_screenshot": ("element_screenshot", ElementScreenshotOptions),
+    "section_screenshot": ("section_screenshot", SectionScreenshotOptions),
+    "source": ("source", SourceOptions),
+    "get_raw": ("get_raw", RawOptions),
+    "status": ("status", StatusOptions),
+}
+not_found_details = {"section_screenshot": "Section not found"}
+# Frames a ``/ws/`` connection may have queued for sending. Renders wait for room before queueing their results,
+# and the connection stops reading new requests meanwhile, so a slow client cannot pile up frames in memory.
+websocket_outbox_size = 64
+
+
+async def run_websocket_request(message: dict, outbox: asyncio.Queue):
+    """Run one render received over ``/ws/`` and queue its progress, slices and result frames."""
+    request_id = str(message.get("id"))
+
+    async def reply(**content):
+        await outbox.put(json.dumps({"id": request_id, "event": "result"} | content).decode())
+
+    endpoint = websocket_endpoints.get(message.get("endpoint"))
+    if endpoint is None:
+        return await reply(status=404, detail="Unknown endpoint")
+    method, options_model = endpoint
+    try:
+        options = options_model.model_validate(message.get("options") or {})
+        hop = max(0, int(message.get("hop", 0)))
+        timeout = float(message["timeout"]) if message.get("timeout") is not None else None
+    except (ValidationError, TypeError, ValueError) as e:
+        return await reply(status=422, detail=str(e))
+    # Each request runs in its own task, so these only apply to this request.
+    remote_fallback_hop.set(hop)
+    if timeout is not None and math.isfinite(timeout) and timeout > 0:
+        request_deadline.set(time.monotonic() + timeout)
+
+    def progress(stage: str, details: dict):
+        # Progress is advisory, so it is dropped rather than waited for while the client is behind.
+        with suppress(asyncio.QueueFull):
+            outbox.put_nowait(json.dumps({"id": request_id, "event": "progress", "stage": stage} | details).decode())
+
+    try:
+        with (
+            conditional_scope(message.get("if_none_match")) as conditional,
+            progress_scope(progress),
+            spill_scope(),
+        ):
+            result = await getattr(webrender, method)(options)
+    except NotModified as e:
+        return await reply(status=304, etag=e.etag)
+    except ElementNotFound:
+        return await reply(status=404, detail=not_found_details.get(method, "Element not found"))
+    except RequiredURL:
+        return await reply(status=400, detail="URL parameter is required")
+    except DeadlineExceeded:
+        return await reply(status=504, detail="Request deadline exceeded")
+    except ResourceLimitExceeded as e:
+        return await reply(status=422, detail=str(e) or "Page resource limit exceeded")
+    except ResponseTooLarge as e:
+        return await reply(status=413, detail=str(e))
+    except Exception:
+        webrender.logger.exception(f"WebSocket request {method} failed:")
+        return await reply(status=500, detail="Internal Server Error")
+
+    if method not in conditional_methods or not isinstance(result, list | SliceBuffer):
+        return await reply(status=200, content=result)
+    # Queued whole, so slices of a spilled capture are read from disk only as they are sent.
+    try:
+        await outbox.put((request_id, result))
+    except BaseException:
+        if isinstance(result, SliceBuffer):
+            result.close()
+        raise
+    headers = {}
+    if conditional.etag:
+        headers = {"etag": conditional.etag, "cache": "hit" if conditional.cached else "miss"}
+    return await reply(status=200, slices=len(result), **headers)
+
+
+@app.websocket("/ws/")
+async def multiplexed_websocket(websocket: WebSocket):
+    """
+    Many concurrent requests over one connection, see :mod:`akari_bot_webrender.functions.multiplex`. Renders
+    are cancelled by a ``cancel`` message or when the connection closes.
+    """
+    await websocket.accept()
+    outbox: asyncio.Queue[str | bytes | tuple[str, list[str] | SliceBuffer]] = asyncio.Queue(websocket_outbox_size)
+    tasks: dict[str, asyncio.Task] = {}
+
+    async def write():
+        while True:
+            frame = await outbox.get()
+            if isinstance(frame, str):
+                await websocket.send_text(frame)
+            elif isinstance(frame, bytes):
+                await websocket.send_bytes(frame)
+            else:
+                await send_slices(websocket, *frame)
+
+    writer = asyncio.create_task(write())
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+                request_id = str(message["id"])
+            except (json.JSONDecodeError, KeyError, TypeError):
+                await websocket.close(code=1003)
+                return
+            if message.get("op") == "cancel":
+                task = tasks.get(request_id)
+                if task:
+                    task.cancel()
+                continue
+            if request_id in tasks:
+                # Not a result frame, so the render already running under this id is not answered by it.
+                await outbox.put(
+                    json.dumps(
+                        {"id": request_id, "event": "error", "status": 409, "detail": "Request id is already in use"}
+                    ).decode()
+                )
+                continue
+            task = asyncio.create_task(run_websocket_request(message, outbox))
+            task.add_done_callback(lambda _task, request_id=request_id: tasks.pop(request_id, None))
+            tasks[request_id] = task
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for task in list(tasks.values()):
+            task.cancel()
+        writer.cancel()
+        # Spilled captures that were queued but never sent.
+        while not outbox.empty():
+            frame = outbox.get_nowait()
+            if isinstance(frame, tuple) and isinstance(frame[1], SliceBuffer):
+                frame[1].close()
+
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(webrender.metrics(), media_type="text/plain; version=0.0.4")
 
 
 @app.get("/favicon.ico")
@@ -164,11 +630,39 @@ async def favicon():
     return FileResponse((Path(__file__).parent / "favicon.ico").resolve())
 
 
+def remove_stale_socket(path: str):
+    """Remove a socket file left behind by a previous run that crashed, so binding ``path`` does not fail."""
+    try:
+        if not stat.S_ISSOCK(os.stat(path).st_mode):
+            return
+    except FileNotFoundError:
+        return
+    with socket.socket(socket.AF_UNIX) as probe:
+        try:
+            probe.connect(path)
+        except OSError:
+            os.remove(path)
+        # Otherwise a running server still accepts on it, and binding reports the conflict.
+
+
 def run():
     import uvicorn
 
     try:
         webrender.logger.info(f"Server starting on {config['host']}:{config['port']}")
-        uvicorn.run(app, host=config["host"], port=config["port"])
+        if not config["uds_path"]:
+            uvicorn.run(app, host=config["host"], port=config["port"])
+            return
+        # One server accepting on both sockets, so TCP and same-host clients share the browser and lifespan.
+        server = uvicorn.Server(uvicorn.Config(app, host=config["host"], port=config["port"]))
+        remove_stale_socket(config["uds_path"])
+        sockets = [server.config.bind_socket(), uvicorn.Config(app, uds=config["uds_path"]).bind_socket()]
+        webrender.logger.info(f"Also listening on Unix domain socket {config['uds_path']}")
+        try:
+            server.run(sockets=sockets)
+        finally:
+            # Like uvicorn.run, remove the socket file so the next start can bind it again.
+            if os.path.exists(config["uds_path"]):
+                os.remove(config["uds_path"])
     except KeyboardInterrupt:
         webrender.logger.info("Server stopped")
@@ -0,0 +1,17 @@
+function page_snapshot() {
+  let root = document.documentElement.cloneNode(true);
+  root.querySelectorAll("script, base").forEach((element) => {
+    element.remove();
+  });
+  let head = root.querySelector("head");
+  if (!head) {
+    head = document.createElement("head");
+    root.prepend(head);
+  }
+  let base = document.createElement("base");
+  base.href = document.baseURI;
+  head.prepend(base);
+
+  let doctype = document.doctype ? `<!DOCTYPE ${document.doctype.name}>` : "";
+  return doctype + root.outerHTML;
+}
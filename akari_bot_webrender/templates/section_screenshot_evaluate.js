@@ -1,6 +1,5 @@
 function section_screenshot_evaluate({ section, elements_to_disable }) {
   console.log(`Section: ${section}`); // skipcq
-  console.log(`Elements to disable: ${elements_to_disable}`); // skipcq
 
   const levels = ["H1", "H2", "H3", "H4", "H5", "H6"];
   let sec = document.getElementById(section);
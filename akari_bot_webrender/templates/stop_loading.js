@@ -0,0 +1,12 @@
+function stop_loading() {
+  window.stop();
+  document.querySelectorAll("video, audio").forEach((media) => {
+    media.pause();
+    media.preload = "none";
+    media.removeAttribute("src");
+    media.querySelectorAll("source").forEach((source) => {
+      source.remove();
+    });
+    media.load();
+  });
+}
@@ -0,0 +1,158 @@
+"""
+A Playwright stand-in for benchmarking the Python side of WebRender. Pages answer every call at once and return
+canned images, so a benchmark run through it measures option handling, request scopes, slicing and serialization
+without any browser time.
+
+Only the calls WebRender makes are implemented. Install it on a :class:`WebRender` with :func:`install`.
+"""
+
+import random
+from types import SimpleNamespace
+
+from akari_bot_webrender.constants import base_height, base_width
+
+
+def canned_image(size: int) -> bytes:
+    """``size`` bytes behind a JPEG header, random so base64 and compression see realistic data."""
+    return b"\xff\xd8\xff\xe0" + random.Random(size).randbytes(max(size - 4, 0))
+
+
+class FakeResponse:
+    status = 200
+    ok = True
+
+    def __init__(self):
+        self.headers = {}
+
+
+class FakeElement:
+    def __init__(self, page: "FakePage"):
+        self.page = page
+
+    async def bounding_box(self) -> dict:
+        return {"x": 0, "y": 0, "width": self.page.viewport_size["width"], "height": self.page.content_height}
+
+    async def screenshot(self, **kwargs) -> bytes:
+        return self.page.image
+
+    async def evaluate(self, expression: str, arg=None):
+        return self.page.html
+
+    async def inner_text(self) -> str:
+        return self.page.html
+
+
+class FakePage:
+    def __init__(self, context: "FakeContext", width: int, height: int):
+        self.context = context
+        self.viewport_size = {"width": width, "height": height}
+        self.content_height = context.browser.content_height
+        self.image = context.browser.image
+        self.url = "about:blank"
+        self.html = ""
+        self.closed = False
+
+    def on(self, event: str, handler):
+        pass
+
+    def remove_listener(self, event: str, handler):
+        pass
+
+    def is_closed(self) -> bool:
+        return self.closed
+
+    async def set_content(self, html: str, **kwargs):
+        self.html = html
+
+    async def goto(self, url: str, **kwargs) -> FakeResponse:
+        self.url = url
+        self.html = f"<p>{url}</p>"
+        return FakeResponse()
+
+    async def content(self) -> str:
+        return self.html
+
+    async def add_style_tag(self, **kwargs):
+        pass
+
+    async def wait_for_timeout(self, timeout: float):
+        pass
+
+    async def evaluate(self, expression: str, arg=None):
+        return None
+
+    async def query_selector(self, selector: str) -> FakeElement:
+        return FakeElement(self)
+
+    async def screenshot(self, **kwargs) -> bytes:
+        return self.image
+
+    async def route(self, url: str, handler):
+        pass
+
+    async def close(self):
+        self.closed = True
+        self.context.pages.remove(self)
+
+
+class FakeContext:
+    def __init__(self, browser: "FakeBrowserProcess", viewport: dict):
+        self.browser = browser
+        self.viewport = viewport
+        self.pages: list[FakePage] = []
+        self.request = None
+
+    def on(self, event: str, handler):
+        pass
+
+    async def add_init_script(self, script: str):
+        pass
+
+    async def set_extra_http_headers(self, headers: dict):
+        pass
+
+    async def new_page(self) -> FakePage:
+        page = FakePage(self, self.viewport["width"], self.viewport["height"])
+        self.pages.append(page)
+        return page
+
+    async def new_cdp_session(self, page: FakePage):
+        raise RuntimeError("The fake backend has no CDP")
+
+    async def close(self):
+        self.pages.clear()
+
+
+class FakeBrowserProcess:
+    def __init__(self, content_height: int, image_size: int):
+        self.content_height = content_height
+        self.image = canned_image(image_size)
+        self.contexts: list[FakeContext] = []
+
+    def is_connected(self) -> bool:
+        return True
+
+    def on(self, event: str, handler):
+        pass
+
+    async def new_context(self, viewport: dict | None = None, **kwargs) -> FakeContext:
+        context = FakeContext(self, viewport or {"width": base_width, "height": base_height})
+        self.contexts.append(context)
+        return context
+
+    async def close(self):
+        self.contexts.clear()
+
+
+def install(webrender, content_height: int = 2000, image_size: int = 64 * 1024) -> FakeBrowserProcess:
+    """
+    Make ``webrender`` render with the fake backend, as if :meth:`WebRender.browser_init` had launched a browser.
+
+    :param content_height: Height in pixels of every page's content, which decides the number of slices.
+    :param image_size: Bytes of every captured slice.
+    """
+    process = FakeBrowserProcess(content_height, image_size)
+    webrender.browser.playwright = SimpleNamespace()
+    webrender.browser.browser = process
+    webrender.browser.contexts = {}
+    return process
@@ -0,0 +1,127 @@
+"""
+Render throughput and browser memory of each Chromium launch profile.
+
+Run from the repository root, with Chromium installed through ``playwright install chromium``::
+
+    python benchmarks/launch_profiles.py --renders 60 --concurrency 4
+
+For every profile a fresh browser renders the fixture pages below round-robin, ``--concurrency`` at a time, as
+``page_screenshot`` requests of inline content, so the network does not add noise. The table reports renders per
+second, median and p95 latency, and the peak and final resident memory of the browser process tree, sampled every
+100 ms while the renders run.
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from akari_bot_webrender.functions.browser import launch_profiles
+from akari_bot_webrender.functions.limiter import percentile
+from akari_bot_webrender.functions.main import WebRender
+from akari_bot_webrender.functions.options import PageScreenshotOptions
+from akari_bot_webrender.functions.watchdog import process_tree_rss
+
+
+def article_page(paragraphs: int = 200) -> str:
+    """A long wiki article: headings, paragraphs and an infobox table, several slices tall."""
+    rows = "".join(f"<tr><th>Property {i}</th><td>Value {i}</td></tr>" for i in range(30))
+    body = "".join(
+        f"<h2>Section {i}</h2><p>{'Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 12}</p>"
+        for i in range(paragraphs)
+    )
+    return f'<table class="infobox">{rows}</table>{body}'
+
+
+def table_page(rows: int = 1500) -> str:
+    """A large sortable-style table, heavy on layout."""
+    cells = "".join(f"<tr>{''.join(f'<td>{r}-{c}</td>' for c in range(8))}</tr>" for r in range(rows))
+    return f"<table border=1>{cells}</table>"
+
+
+def styled_page(boxes: int = 600) -> str:
+    """Gradients, shadows and rounded boxes, heavy on raster."""
+    style = "border-radius:12px;box-shadow:0 4px 16px #0004;background:linear-gradient(135deg,#6cf,#c6f);margin:8px"
+    return "".join(f'<div style="{style};height:{40 + i % 5 * 10}px">Box {i}</div>' for i in range(boxes))
+
+
+fixture_pages = {"article": article_page(), "table": table_page(), "styled": styled_page()}
+
+
+async def sample_rss(samples: list[int], stop: asyncio.Event):
+    while not stop.is_set():
+        rss = process_tree_rss()
+        if rss is not None:
+            samples.append(rss)
+        try:
+            await asyncio.wait_for(stop.wait(), 0.1)
+        except TimeoutError:
+            pass
+
+
+async def bench_profile(profile: str, renders: int, concurrency: int) -> dict:
+    webrender = WebRender(launch_profile=profile)
+    if not await webrender.browser_init():
+        raise RuntimeError("Failed to launch Chromium, run `playwright install chromium` first.")
+    pages = list(fixture_pages.values())
+    # One untimed render per page, so the profiles are compared with warm contexts and fonts.
+    for content in pages:
+        await webrender.page_screenshot(PageScreenshotOptions(content=content))
+
+    latencies: list[float] = []
+    rss_samples: list[int] = []
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample_rss(rss_samples, stop))
+    queue = asyncio.Queue()
+    for index in range(renders):
+        queue.put_nowait(pages[index % len(pages)])
+
+    async def worker():
+        while not queue.empty():
+            content = queue.get_nowait()
+            started = time.perf_counter()
+            await webrender.page_screenshot(PageScreenshotOptions(content=content))
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await sampler
+    final_rss = process_tree_rss() or 0
+    await webrender.browser_close()
+    return {
+        "profile": profile,
+        "throughput": renders / elapsed,
+        "p50": statistics.median(latencies),
+        "p95": percentile(latencies, 0.95),
+        "peak_rss": max(rss_samples, default=0),
+        "final_rss": final_rss,
+    }
+
+
+async def run(profiles: list[str], renders: int, concurrency: int):
+    print(f"{'profile':<12} {'renders/s':>10} {'p50 s':>8} {'p95 s':>8} {'peak RSS MB':>12} {'final RSS MB':>13}")
+    for profile in profiles:
+        result = await bench_profile(profile, renders, concurrency)
+        print(
+            f"{result['profile']:<12} {result['throughput']:10.2f} {result['p50']:8.2f} {result['p95']:8.2f}"
+            f" {result['peak_rss'] / 2**20:12.0f} {result['final_rss'] / 2**20:13.0f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--renders", type=int, default=60, help="Timed renders per profile.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Renders running at once.")
+    parser.add_argument("--profiles", nargs="+", default=list(launch_profiles), choices=list(launch_profiles))
+    args = parser.parse_args()
+    asyncio.run(run(args.profiles, args.renders, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
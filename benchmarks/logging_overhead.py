@@ -0,0 +1,79 @@
+"""
+Logging overhead per request on the render hot path, comparing the default logging mode with the production mode.
+
+Run from the repository root::
+
+    python benchmarks/logging_overhead.py --requests 2000 --content-size 200000
+
+Each simulated request writes the lines a screenshot request writes: the options summary, the content size and
+one line per captured slice. Output goes to ``os.devnull``, so the numbers measure formatting and dispatch, not
+terminal speed.
+"""
+
+import argparse
+import contextlib
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from loguru import logger
+
+from akari_bot_webrender.functions.logger import LoggingLogger, OptionsSummary, request_log_scope
+from akari_bot_webrender.functions.options import PageScreenshotOptions
+
+
+def simulate_request(log: LoggingLogger, options: PageScreenshotOptions, slices: int, legacy: bool):
+    if legacy:
+        # What every request logged before the production mode existed.
+        log.info("page_screenshot function called with options: " + str(options))
+        content_size = {"x": 0, "y": 0, "width": 720, "height": 8000}
+        log.info(f"Content size: {content_size}, DPR: {1}, Screenshot height: {8192}")
+        for index in range(slices):
+            log.info("X:" + str(0) + " Y:" + str(index * 8192) + " Width:" + str(720) + " Height:" + str(8192))
+        return
+    with request_log_scope(log.sample_rate):
+        log.request_info("{} function called with options: {}", "page_screenshot", OptionsSummary(options))
+        log.request_info(
+            "Content size: {}, DPR: {}, Screenshot height: {}", {"x": 0, "y": 0, "width": 720, "height": 8000}, 1, 8192
+        )
+        for index in range(slices):
+            log.request_debug("X:{} Y:{} Width:{} Height:{}", 0, index * 8192, 720, 8192)
+
+
+def run(label: str, requests: int, options: PageScreenshotOptions, slices: int, legacy: bool, **logger_options):
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        log = LoggingLogger(**logger_options)
+        started = time.perf_counter()
+        for _ in range(requests):
+            simulate_request(log, options, slices, legacy)
+        elapsed = time.perf_counter() - started
+        logger.remove()
+    print(f"{label:<36} {elapsed / requests * 1e6:10.1f} µs/request")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--content-size", type=int, default=200_000, help="Characters of inline HTML per request.")
+    parser.add_argument("--slices", type=int, default=4, help="Screenshot slices per request.")
+    parser.add_argument("--sample-rate", type=float, default=0.1)
+    args = parser.parse_args()
+
+    options = PageScreenshotOptions(content="<p>" + "x" * args.content_size + "</p>", css="body { margin: 0 }")
+    common = {"requests": args.requests, "options": options, "slices": args.slices}
+    run("default mode, eager full options", legacy=True, **common)
+    run("default mode, lazy summaries", legacy=False, **common)
+    run(
+        "production mode, enqueued, sampled",
+        legacy=False,
+        log_mode="production",
+        log_sample_rate=args.sample_rate,
+        **common,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Python-side overhead of a screenshot request, measured layer by layer on the fake Playwright backend in
+``fake_playwright.py``, so framework regressions show up separately from browser time.
+
+Run from the repository root, no browser needed::
+
+    python benchmarks/server_overhead.py --iterations 2000 --slices 3
+
+The cases, from the innermost layer out:
+
+- ``options``: validating a request body into ``PageScreenshotOptions``.
+- ``fallback``: a no-op method behind ``webrender_fallback``, i.e. the request scopes and fallback bookkeeping.
+- ``slices``: ``make_screenshot`` cutting a page of ``--slices`` slices and base64-encoding them.
+- ``serialize``: encoding the slices and dumping them as the JSON response body.
+- ``render``: ``page_screenshot`` end to end on the fake browser, with the default library settings.
+- ``server``: ``POST /page/`` through the FastAPI app with the server's ``config.json`` settings, including the
+  render cache, budgets and concurrency limiter, ``--concurrency`` requests at a time.
+
+Every request renders different content, so the render cache never hits. Log output is discarded, see
+``logging_overhead.py`` for the cost of logging itself.
+"""
+
+import argparse
+import asyncio
+import base64
+import contextlib
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import httpx
+import orjson as json
+
+import fake_playwright
+from akari_bot_webrender.constants import max_screenshot_height
+from akari_bot_webrender.functions.main import WebRender, webrender_fallback
+from akari_bot_webrender.functions.options import PageScreenshotOptions
+
+request_body = {"content": "<p>benchmark</p>", "width": 720, "height": 1280, "output_type": "jpeg"}
+
+
+class NoOpWebRender(WebRender):
+    @webrender_fallback
+    async def noop(self, options):
+        return []
+
+
+# Log sinks are created on the redirected stdout, so results go to the real one.
+results = sys.stdout
+
+
+async def measure(name: str, operation, iterations: int, concurrency: int = 1):
+    """Run ``operation(index)`` ``iterations`` times, ``concurrency`` at a time, after a short warm-up."""
+    for index in range(min(iterations // 10, 50)):
+        await operation(-index - 1)
+    counter = iter(range(iterations))
+
+    async def worker():
+        for index in counter:
+            await operation(index)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    print(f"{name:<12} {iterations:>8} {elapsed / iterations * 1e6:12.1f} {iterations / elapsed:12.0f}", file=results)
+
+
+async def run(cases: list[str], iterations: int, slices: int, image_size: int, concurrency: int):
+    content_height = slices * max_screenshot_height - max_screenshot_height // 2 if slices > 1 else 1000
+    image = fake_playwright.canned_image(image_size)
+    images = [base64.b64encode(image).decode()] * slices
+    webrender = WebRender()
+    fake_playwright.install(webrender, content_height=content_height, image_size=image_size)
+
+    print(f"{'case':<12} {'requests':>8} {'µs/request':>12} {'requests/s':>12}", file=results)
+    if "options" in cases:
+
+        async def validate(index):
+            PageScreenshotOptions.model_validate(request_body)
+
+        await measure("options", validate, iterations)
+    if "fallback" in cases:
+        noop_webrender = NoOpWebRender()
+        fake_playwright.install(noop_webrender)
+        options = PageScreenshotOptions.model_validate(request_body)
+
+        async def call_noop(index):
+            await noop_webrender.noop(options)
+
+        await measure("fallback", call_noop, iterations)
+    if "slices" in cases:
+        page = await webrender.browser.new_page()
+        element = await page.query_selector("body")
+
+        async def capture(index):
+            await webrender.make_screenshot(page, element)
+
+        await measure("slices", capture, iterations)
+        await page.close()
+    if "serialize" in cases:
+
+        async def serialize(index):
+            json.dumps([base64.b64encode(image).decode() for _ in range(slices)])
+
+        await measure("serialize", serialize, iterations)
+    if "render" in cases:
+
+        async def render(index):
+            result = await webrender.page_screenshot(PageScreenshotOptions(content=f"<p>{index}</p>"))
+            assert len(result) == len(images)
+
+        await measure("render", render, iterations)
+    if "server" in cases:
+        from akari_bot_webrender.server import main as server_main
+
+        fake_playwright.install(server_main.webrender, content_height=content_height, image_size=image_size)
+        transport = httpx.ASGITransport(app=server_main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://webrender") as client:
+
+            async def post(index):
+                response = await client.post("/page/", json=request_body | {"content": f"<p>{index}</p>"})
+                assert response.status_code == 200, response.text
+
+            await measure("server", post, iterations, concurrency)
+
+
+def main():
+    cases = ["options", "fallback", "slices", "serialize", "render", "server"]
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000, help="Requests per case.")
+    parser.add_argument("--slices", type=int, default=3, help="Slices per capture.")
+    parser.add_argument("--image-size", type=int, default=64 * 1024, help="Bytes per captured slice.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent requests in the server case.")
+    parser.add_argument("--cases", nargs="+", default=cases, choices=cases)
+    args = parser.parse_args()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        asyncio.run(run(args.cases, args.iterations, args.slices, args.image_size, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
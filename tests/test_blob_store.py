@@ -0,0 +1,84 @@
+import base64
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+from fastapi.testclient import TestClient
+
+from akari_bot_webrender.functions.blobs import BlobStore
+from akari_bot_webrender.functions.shm import slice_transport_header
+from akari_bot_webrender.server import main as server_main
+
+jpeg = b"\xff\xd8" + b"header slice" * 100
+png = b"\x89PNG" + b"body slice" * 100
+
+
+class BlobStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_identical_slices_are_stored_once(self):
+        store = BlobStore(self.directory.name)
+
+        first = store.put(jpeg)
+        second = store.put(jpeg)
+
+        self.assertEqual(first, second)
+        self.assertEqual(store.stats()["blobs"], 1)
+        self.assertEqual(store.get(first).read_bytes(), jpeg)
+
+    def test_least_recently_used_blobs_are_evicted_by_size(self):
+        store = BlobStore(self.directory.name, max_bytes=len(jpeg) + len(png))
+        old = store.put(jpeg)
+        recent = store.put(png)
+        store.get(old)
+
+        newest = store.put(b"x" * 10)
+
+        self.assertIsNone(store.get(recent))
+        self.assertIsNotNone(store.get(old))
+        self.assertIsNotNone(store.get(newest))
+        self.assertLessEqual(store.total_bytes, store.max_bytes)
+
+    def test_blobs_survive_a_restart(self):
+        blob_hash = BlobStore(self.directory.name).put(png)
+
+        store = BlobStore(self.directory.name)
+
+        self.assertEqual(store.get(blob_hash).read_bytes(), png)
+        self.assertIsNone(store.get("../" + blob_hash))
+
+
+class BlobEndpointTest(unittest.TestCase):
+    def test_slices_are_returned_as_cacheable_urls(self):
+        images = [base64.b64encode(jpeg).decode(), base64.b64encode(png).decode()]
+        with (
+            tempfile.TemporaryDirectory() as directory,
+            patch.object(server_main, "blob_store", BlobStore(Path(directory))),
+            patch.object(server_main.webrender, "browser_init", AsyncMock(return_value=True)),
+            patch.object(server_main.webrender, "warmup", AsyncMock(return_value=True)),
+            patch.object(server_main.webrender, "browser_close", AsyncMock()),
+            patch.object(server_main.webrender, "page_screenshot", AsyncMock(return_value=images)),
+            TestClient(server_main.app) as client,
+        ):
+            inline = client.post("/page/", json={"content": "page"})
+            urls = client.post("/page/", json={"content": "page"}, headers={slice_transport_header: "url"}).json()
+            blob = client.get(urls[1])
+            revalidated = client.get(urls[1], headers={"If-None-Match": blob.headers["etag"]})
+            missing = client.get("/blob/" + "0" * 32)
+
+        self.assertEqual(inline.json(), images)
+        self.assertTrue(all(url.startswith("/blob/") for url in urls))
+        self.assertEqual(blob.content, png)
+        self.assertEqual(blob.headers["content-type"], "image/png")
+        self.assertIn("immutable", blob.headers["cache-control"])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(missing.status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
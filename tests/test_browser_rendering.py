@@ -1,4 +1,7 @@
+import asyncio
 import base64
+import subprocess
+import sys
 import unittest
 from contextlib import asynccontextmanager
 from unittest.mock import AsyncMock, MagicMock, patch
@@ -7,22 +10,31 @@ from pydantic import ValidationError
 
 from akari_bot_webrender.constants import browser_user_agent
 from akari_bot_webrender.functions.browser import Browser
+from akari_bot_webrender.functions.deadline import deadline_scope
 from akari_bot_webrender.functions.main import WebRender
 from akari_bot_webrender.functions.options import (
     ElementScreenshotOptions,
     LegacyScreenshotOptions,
     PageScreenshotOptions,
+    RawOptions,
     SectionScreenshotOptions,
     SourceOptions,
 )
 
 
+def make_context(page=None):
+    context = MagicMock()
+    context.new_page = AsyncMock(return_value=page or MagicMock())
+    context.add_init_script = AsyncMock()
+    context.set_extra_http_headers = AsyncMock()
+    return context
+
+
 class BrowserCompatibilityTest(unittest.IsolatedAsyncioTestCase):
     async def test_native_user_agent_and_normalized_locale_when_stealth_is_disabled(self):
         browser = Browser()
         page = MagicMock()
-        context = MagicMock()
-        context.new_page = AsyncMock(return_value=page)
+        context = make_context(page)
         browser_process = MagicMock()
         browser_process.new_context = AsyncMock(return_value=context)
         browser.browser = browser_process
@@ -34,21 +46,55 @@ class BrowserCompatibilityTest(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(context_options["locale"], "zh-CN")
         self.assertEqual(context_options["viewport"], {"width": 800, "height": 600})
         self.assertNotIn("user_agent", context_options)
+        context.set_extra_http_headers.assert_not_awaited()
 
     async def test_stealth_context_preserves_existing_user_agent_behavior(self):
         browser = Browser()
-        context = MagicMock()
-        context.new_page = AsyncMock(return_value=MagicMock())
+        context = make_context()
         browser_process = MagicMock()
         browser_process.new_context = AsyncMock(return_value=context)
         browser.browser = browser_process
 
-        with patch("akari_bot_webrender.functions.browser.stealth_async", AsyncMock()):
+        with patch("akari_bot_webrender.functions.browser.apply_stealth", AsyncMock()):
             await browser.new_page(stealth=True)
 
         context_options = browser_process.new_context.await_args.kwargs
         self.assertEqual(context_options["user_agent"], browser_user_agent)
 
+    async def test_concurrent_requests_share_one_new_context(self):
+        browser = Browser()
+        browser_process = MagicMock()
+
+        async def new_context(**_options):
+            await asyncio.sleep(0.01)
+            return make_context()
+
+        browser_process.new_context = AsyncMock(side_effect=new_context)
+        browser.browser = browser_process
+
+        contexts = await asyncio.gather(*(browser.get_context(stealth=False) for _ in range(3)))
+
+        browser_process.new_context.assert_awaited_once()
+        self.assertIs(contexts[0], contexts[2])
+        self.assertEqual(browser._pending_contexts, {})
+
+    async def test_stealth_and_styles_are_installed_once_per_context(self):
+        browser = Browser()
+        context = make_context()
+        browser_process = MagicMock()
+        browser_process.new_context = AsyncMock(return_value=context)
+        browser.browser = browser_process
+
+        await browser.new_page(stealth=True)
+        await browser.new_page(stealth=True)
+
+        self.assertEqual(context.new_page.await_count, 2)
+        browser_process.new_context.assert_awaited_once()
+        context.set_extra_http_headers.assert_awaited_once()
+        init_scripts = [call.args[0] for call in context.add_init_script.await_args_list]
+        self.assertEqual(len(init_scripts), 2)
+        self.assertIn("span.heimu a.external", init_scripts[0])
+
     async def test_make_screenshot_does_not_abort_late_network_requests(self):
         renderer = WebRender()
         page = MagicMock()
@@ -64,6 +110,21 @@ class BrowserCompatibilityTest(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(result, [base64.b64encode(b"image").decode()])
         page.route.assert_not_awaited()
 
+    async def test_launch_profile_switches_are_passed_to_chromium_only(self):
+        browser = Browser(launch_profile="low-memory")
+        browser.playwright = MagicMock()
+        browser.playwright.chromium.launch = AsyncMock()
+        browser.playwright.firefox.launch = AsyncMock()
+
+        await browser._launch()
+        browser._launch_options = {"browser_type": "firefox"}
+        await browser._launch()
+
+        self.assertIn("--renderer-process-limit=2", browser.playwright.chromium.launch.await_args.kwargs["args"])
+        self.assertEqual(browser.playwright.firefox.launch.await_args.kwargs["args"], [])
+        with self.assertRaises(ValueError):
+            Browser(launch_profile="unknown")
+
 
 class PageLoadControlTest(unittest.IsolatedAsyncioTestCase):
     async def test_render_page_uses_configured_load_state_and_delay(self):
@@ -82,9 +143,40 @@ class PageLoadControlTest(unittest.IsolatedAsyncioTestCase):
         ):
             pass
 
-        page.set_content.assert_awaited_once_with("<p>dynamic page</p>", wait_until="domcontentloaded")
+        page.set_content.assert_awaited_once()
+        self.assertTrue(page.set_content.await_args.args[0].startswith("<p>dynamic page</p><style>"))
+        self.assertEqual(page.set_content.await_args.kwargs["wait_until"], "domcontentloaded")
+        page.add_style_tag.assert_not_awaited()
         page.wait_for_timeout.assert_awaited_once_with(2500)
 
+    async def test_render_page_passes_request_timeout_to_navigation(self):
+        renderer = WebRender()
+        page = MagicMock()
+        page.goto = AsyncMock()
+        page.add_style_tag = AsyncMock()
+        page.close = AsyncMock()
+        renderer.browser.new_page = AsyncMock(return_value=page)
+
+        with deadline_scope(10):
+            async with renderer.render_page(url="https://example.com/"):
+                pass
+
+        timeout = page.goto.await_args.kwargs["timeout"]
+        self.assertTrue(0 < timeout <= 10000)
+
+    async def test_cancelled_render_closes_kept_page(self):
+        renderer = WebRender(keep_pages_open=True)
+        page = MagicMock()
+        page.goto = AsyncMock(side_effect=asyncio.CancelledError)
+        page.close = AsyncMock()
+        renderer.browser.new_page = AsyncMock(return_value=page)
+
+        with self.assertRaises(asyncio.CancelledError):
+            async with renderer.render_page(url="https://example.com/"):
+                pass
+
+        page.close.assert_awaited_once()
+
     async def test_screenshot_endpoints_forward_load_controls(self):
         def make_render_context(current_page):
             @asynccontextmanager
@@ -144,10 +236,111 @@ class PageLoadControlTest(unittest.IsolatedAsyncioTestCase):
         page.goto.assert_awaited_once_with("https://example.com/", wait_until="load")
         page.wait_for_timeout.assert_awaited_once_with(3000)
 
+    async def test_source_fallback_fetch_returns_text(self):
+        renderer = WebRender()
+        renderer.browser.check_status = AsyncMock(return_value=True)
+        page = MagicMock()
+        page.goto = AsyncMock(return_value=MagicMock(status=403))
+        fetched = MagicMock(status=200)
+        fetched.text = AsyncMock(return_value="raw source")
+        fetched.dispose = AsyncMock()
+        request = MagicMock()
+        request.fetch = AsyncMock(return_value=fetched)
+        renderer.browser.request_context = AsyncMock(return_value=request)
+
+        @asynccontextmanager
+        async def render_context():
+            yield page, 0.0
+
+        renderer.render_page = MagicMock(return_value=render_context())
+
+        result = await renderer.source(SourceOptions(url="https://example.com/"))
+
+        self.assertEqual(result, "raw source")
+        fetched.dispose.assert_awaited_once()
+
+    async def test_source_page_and_fallback_fetch_share_the_site_context(self):
+        renderer = WebRender()
+        page = MagicMock()
+        page.goto = AsyncMock(return_value=MagicMock(status=403))
+        page.close = AsyncMock()
+        fetched = MagicMock(status=200)
+        fetched.text = AsyncMock(return_value="raw source")
+        fetched.dispose = AsyncMock()
+        context = MagicMock()
+        context.new_page = AsyncMock(return_value=page)
+        context.request.fetch = AsyncMock(return_value=fetched)
+        renderer.browser.get_context = AsyncMock(return_value=context)
+
+        result = await renderer.load_source(SourceOptions(url="https://example.com/"))
+
+        self.assertEqual(result, "raw source")
+        page.goto.assert_awaited_once()
+        urls = [call.kwargs["url"] for call in renderer.browser.get_context.await_args_list]
+        self.assertEqual(urls, ["https://example.com/", "https://example.com/"])
+
     def test_wait_after_load_is_bounded(self):
         with self.assertRaises(ValidationError):
             PageScreenshotOptions(wait_after_load=60001)
 
 
+class StartupTest(unittest.IsolatedAsyncioTestCase):
+    async def test_warmup_renders_sample_page_in_each_context(self):
+        renderer = WebRender()
+        renderer.browser.check_status = AsyncMock(return_value=True)
+        page = MagicMock()
+        page.set_content = AsyncMock()
+        page.add_style_tag = AsyncMock()
+        page.close = AsyncMock()
+        renderer.browser.new_page = AsyncMock(return_value=page)
+        renderer.select_element_and_screenshot = AsyncMock(return_value=["image"])
+
+        result = await renderer.warmup(
+            [{"width": 720, "height": 1280}, {"width": 1280, "height": 720, "stealth": False}]
+        )
+
+        self.assertTrue(result)
+        self.assertEqual(renderer.browser.new_page.await_count, 2)
+        self.assertEqual(renderer.browser.new_page.await_args.kwargs["stealth"], False)
+        self.assertIsNotNone(renderer.warmup_seconds)
+        self.assertIsNotNone(renderer.first_render_seconds)
+
+    def test_import_does_not_load_browser_dependencies(self):
+        code = (
+            "import sys, akari_bot_webrender.functions.main; "
+            "print(','.join(m for m in ('jinja2', 'playwright', 'playwright_stealth') if m in sys.modules))"
+        )
+
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+
+        self.assertEqual(result.stdout.strip(), "")
+
+
+class RawRequestTest(unittest.IsolatedAsyncioTestCase):
+    async def test_get_raw_fetches_without_opening_a_page(self):
+        browser = Browser()
+        response = MagicMock(status=200, headers={"content-type": "image/png"})
+        response.body = AsyncMock(return_value=b"raw")
+        response.dispose = AsyncMock()
+        context = make_context()
+        context.request.fetch = AsyncMock(return_value=response)
+        browser_process = MagicMock()
+        browser_process.new_context = AsyncMock(return_value=context)
+        browser.browser = browser_process
+        renderer = WebRender()
+        renderer.browser = browser
+        browser.check_status = AsyncMock(return_value=True)
+
+        result = await renderer.get_raw(RawOptions(url="https://example.com/image.png"))
+
+        self.assertEqual(
+            result,
+            {"status": 200, "content_type": "image/png", "data": base64.b64encode(b"raw").decode()},
+        )
+        context.new_page.assert_not_awaited()
+        response.dispose.assert_awaited_once()
+        self.assertEqual(browser.pages_served, 0)
+
+
 if __name__ == "__main__":
     unittest.main()
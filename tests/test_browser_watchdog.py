@@ -0,0 +1,106 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from akari_bot_webrender.functions.browser import Browser
+from akari_bot_webrender.functions.watchdog import BrowserWatchdog
+
+
+def make_browser_process(connected=True):
+    browser_process = MagicMock()
+    browser_process.is_connected.return_value = connected
+    browser_process.close = AsyncMock()
+    return browser_process
+
+
+class BrowserRecycleTest(unittest.IsolatedAsyncioTestCase):
+    async def test_recycle_swaps_browser_and_drains_old_one(self):
+        browser = Browser()
+        old_process = make_browser_process()
+        old_context = MagicMock(pages=[])
+        old_context.close = AsyncMock()
+        new_process = make_browser_process()
+        browser.playwright = MagicMock()
+        browser.browser = old_process
+        browser.contexts = {"720x1280_zh-CN": old_context}
+        browser._launch = AsyncMock(return_value=new_process)
+
+        self.assertTrue(await browser.recycle())
+        await next(iter(browser._draining))
+
+        self.assertIs(browser.browser, new_process)
+        self.assertEqual(browser.contexts, {})
+        old_context.close.assert_awaited_once()
+        old_process.close.assert_awaited_once()
+
+    async def test_drain_waits_for_in_flight_pages(self):
+        browser = Browser(drain_timeout=0.1)
+        old_process = make_browser_process()
+        old_context = MagicMock(pages=[MagicMock()])
+        old_context.close = AsyncMock()
+
+        with patch("akari_bot_webrender.functions.browser.asyncio.sleep", AsyncMock()) as sleep:
+            sleep.side_effect = lambda _delay: old_context.pages.clear()
+            await browser._drain(old_process, {"ctx": old_context})
+
+        sleep.assert_awaited_once()
+        old_process.close.assert_awaited_once()
+
+
+class BrowserWatchdogTest(unittest.IsolatedAsyncioTestCase):
+    def make_browser(self, *, connected=True, probe=True, pages_served=0):
+        browser = MagicMock()
+        browser.playwright = MagicMock()
+        browser.check_status = AsyncMock(return_value=connected)
+        browser.probe = AsyncMock(return_value=probe)
+        browser.recycle = AsyncMock(return_value=True)
+        browser.pages_served = pages_served
+        return browser
+
+    async def test_crashed_browser_is_relaunched(self):
+        browser = self.make_browser(connected=False)
+        watchdog = BrowserWatchdog(browser)
+
+        await watchdog.check()
+
+        browser.recycle.assert_awaited_once()
+        self.assertEqual(watchdog.last_recycle_reason, "browser disconnected")
+
+    async def test_failed_probes_recycle_after_threshold(self):
+        browser = self.make_browser(probe=False)
+        watchdog = BrowserWatchdog(browser, failure_threshold=2)
+
+        await watchdog.check()
+        browser.recycle.assert_not_awaited()
+        await watchdog.check()
+
+        browser.recycle.assert_awaited_once()
+
+    async def test_page_limit_triggers_recycle(self):
+        browser = self.make_browser(pages_served=100)
+        watchdog = BrowserWatchdog(browser, recycle_after_pages=100)
+
+        await watchdog.check()
+
+        browser.recycle.assert_awaited_once()
+
+    async def test_memory_limit_triggers_recycle(self):
+        browser = self.make_browser()
+        watchdog = BrowserWatchdog(browser, recycle_memory_mb=512)
+
+        with patch("akari_bot_webrender.functions.watchdog.process_tree_rss", return_value=1024 * 1024 * 1024):
+            await watchdog.check()
+
+        browser.recycle.assert_awaited_once()
+
+    async def test_healthy_browser_is_left_alone(self):
+        browser = self.make_browser(pages_served=10)
+        watchdog = BrowserWatchdog(browser, recycle_after_pages=100, recycle_memory_mb=512)
+
+        with patch("akari_bot_webrender.functions.watchdog.process_tree_rss", return_value=1024):
+            await watchdog.check()
+
+        browser.recycle.assert_not_awaited()
+
+
+if __name__ == "__main__":
+    unittest.main()
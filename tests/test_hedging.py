@@ -0,0 +1,105 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+from akari_bot_webrender.functions.budget import ResourceBudget
+from akari_bot_webrender.functions.hedging import HedgePolicy
+from akari_bot_webrender.functions.main import remote_fallback_hop, webrender_fallback
+
+
+class DummyBrowser:
+    def __init__(self):
+        self.check_status = AsyncMock(return_value=True)
+
+
+class HedgedWebRender:
+    def __init__(self, local_delay, remote_delay=0.0, local_result="local"):
+        self.browser = DummyBrowser()
+        self.remote_webrender_url = "https://fallback.example/"
+        self.remote_only = False
+        self.logger = MagicMock(sample_rate=1.0)
+        self.prerenderer = None
+        self.hedge_policy = HedgePolicy(initial_delay=0.05)
+        self.resource_budget = ResourceBudget()
+        self.local_delay = local_delay
+        self.remote_delay = remote_delay
+        self.local_result = local_result
+        self.local_cancelled = False
+        self.remote_cancelled = False
+
+    async def _request_remote(self, endpoint, options):
+        try:
+            await asyncio.sleep(self.remote_delay)
+        except asyncio.CancelledError:
+            self.remote_cancelled = True
+            raise
+        return "remote"
+
+    @webrender_fallback
+    async def source(self, options):
+        try:
+            await asyncio.sleep(self.local_delay)
+        except asyncio.CancelledError:
+            self.local_cancelled = True
+            raise
+        return self.local_result
+
+
+class HedgePolicyTest(unittest.TestCase):
+    def test_delay_follows_the_percentile_of_recent_renders(self):
+        policy = HedgePolicy(percentile=0.9, initial_delay=10, min_delay=0.5)
+        self.assertEqual(policy.delay("page_screenshot"), 10)
+
+        for latency in range(1, 21):
+            policy.record("page_screenshot", latency / 10)
+
+        self.assertEqual(policy.delay("page_screenshot"), 1.8)
+        self.assertEqual(policy.delay("source"), 10)
+
+
+class HedgedRequestTest(unittest.IsolatedAsyncioTestCase):
+    async def test_fast_local_render_is_not_hedged(self):
+        renderer = HedgedWebRender(local_delay=0)
+
+        self.assertEqual(await renderer.source(None), "local")
+        self.assertEqual(renderer.hedge_policy.hedged, 0)
+        self.assertEqual(len(renderer.hedge_policy.latencies["source"]), 1)
+
+    async def test_faster_remote_wins_and_cancels_the_local_render(self):
+        renderer = HedgedWebRender(local_delay=5)
+
+        self.assertEqual(await renderer.source(None), "remote")
+        await asyncio.sleep(0)
+        self.assertTrue(renderer.local_cancelled)
+        self.assertEqual(renderer.hedge_policy.stats()["remote_wins"], 1)
+        self.assertEqual(len(renderer.hedge_policy.latencies["source"]), 1)
+        self.assertGreaterEqual(renderer.hedge_policy.latencies["source"][0], 0.05)
+
+    async def test_local_render_finishing_first_cancels_the_remote(self):
+        renderer = HedgedWebRender(local_delay=0.1, remote_delay=5)
+
+        self.assertEqual(await renderer.source(None), "local")
+        await asyncio.sleep(0)
+        self.assertTrue(renderer.remote_cancelled)
+        self.assertEqual(renderer.hedge_policy.hedged, 1)
+        self.assertEqual(renderer.hedge_policy.local_wins, 1)
+        self.assertEqual(len(renderer.hedge_policy.latencies["source"]), 1)
+
+    async def test_failed_local_render_waits_for_the_hedged_remote(self):
+        renderer = HedgedWebRender(local_delay=0.1, remote_delay=0.2, local_result=None)
+
+        self.assertEqual(await renderer.source(None), "remote")
+        self.assertEqual(renderer.hedge_policy.remote_wins, 1)
+
+    async def test_forwarded_requests_are_not_hedged(self):
+        renderer = HedgedWebRender(local_delay=0.1)
+        token = remote_fallback_hop.set(1)
+        try:
+            self.assertEqual(await renderer.source(None), "local")
+        finally:
+            remote_fallback_hop.reset(token)
+        self.assertEqual(renderer.hedge_policy.requests, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from akari_bot_webrender.functions.deadline import deadline_scope
+from akari_bot_webrender.functions.exceptions import DeadlineExceeded
+from akari_bot_webrender.functions.main import WebRender
+from akari_bot_webrender.functions.options import RawOptions
+from akari_bot_webrender.functions.throttle import HostThrottle
+
+
+class HostThrottleTest(unittest.IsolatedAsyncioTestCase):
+    def test_domain_limits_apply_to_subdomains(self):
+        throttle = HostThrottle(rate=2, hosts={"wiki.example": {"rate": 0.5}, "zh.wiki.example": {"burst": 1}})
+
+        self.assertEqual(throttle.limit_for("en.wiki.example").rate, 0.5)
+        self.assertEqual(throttle.limit_for("zh.wiki.example").burst, 1)
+        self.assertEqual(throttle.limit_for("zh.wiki.example").rate, 2)
+        self.assertEqual(throttle.limit_for("other.example").rate, 2)
+
+    async def test_requests_beyond_the_burst_wait_for_tokens(self):
+        throttle = HostThrottle(rate=20, burst=2, max_concurrency=0)
+
+        async def fetch(url):
+            async with throttle.slot(url):
+                pass
+
+        await asyncio.gather(*(fetch("https://wiki.example/page") for _ in range(4)))
+        await fetch("https://other.example/")
+
+        stats = throttle.stats()["hosts"]
+        self.assertEqual(stats["wiki.example"]["throttled"], 2)
+        self.assertGreaterEqual(stats["wiki.example"]["max_wait"], 0.09)
+        self.assertEqual(stats["other.example"]["throttled"], 0)
+
+    async def test_concurrent_requests_per_host_are_limited(self):
+        throttle = HostThrottle(rate=0, max_concurrency=1)
+        peak = 0
+
+        async def fetch():
+            nonlocal peak
+            async with throttle.slot("https://wiki.example/"):
+                peak = max(peak, throttle.hosts["wiki.example"].in_flight)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(fetch(), fetch(), fetch())
+
+        self.assertEqual(peak, 1)
+        self.assertEqual(throttle.hosts["wiki.example"].in_flight, 0)
+
+    async def test_idle_hosts_are_forgotten_once_their_tokens_refill(self):
+        throttle = HostThrottle(rate=10, burst=2, max_concurrency=0, max_hosts=1)
+        for _ in range(2):
+            async with throttle.slot("https://wiki.example/"):
+                pass
+
+        with patch(
+            "akari_bot_webrender.functions.throttle.time.monotonic",
+            return_value=throttle.hosts["wiki.example"].refilled + 1,
+        ):
+            async with throttle.slot("https://other.example/"):
+                pass
+
+        self.assertEqual(list(throttle.hosts), ["other.example"])
+
+    async def test_request_fails_early_when_its_turn_is_after_the_deadline(self):
+        throttle = HostThrottle(rate=0.1, burst=1, max_concurrency=0)
+        async with throttle.slot("https://wiki.example/"):
+            pass
+
+        with self.assertRaises(DeadlineExceeded), deadline_scope(5):
+            async with throttle.slot("https://wiki.example/"):
+                self.fail("the request should not run")
+        self.assertEqual(throttle.hosts["wiki.example"].rejected, 1)
+
+    async def test_get_raw_fetches_through_the_host_slot(self):
+        renderer = WebRender(host_rate=10, host_limits={"wiki.example": {"rate": 1}})
+        response = MagicMock(status=429, headers={})
+        response.body = AsyncMock(return_value=b"slow down")
+        response.dispose = AsyncMock()
+        request = MagicMock()
+        request.fetch = AsyncMock(return_value=response)
+        renderer.browser.check_status = AsyncMock(return_value=True)
+        renderer.browser.request_context = AsyncMock(return_value=request)
+
+        with patch.object(renderer.host_throttle, "slot", wraps=renderer.host_throttle.slot) as slot:
+            result = await renderer.get_raw(RawOptions(url="https://en.wiki.example/page"))
+
+        self.assertEqual(result["status"], 429)
+        slot.assert_called_once_with("https://en.wiki.example/page")
+        self.assertEqual(renderer.host_throttle.stats()["hosts"]["en.wiki.example"]["rate_limited"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
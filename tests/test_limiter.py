@@ -0,0 +1,116 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+from akari_bot_webrender.functions.deadline import deadline_scope
+from akari_bot_webrender.functions.exceptions import DeadlineExceeded
+from akari_bot_webrender.functions.limiter import AdaptiveLimiter, percentile
+from akari_bot_webrender.functions.main import WebRender
+
+
+def healthy_host():
+    return 0.2, 0.3
+
+
+def make_limiter(**kwargs):
+    options = {"max_limit": 8, "initial_limit": 2, "adjust_interval": 0, "load_probe": healthy_host}
+    return AdaptiveLimiter(**(options | kwargs))
+
+
+class AdaptiveLimiterTest(unittest.IsolatedAsyncioTestCase):
+    async def test_renders_above_the_limit_wait_for_a_slot(self):
+        limiter = make_limiter(initial_limit=1)
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+
+        self.assertFalse(waiter.done())
+        self.assertEqual(limiter.waiting, 1)
+        await limiter.release()
+        await waiter
+        self.assertEqual(limiter.in_flight, 1)
+        self.assertEqual(limiter.waiting, 0)
+
+    async def test_waiting_counts_against_the_deadline(self):
+        limiter = make_limiter(initial_limit=1)
+        await limiter.acquire()
+
+        with self.assertRaises(DeadlineExceeded), deadline_scope(0.05):
+            await limiter.acquire()
+        self.assertEqual(limiter.waiting, 0)
+        self.assertEqual(limiter.in_flight, 1)
+
+    def test_limit_grows_while_queued_and_healthy(self):
+        limiter = make_limiter()
+        limiter.waiting = 3
+        limiter.latencies.extend([1.0] * 10)
+
+        limiter.maybe_adjust()
+
+        self.assertEqual(limiter.limit, 3)
+        self.assertEqual(limiter.decisions[-1]["action"], "increase")
+        self.assertEqual(len(limiter.latencies), 0)
+
+    def test_limit_backs_off_on_slow_renders_or_busy_host(self):
+        slow = make_limiter(initial_limit=8, latency_target=5)
+        slow.latencies.extend([1.0] * 9 + [30.0])
+        slow.maybe_adjust()
+
+        busy = make_limiter(initial_limit=8, load_probe=lambda: (1.5, 0.3))
+        busy.latencies.extend([1.0] * 10)
+        busy.maybe_adjust()
+
+        self.assertEqual(slow.limit, 5)
+        self.assertIn("p95 latency", slow.decisions[-1]["reason"])
+        self.assertEqual(busy.limit, 5)
+        self.assertIn("cpu load", busy.decisions[-1]["reason"])
+
+    def test_limit_stays_put_without_demand(self):
+        limiter = make_limiter()
+        limiter.latencies.extend([1.0] * 10)
+
+        limiter.maybe_adjust()
+
+        self.assertEqual(limiter.limit, 2)
+        self.assertEqual(len(limiter.decisions), 0)
+
+    def test_percentile(self):
+        self.assertEqual(percentile(range(1, 101), 0.95), 95)
+        self.assertEqual(percentile([3.0], 0.95), 3.0)
+
+
+class RenderPageLimiterTest(unittest.IsolatedAsyncioTestCase):
+    async def test_render_page_holds_a_slot_until_the_page_is_done(self):
+        renderer = WebRender(max_concurrency=4)
+        page = MagicMock()
+        page.set_content = AsyncMock()
+        page.close = AsyncMock()
+        renderer.browser.new_page = AsyncMock(return_value=page)
+
+        with self.assertRaises(RuntimeError):
+            async with renderer.render_page(content="<p>page</p>"):
+                self.assertEqual(renderer.limiter.in_flight, 1)
+                raise RuntimeError
+
+        self.assertEqual(renderer.limiter.in_flight, 0)
+        self.assertEqual(len(renderer.limiter.latencies), 1)
+        self.assertIn("webrender_concurrency_limit 2.0", renderer.metrics())
+
+    async def test_failing_cleanup_still_frees_the_page_and_the_slot(self):
+        renderer = WebRender(max_concurrency=4, page_metrics=True)
+        page = MagicMock()
+        page.set_content = AsyncMock()
+        page.close = AsyncMock()
+        renderer.browser.new_page = AsyncMock(return_value=page)
+        renderer.record_page_metrics = AsyncMock(side_effect=RuntimeError("Target closed"))
+
+        with self.assertRaises(RuntimeError):
+            async with renderer.render_page(content="<p>page</p>"):
+                pass
+
+        page.close.assert_awaited_once()
+        self.assertEqual(renderer.limiter.in_flight, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+from akari_bot_webrender.functions.exceptions import ResourceLimitExceeded
+from akari_bot_webrender.functions.main import WebRender
+from akari_bot_webrender.functions.metrics import PageMetricsRecorder, collect_page_metrics, render_prometheus
+
+
+def make_page(nodes=100, heap=8 * 1024 * 1024):
+    session = MagicMock()
+    session.detach = AsyncMock()
+
+    async def send(method, params=None):
+        if method == "Performance.getMetrics":
+            return {
+                "metrics": [
+                    {"name": "Nodes", "value": nodes},
+                    {"name": "JSHeapUsedSize", "value": heap},
+                    {"name": "LayoutDuration", "value": 0.25},
+                    {"name": "TaskDuration", "value": 1.5},
+                    {"name": "Documents", "value": 3},
+                ]
+            }
+        return {}
+
+    session.send = AsyncMock(side_effect=send)
+    page = MagicMock()
+    page.context.new_cdp_session = AsyncMock(return_value=session)
+    return page, session
+
+
+class PageMetricsTest(unittest.IsolatedAsyncioTestCase):
+    async def test_collect_page_metrics_reads_cdp_performance_metrics(self):
+        page, session = make_page()
+
+        metrics = await collect_page_metrics(page)
+
+        self.assertEqual(
+            metrics,
+            {"dom_nodes": 100, "js_heap_used": 8 * 1024 * 1024, "layout_duration": 0.25, "task_duration": 1.5},
+        )
+        session.detach.assert_awaited_once()
+
+    async def test_collect_page_metrics_without_cdp_returns_none(self):
+        page = MagicMock()
+        page.context.new_cdp_session = AsyncMock(side_effect=RuntimeError("CDP session is only available in Chromium"))
+
+        self.assertIsNone(await collect_page_metrics(page))
+
+    def test_recorder_ranks_hosts_by_heap_and_stays_bounded(self):
+        recorder = PageMetricsRecorder(max_hosts=2)
+        recorder.record("a.example", {"js_heap_used": 10})
+        recorder.record("b.example", {"js_heap_used": 30})
+        recorder.record("c.example", {"js_heap_used": 20})
+
+        top = recorder.top()
+
+        self.assertEqual([item["host"] for item in top], ["b.example", "c.example"])
+
+    async def test_dom_node_limit_aborts_render(self):
+        renderer = WebRender()
+        page, _session = make_page(nodes=50000)
+        page.goto = AsyncMock()
+        page.add_style_tag = AsyncMock()
+        page.close = AsyncMock()
+        renderer.browser.new_page = AsyncMock(return_value=page)
+
+        with self.assertRaises(ResourceLimitExceeded):
+            async with renderer.render_page(url="https://heavy.example/", max_dom_nodes=10000):
+                pass
+
+        page.close.assert_awaited_once()
+
+    async def test_render_page_records_metrics_per_host(self):
+        renderer = WebRender(page_metrics=True)
+        page, _session = make_page()
+        page.goto = AsyncMock()
+        page.add_style_tag = AsyncMock()
+        page.close = AsyncMock()
+        renderer.browser.new_page = AsyncMock(return_value=page)
+
+        async with renderer.render_page(url="https://wiki.example/wiki/Page"):
+            pass
+
+        self.assertEqual(renderer.page_metrics_recorder.top()[0]["host"], "wiki.example")
+        self.assertIn('webrender_host_max_dom_nodes{host="wiki.example"} 100.0', renderer.metrics())
+
+    def test_render_counters_cover_every_tracked_host(self):
+        renderer = WebRender(page_metrics=True)
+        for index in range(12):
+            renderer.page_metrics_recorder.record(f"host{index}.example", {"js_heap_used": index})
+
+        text = renderer.metrics()
+
+        self.assertIn('webrender_host_renders_total{host="host0.example"} 1.0', text)
+        self.assertNotIn('webrender_host_max_js_heap_bytes{host="host0.example"}', text)
+
+    def test_prometheus_labels_are_escaped(self):
+        text = render_prometheus([("metric", "gauge", "Help.", [({"host": 'a"b'}, 1)])])
+
+        self.assertIn('metric{host="a\\"b"} 1.0', text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+import time
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from fastapi.testclient import TestClient
+
+from akari_bot_webrender.functions.browser import Browser
+from akari_bot_webrender.functions.main import WebRender
+from akari_bot_webrender.server import main as server_main
+
+
+def make_page():
+    handlers = {}
+    page = MagicMock()
+    page.on = MagicMock(side_effect=lambda event, handler: handlers.setdefault(event, handler))
+    page.is_closed.return_value = False
+
+    async def close():
+        page.is_closed.return_value = True
+        handlers["close"](page)
+
+    page.close = AsyncMock(side_effect=close)
+    return page
+
+
+def make_browser(pages, page_max_age=60):
+    browser = Browser(page_max_age=page_max_age)
+    context = MagicMock()
+    context.new_page = AsyncMock(side_effect=pages)
+    browser.get_context = AsyncMock(return_value=context)
+    return browser
+
+
+class PageReaperTest(unittest.IsolatedAsyncioTestCase):
+    async def test_only_old_pages_no_request_holds_are_closed(self):
+        released, held, young = make_page(), make_page(), make_page()
+        browser = make_browser([released, held, young])
+        for _ in range(3):
+            await browser.new_page()
+        browser.release_page(released)
+        browser.release_page(young)
+        browser._page_idle_since[released] -= 120
+        browser._page_idle_since[held] -= 120
+
+        self.assertEqual(await browser.reap_pages(), 1)
+
+        released.close.assert_awaited_once()
+        held.close.assert_not_awaited()
+        young.close.assert_not_awaited()
+        self.assertEqual(browser.open_pages, 2)
+        self.assertEqual(browser.pages_reaped, 1)
+
+    async def test_age_is_measured_from_release(self):
+        kept = make_page()
+        browser = make_browser([kept])
+        await browser.new_page()
+        browser._page_idle_since[kept] -= 120
+
+        browser.release_page(kept)
+
+        self.assertEqual(await browser.reap_pages(), 0)
+        kept.close.assert_not_awaited()
+
+    async def test_probe_pages_are_not_served_pages(self):
+        probe = make_page()
+        probe.set_content = AsyncMock()
+        probe.evaluate = AsyncMock(return_value=2)
+        browser = make_browser([probe])
+
+        self.assertTrue(await browser.probe())
+
+        self.assertEqual(browser.pages_served, 0)
+        self.assertEqual(browser.open_pages, 0)
+
+    async def test_pages_are_counted_from_open_and_close_events(self):
+        first, popup = make_page(), make_page()
+        browser = make_browser([first])
+        await browser.new_page()
+        browser._track_page(popup)
+
+        self.assertEqual(browser.open_pages, 2)
+        await first.close()
+        self.assertEqual(browser.open_pages, 1)
+
+        # A popup opened by the page was never held by a request.
+        browser._page_idle_since[popup] = time.monotonic() - 120
+        await browser.reap_pages()
+        self.assertEqual(browser.open_pages, 0)
+
+    async def test_render_releases_kept_pages(self):
+        renderer = WebRender(keep_pages_open=True, page_max_age=60)
+        page = make_page()
+        page.set_content = AsyncMock()
+        renderer.browser.get_context = AsyncMock(return_value=MagicMock(new_page=AsyncMock(return_value=page)))
+
+        async with renderer.render_page(content="<p>kept</p>"):
+            self.assertIn(page, renderer.browser._held_pages)
+
+        self.assertNotIn(page, renderer.browser._held_pages)
+        self.assertEqual(renderer.browser.open_pages, 1)
+        page.close.assert_not_awaited()
+
+
+class HealthEndpointTest(unittest.TestCase):
+    def test_healthz_reports_counters_without_status(self):
+        client = TestClient(server_main.app)
+        with (
+            patch.object(server_main.webrender.browser, "check_status", AsyncMock(return_value=True)),
+            patch.object(server_main.webrender, "status", AsyncMock()) as status,
+        ):
+            response = client.get("/healthz")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["open_pages"], 0)
+        status.assert_not_awaited()
+
+    def test_healthz_fails_without_a_browser(self):
+        client = TestClient(server_main.app)
+        with patch.object(server_main.webrender.browser, "check_status", AsyncMock(return_value=False)):
+            response = client.get("/healthz")
+
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(response.json()["browser_connected"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from akari_bot_webrender.functions.main import WebRender
+from akari_bot_webrender.functions.snapshots import PageSnapshotCache
+
+
+def make_page():
+    response = MagicMock(status=200, ok=True, headers={"etag": '"rev-1"'})
+    page = MagicMock()
+    page.goto = AsyncMock(return_value=response)
+    page.set_content = AsyncMock()
+    page.add_style_tag = AsyncMock()
+    page.wait_for_timeout = AsyncMock()
+    page.evaluate = AsyncMock(return_value='<html><head><base href="https://wiki.example/a"></head></html>')
+    page.close = AsyncMock()
+    return page
+
+
+class PageSnapshotCacheTest(unittest.TestCase):
+    def test_snapshots_expire(self):
+        cache = PageSnapshotCache(ttl=30)
+        with patch("akari_bot_webrender.functions.snapshots.time.monotonic", return_value=0):
+            cache.put("page", "<html></html>", '"rev-1"')
+            self.assertEqual(cache.get("page").validator, '"rev-1"')
+        with patch("akari_bot_webrender.functions.snapshots.time.monotonic", return_value=31):
+            self.assertIsNone(cache.get("page"))
+
+        self.assertEqual(cache.stats()["bytes"], 0)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_least_recently_used_snapshots_are_dropped_over_the_size_limit(self):
+        cache = PageSnapshotCache(max_bytes=400)
+        cache.put("first", "a" * 100)
+        cache.put("second", "b" * 100)
+        cache.get("first")
+        cache.put("third", "c" * 100)
+        cache.put("fourth", "d" * 100)
+        cache.put("fifth", "e" * 100)
+        cache.put("too large", "f" * 101)
+
+        self.assertEqual(list(cache.snapshots), ["first", "third", "fourth", "fifth"])
+        self.assertEqual(cache.total_bytes, 400)
+        self.assertEqual(cache.evicted, 1)
+
+
+class RenderPageSnapshotTest(unittest.IsolatedAsyncioTestCase):
+    async def render(self, renderer, page, **kwargs):
+        renderer.browser.new_page = AsyncMock(return_value=page)
+        async with renderer.render_page(url="https://wiki.example/a", **kwargs):
+            pass
+
+    async def test_follow_up_request_restores_the_snapshot(self):
+        renderer = WebRender(page_snapshot_ttl=30)
+        first, second = make_page(), make_page()
+
+        await self.render(renderer, first, reuse_snapshot=True)
+        await self.render(renderer, second, reuse_snapshot=True)
+
+        first.goto.assert_awaited_once()
+        second.goto.assert_not_awaited()
+        restored = second.set_content.await_args.args[0]
+        self.assertTrue(restored.startswith('<html><head><base href="https://wiki.example/a">'))
+        self.assertEqual(renderer.page_snapshots.hits, 1)
+
+    async def test_other_contexts_and_plain_renders_load_the_page(self):
+        renderer = WebRender(page_snapshot_ttl=30)
+        await self.render(renderer, make_page(), reuse_snapshot=True)
+        narrow, plain = make_page(), make_page()
+
+        await self.render(renderer, narrow, reuse_snapshot=True, width=400)
+        await self.render(renderer, plain)
+
+        narrow.goto.assert_awaited_once()
+        plain.goto.assert_awaited_once()
+        plain.evaluate.assert_not_awaited()
+        self.assertEqual(len(renderer.page_snapshots.snapshots), 2)
+
+    async def test_snapshot_is_taken_after_the_page_settles(self):
+        renderer = WebRender(page_snapshot_ttl=30)
+        first, second, other_wait = make_page(), make_page(), make_page()
+        calls = MagicMock()
+        for name in ("add_style_tag", "wait_for_timeout", "evaluate"):
+            calls.attach_mock(getattr(first, name), name)
+
+        await self.render(renderer, first, reuse_snapshot=True, css="p {}", wait_after_load=500)
+        await self.render(renderer, second, reuse_snapshot=True, css="p {}", wait_after_load=500)
+        await self.render(renderer, other_wait, reuse_snapshot=True, css="p {}", wait_after_load=1000)
+
+        self.assertEqual([call[0] for call in calls.mock_calls], ["add_style_tag", "wait_for_timeout", "evaluate"])
+        second.goto.assert_not_awaited()
+        second.wait_for_timeout.assert_not_awaited()
+        other_wait.goto.assert_awaited_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
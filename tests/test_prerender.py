@@ -0,0 +1,132 @@
+import base64
+import unittest
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from akari_bot_webrender.functions.main import WebRender
+from akari_bot_webrender.functions.options import PageScreenshotOptions, SourceOptions
+from akari_bot_webrender.functions.prerender import PopularityTracker
+
+image = base64.b64encode(b"\xff\xd8 jpeg data").decode()
+
+
+def make_renderer():
+    renderer = WebRender(render_cache_size=16, prerender_top_k=2)
+    renderer.browser.check_status = AsyncMock(return_value=True)
+    element = MagicMock()
+    element.evaluate = AsyncMock(return_value="<body>page</body>")
+    page = MagicMock()
+    page.query_selector = AsyncMock(return_value=element)
+    renderer.add_count_box = AsyncMock()
+    renderer.make_screenshot = AsyncMock(return_value=[image])
+
+    @asynccontextmanager
+    async def render_page(**kwargs):
+        yield page, 0
+
+    renderer.render_page = render_page
+    return renderer
+
+
+def age_entries(renderer, seconds):
+    for entry in renderer.prerenderer.popularity.entries.values():
+        entry[4] -= seconds
+
+
+class PopularityTrackerTest(unittest.TestCase):
+    def test_requests_decay_and_rank_keys(self):
+        tracker = PopularityTracker(max_keys=2, half_life=60)
+        popular = PageScreenshotOptions(url="https://wiki.example/popular")
+        with patch("akari_bot_webrender.functions.prerender.time.monotonic", return_value=0):
+            tracker.record("page_screenshot", PageScreenshotOptions(url="https://wiki.example/old"))
+            tracker.record("page_screenshot", PageScreenshotOptions(url="https://wiki.example/old"))
+        with patch("akari_bot_webrender.functions.prerender.time.monotonic", return_value=120):
+            tracker.record("page_screenshot", popular)
+            tracker.record("page_screenshot", popular)
+            tracker.record("page_screenshot", PageScreenshotOptions(url="https://wiki.example/new"))
+            top = tracker.top(5)
+
+        self.assertEqual(len(top), 2)
+        self.assertEqual(top[0][2][3], popular)
+        self.assertAlmostEqual(top[0][1], 2)
+
+    def test_inline_content_is_not_tracked(self):
+        tracker = PopularityTracker()
+        tracker.record("page_screenshot", PageScreenshotOptions(content="<p>large</p>" * 1000))
+
+        self.assertEqual(tracker.entries, {})
+
+
+class PrerendererTest(unittest.IsolatedAsyncioTestCase):
+    async def test_popular_keys_are_refreshed_before_they_expire(self):
+        renderer = make_renderer()
+        options = PageScreenshotOptions(url="https://wiki.example/popular")
+        await renderer.page_screenshot(options)
+        await renderer.page_screenshot(options)
+        await renderer.page_screenshot(PageScreenshotOptions(url="https://wiki.example/once"))
+        age_entries(renderer, renderer.render_cache.ttl)
+
+        with patch.object(renderer.render_cache, "put", AsyncMock()) as put:
+            await renderer.prerenderer.run_round()
+
+        self.assertEqual(renderer.prerenderer.prerendered, 1)
+        put.assert_awaited_once()
+        key, score, _entry = renderer.prerenderer.popularity.top(1)[0]
+        self.assertEqual(put.await_args.args[0], key)
+        self.assertAlmostEqual(score, 2, places=2)
+
+    async def test_fresh_keys_are_left_alone(self):
+        renderer = make_renderer()
+        options = PageScreenshotOptions(url="https://wiki.example/popular")
+        await renderer.page_screenshot(options)
+        await renderer.page_screenshot(options)
+
+        await renderer.prerenderer.run_round()
+
+        self.assertEqual(renderer.prerenderer.prerendered, 0)
+
+    async def test_busy_browser_postpones_prerendering(self):
+        renderer = make_renderer()
+        options = PageScreenshotOptions(url="https://wiki.example/popular")
+        await renderer.page_screenshot(options)
+        await renderer.page_screenshot(options)
+        age_entries(renderer, renderer.render_cache.ttl)
+        renderer.active_renders = 1
+
+        await renderer.prerenderer.run_round()
+
+        self.assertEqual(renderer.prerenderer.prerendered, 0)
+        self.assertEqual(renderer.prerenderer.skipped_busy, 1)
+
+    async def test_prerenders_never_use_the_remote(self):
+        renderer = make_renderer()
+        renderer.remote_webrender_url = "https://fallback.example/"
+        renderer._request_remote = AsyncMock(return_value=[image])
+        options = PageScreenshotOptions(url="https://wiki.example/popular")
+        await renderer.page_screenshot(options)
+        await renderer.page_screenshot(options)
+        age_entries(renderer, renderer.render_cache.ttl)
+        renderer.render_page = MagicMock(side_effect=RuntimeError("Page crashed"))
+
+        await renderer.prerenderer.run_round()
+
+        renderer.render_page.assert_called_once()
+        renderer._request_remote.assert_not_awaited()
+
+    async def test_source_refresh_bypasses_the_cache(self):
+        renderer = make_renderer()
+        renderer.load_source = AsyncMock(return_value="<html>v1</html>")
+        options = SourceOptions(url="https://wiki.example/recent")
+        await renderer.source(options)
+        await renderer.source(options)
+        age_entries(renderer, renderer.render_cache.source_ttl)
+        renderer.load_source.return_value = "<html>v2</html>"
+
+        await renderer.prerenderer.run_round()
+
+        self.assertEqual(renderer.load_source.await_count, 2)
+        self.assertEqual(await renderer.source(options), "<html>v2</html>")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+from fastapi.testclient import TestClient
+
+from akari_bot_webrender.functions.exceptions import ResponseTooLarge
+from akari_bot_webrender.functions.main import WebRender
+from akari_bot_webrender.functions.options import RawOptions
+from akari_bot_webrender.functions.raw_stream import RawStream, cookies_to_jar
+from akari_bot_webrender.server import main as server_main
+
+real_async_client = httpx.AsyncClient
+
+
+def mock_client_factory(handler):
+    def factory(**kwargs):
+        return real_async_client(transport=httpx.MockTransport(handler), **kwargs)
+
+    return factory
+
+
+async def iterate_chunks(chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+class RawStreamTest(unittest.IsolatedAsyncioTestCase):
+    async def test_stream_stops_when_body_exceeds_max_size(self):
+        close = AsyncMock()
+        stream = RawStream(200, "application/octet-stream", iterate_chunks([b"a" * 6, b"b" * 6]), close, max_size=10)
+
+        received = []
+        with self.assertRaises(ResponseTooLarge):
+            async for chunk in stream:
+                received.append(chunk)
+
+        self.assertEqual(received, [b"a" * 6])
+        close.assert_awaited_once()
+
+    async def test_local_stream_uses_context_cookies(self):
+        seen_requests = []
+
+        def handler(request):
+            seen_requests.append(request)
+            return httpx.Response(200, headers={"content-type": "text/plain"}, content=b"streamed body")
+
+        renderer = WebRender()
+        renderer.browser.check_status = AsyncMock(return_value=True)
+        context = MagicMock()
+        context.cookies = AsyncMock(
+            return_value=[
+                {"name": "session", "value": "abc", "domain": "wiki.example", "path": "/"},
+                {"name": "other", "value": "xyz", "domain": "other.example", "path": "/"},
+            ]
+        )
+        renderer.browser.get_context = AsyncMock(return_value=context)
+
+        with patch("akari_bot_webrender.functions.raw_stream.httpx.AsyncClient", mock_client_factory(handler)):
+            stream = await renderer.get_raw_stream(RawOptions(url="https://wiki.example/file.txt", stream=True))
+            body = b"".join([chunk async for chunk in stream])
+
+        self.assertEqual((stream.status, stream.content_type, body), (200, "text/plain", b"streamed body"))
+        self.assertEqual(seen_requests[0].headers["cookie"], "session=abc")
+
+    async def test_announced_oversized_body_is_rejected(self):
+        def handler(request):
+            return httpx.Response(200, headers={"content-length": "100"}, content=b"x" * 100)
+
+        renderer = WebRender()
+        renderer.browser.check_status = AsyncMock(return_value=True)
+        context = MagicMock()
+        context.cookies = AsyncMock(return_value=[])
+        renderer.browser.get_context = AsyncMock(return_value=context)
+
+        with (
+            patch("akari_bot_webrender.functions.raw_stream.httpx.AsyncClient", mock_client_factory(handler)),
+            self.assertRaises(ResponseTooLarge),
+        ):
+            await renderer.get_raw_stream(RawOptions(url="https://example.com/big", max_size=10))
+
+    def test_cookie_jar_keeps_secure_flag(self):
+        jar = cookies_to_jar([{"name": "a", "value": "b", "domain": ".example.com", "path": "/", "secure": True}])
+
+        self.assertTrue(next(iter(jar.jar)).secure)
+
+
+class ServerRawStreamTest(unittest.TestCase):
+    def test_streaming_get_raw_sends_upstream_status_and_body(self):
+        stream = RawStream(404, "image/png", iterate_chunks([b"part1", b"part2"]), AsyncMock())
+
+        with (
+            patch.object(server_main.webrender, "browser_init", AsyncMock(return_value=True)),
+            patch.object(server_main.webrender, "browser_close", AsyncMock()),
+            patch.object(server_main.webrender, "get_raw_stream", AsyncMock(return_value=stream)),
+            TestClient(server_main.app) as client,
+        ):
+            response = client.post("/get_raw/", json={"url": "https://example.com/a.png", "stream": True})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["x-webrender-upstream-status"], "404")
+        self.assertEqual(response.headers["content-type"], "image/png")
+        self.assertEqual(response.content, b"part1part2")
+
+
+if __name__ == "__main__":
+    unittest.main()
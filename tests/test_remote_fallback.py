@@ -1,6 +1,10 @@
+import time
 import unittest
 from unittest.mock import AsyncMock, MagicMock, patch
 
+from akari_bot_webrender.functions.budget import ResourceBudget
+from akari_bot_webrender.functions.deadline import request_deadline
+from akari_bot_webrender.functions.exceptions import DeadlineExceeded
 from akari_bot_webrender.functions.main import WebRender, remote_fallback_hop, webrender_fallback
 
 
@@ -19,7 +23,10 @@ class DummyWebRender:
         self.browser = DummyBrowser(initialized=initialized)
         self.remote_webrender_url = remote_url
         self.remote_only = remote_only
-        self.logger = MagicMock()
+        self.logger = MagicMock(sample_rate=1.0)
+        self.prerenderer = None
+        self.hedge_policy = None
+        self.resource_budget = ResourceBudget()
         self._request_remote = AsyncMock(return_value=["remote-result"])
         self.local_calls = 0
 
@@ -132,11 +139,42 @@ class RemoteFallbackTest(unittest.IsolatedAsyncioTestCase):
         with patch("akari_bot_webrender.functions.main.httpx.AsyncClient", return_value=client):
             await renderer._request_remote("status", None)
 
-        log_message = renderer.logger.info.call_args.args[0]
+        message, url = renderer.logger.request_info.call_args.args
+        log_message = message.format(url)
         self.assertNotIn("user", log_message)
         self.assertNotIn("secret", log_message)
         self.assertEqual(log_message, "Trying remote WebRender: https://fallback.example/api/status/")
 
+    async def test_remote_request_is_capped_by_remaining_deadline(self):
+        response = MagicMock(status_code=200, text="[]")
+        response.read.return_value = b"[]"
+        client = MagicMock()
+        client.__aenter__ = AsyncMock(return_value=client)
+        client.__aexit__ = AsyncMock(return_value=None)
+        client.post = AsyncMock(return_value=response)
+        renderer = WebRender(remote_webrender_url="https://fallback.example/", remote_timeout=30)
+        token = request_deadline.set(time.monotonic() + 5)
+        try:
+            with patch("akari_bot_webrender.functions.main.httpx.AsyncClient", return_value=client) as client_class:
+                await renderer._request_remote("page", DummyOptions())
+        finally:
+            request_deadline.reset(token)
+
+        self.assertLessEqual(client_class.call_args.kwargs["timeout"], 5)
+        forwarded_timeout = float(client.post.await_args.kwargs["headers"]["X-WebRender-Timeout"])
+        self.assertTrue(0 < forwarded_timeout <= 5)
+
+    async def test_expired_deadline_skips_remote_fallback(self):
+        renderer = DummyWebRender()
+        token = request_deadline.set(time.monotonic() - 1)
+        try:
+            with self.assertRaises(DeadlineExceeded):
+                await renderer.page_screenshot(DummyOptions())
+        finally:
+            request_deadline.reset(token)
+
+        renderer._request_remote.assert_not_awaited()
+
 
 if __name__ == "__main__":
     unittest.main()
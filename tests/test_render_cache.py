@@ -0,0 +1,235 @@
+import base64
+import unittest
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import fakeredis
+from fastapi.testclient import TestClient
+
+from akari_bot_webrender.functions.cache import (
+    MemoryCacheBackend,
+    RedisCacheBackend,
+    RenderCache,
+    conditional_render,
+    conditional_scope,
+    decode_images,
+    encode_images,
+    parse_if_none_match,
+    render_cache_key,
+    size_aware_ttl,
+)
+from akari_bot_webrender.functions.exceptions import NotModified
+from akari_bot_webrender.functions.main import WebRender
+from akari_bot_webrender.functions.options import PageScreenshotOptions, SourceOptions
+from akari_bot_webrender.server import main as server_main
+
+image = base64.b64encode(b"\xff\xd8 jpeg data").decode()
+
+
+def make_renderer(html="<body>page</body>", navigation_headers=None, render_cache_size=16, cache_backend=None):
+    renderer = WebRender(render_cache_size=render_cache_size, cache_backend=cache_backend)
+    renderer.browser.check_status = AsyncMock(return_value=True)
+    element = MagicMock()
+    element.evaluate = AsyncMock(return_value=html)
+    page = MagicMock()
+    page.query_selector = AsyncMock(return_value=element)
+    renderer.add_count_box = AsyncMock()
+    renderer.make_screenshot = AsyncMock(return_value=[image])
+
+    @asynccontextmanager
+    async def render_page(**kwargs):
+        conditional = conditional_render.get()
+        conditional.validator = None
+        if navigation_headers:
+            conditional.validator = navigation_headers.get("etag") or navigation_headers.get("last-modified")
+        yield page, 0
+
+    renderer.render_page = render_page
+    return renderer, element
+
+
+class RenderCacheTest(unittest.TestCase):
+    def test_cache_key_ignores_timeout(self):
+        self.assertEqual(
+            render_cache_key("page_screenshot", PageScreenshotOptions(url="https://example.com/", timeout=5)),
+            render_cache_key("page_screenshot", PageScreenshotOptions(url="https://example.com/")),
+        )
+        self.assertNotEqual(
+            render_cache_key("page_screenshot", PageScreenshotOptions(url="https://example.com/", width=800)),
+            render_cache_key("page_screenshot", PageScreenshotOptions(url="https://example.com/")),
+        )
+
+    def test_if_none_match_parsing(self):
+        self.assertEqual(parse_if_none_match('W/"a", "b"'), {'"a"', '"b"'})
+        self.assertIsNone(parse_if_none_match(""))
+
+    def test_images_are_stored_as_raw_bytes(self):
+        images = [image, base64.b64encode(b"second slice" * 100).decode()]
+        data = encode_images('"etag"', images)
+
+        self.assertEqual(decode_images(data), ('"etag"', images))
+        self.assertLess(len(data), sum(len(item) for item in images) + len('"etag"'))
+
+    def test_large_values_expire_sooner(self):
+        self.assertEqual(size_aware_ttl(1024, 3600), 3600)
+        self.assertEqual(size_aware_ttl(1024 * 1024, 3600), 900)
+        self.assertEqual(size_aware_ttl(1024 * 1024 * 1024, 3600), 60)
+
+
+class CacheBackendTest(unittest.IsolatedAsyncioTestCase):
+    async def test_memory_backend_evicts_least_recently_used(self):
+        cache = RenderCache(MemoryCacheBackend(max_entries=2))
+        await cache.put("a", '"1"', [image])
+        await cache.put("b", '"1"', [image])
+        self.assertEqual(await cache.get("a", '"1"'), [image])
+        await cache.put("c", '"1"', [image])
+
+        self.assertIsNone(await cache.get("b", '"1"'))
+        self.assertIsNone(await cache.get("a", '"2"'))
+        self.assertEqual(cache.stats()["hits"], 1)
+
+    async def test_memory_backend_is_bounded_by_total_size(self):
+        backend = MemoryCacheBackend(max_entries=8, max_bytes=10)
+        await backend.set("a", b"1234", 60)
+        await backend.set("b", b"1234", 60)
+        await backend.set("c", b"1234", 60)
+        await backend.set("huge", b"x" * 11, 60)
+
+        self.assertIsNone(await backend.get("a"))
+        self.assertIsNone(await backend.get("huge"))
+        self.assertEqual(await backend.get("c"), b"1234")
+        self.assertEqual(backend.stats()["bytes"], 8)
+
+    async def test_redis_backend_shares_renders_between_nodes(self):
+        server = fakeredis.FakeServer()
+        first, _ = make_renderer(cache_backend=RedisCacheBackend(client=fakeredis.FakeAsyncRedis(server=server)))
+        second, _ = make_renderer(cache_backend=RedisCacheBackend(client=fakeredis.FakeAsyncRedis(server=server)))
+        options = PageScreenshotOptions(content="<p>page</p>")
+
+        self.assertEqual(await first.page_screenshot(options), [image])
+        self.assertEqual(await second.page_screenshot(options), [image])
+
+        first.make_screenshot.assert_awaited_once()
+        second.make_screenshot.assert_not_awaited()
+        ttl = await fakeredis.FakeAsyncRedis(server=server).pttl(
+            "webrender:images:" + render_cache_key("page_screenshot", options)
+        )
+        self.assertTrue(0 < ttl <= 3600 * 1000)
+
+    async def test_source_is_cached_compressed(self):
+        client = fakeredis.FakeAsyncRedis()
+        renderer = WebRender(cache_backend=RedisCacheBackend(client=client))
+        renderer.browser.check_status = AsyncMock(return_value=True)
+        source = "<html>" + "wiki text " * 1000 + "</html>"
+        renderer.load_source = AsyncMock(return_value=source)
+        options = SourceOptions(url="https://example.com/")
+
+        self.assertEqual(await renderer.source(options), source)
+        self.assertEqual(await renderer.source(options), source)
+
+        renderer.load_source.assert_awaited_once()
+        stored = await client.get("webrender:source:" + render_cache_key("source", options))
+        self.assertLess(len(stored), len(source) // 10)
+
+    async def test_unreachable_backend_is_a_miss(self):
+        client = MagicMock()
+        client.get = AsyncMock(side_effect=ConnectionError)
+        client.set = AsyncMock(side_effect=ConnectionError)
+        renderer, _ = make_renderer(cache_backend=RedisCacheBackend(client=client))
+
+        self.assertEqual(await renderer.page_screenshot(PageScreenshotOptions(content="<p>page</p>")), [image])
+        self.assertEqual(renderer.render_cache.stats()["errors"], 2)
+
+    async def test_corrupt_values_are_misses(self):
+        backend = MemoryCacheBackend()
+        cache = RenderCache(backend)
+        await backend.set("images:page", b"\x01", 60)
+        await backend.set("source:page", b"\x01\x03not deflated", 60)
+
+        self.assertIsNone(await cache.get("page", '"abc"'))
+        self.assertIsNone(await cache.get_source("page"))
+        self.assertEqual(cache.stats()["errors"], 2)
+        self.assertEqual(cache.stats()["misses"], 2)
+
+
+class ConditionalRenderTest(unittest.IsolatedAsyncioTestCase):
+    async def test_unchanged_element_is_served_from_cache(self):
+        renderer, _element = make_renderer()
+        options = PageScreenshotOptions(content="<p>page</p>")
+
+        with conditional_scope() as first:
+            self.assertEqual(await renderer.page_screenshot(options), [image])
+        with conditional_scope() as second:
+            self.assertEqual(await renderer.page_screenshot(options), [image])
+
+        self.assertEqual(first.etag, second.etag)
+        self.assertFalse(first.cached)
+        self.assertTrue(second.cached)
+        renderer.make_screenshot.assert_awaited_once()
+
+    async def test_changed_element_is_captured_again(self):
+        renderer, element = make_renderer()
+        options = PageScreenshotOptions(content="<p>page</p>")
+
+        await renderer.page_screenshot(options)
+        element.evaluate.return_value = "<body>edited</body>"
+        await renderer.page_screenshot(options)
+
+        self.assertEqual(renderer.make_screenshot.await_count, 2)
+
+    async def test_matching_if_none_match_raises_not_modified(self):
+        renderer, element = make_renderer(navigation_headers={"etag": '"rev-1"'})
+        options = PageScreenshotOptions(url="https://example.com/")
+
+        with conditional_scope() as conditional:
+            await renderer.page_screenshot(options)
+        with self.assertRaises(NotModified) as raised, conditional_scope(conditional.etag):
+            await renderer.page_screenshot(options)
+
+        self.assertEqual(raised.exception.etag, conditional.etag)
+        element.evaluate.assert_not_awaited()
+        renderer.make_screenshot.assert_awaited_once()
+        self.assertEqual(renderer.not_modified_responses, 1)
+
+    async def test_navigation_etag_becomes_validator(self):
+        renderer = WebRender()
+        page = MagicMock()
+        page.goto = AsyncMock(return_value=MagicMock(status=200, headers={"last-modified": "Mon, 19 Oct 2026"}))
+        page.close = AsyncMock()
+        renderer.browser.new_page = AsyncMock(return_value=page)
+
+        with conditional_scope() as conditional:
+            async with renderer.render_page(url="https://example.com/"):
+                pass
+
+        self.assertEqual(conditional.validator, "Mon, 19 Oct 2026")
+
+
+class ServerConditionalRenderTest(unittest.TestCase):
+    def test_screenshot_returns_etag_and_honours_if_none_match(self):
+        async def page_screenshot(options):
+            conditional = conditional_render.get()
+            conditional.etag = '"abc"'
+            if conditional.matches(conditional.etag):
+                raise NotModified(conditional.etag)
+            return ["image"]
+
+        with (
+            patch.object(server_main.webrender, "browser_init", AsyncMock(return_value=True)),
+            patch.object(server_main.webrender, "warmup", AsyncMock(return_value=True)),
+            patch.object(server_main.webrender, "browser_close", AsyncMock()),
+            patch.object(server_main.webrender, "page_screenshot", page_screenshot),
+            TestClient(server_main.app) as client,
+        ):
+            response = client.post("/page/", json={"content": "page"})
+            revalidated = client.post("/page/", json={"content": "page"}, headers={"If-None-Match": '"abc"'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["etag"], '"abc"')
+        self.assertEqual(response.json(), ["image"])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated.headers["etag"], '"abc"')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+from akari_bot_webrender.functions.budget import PageBudget, ResourceBudget, budget_scope
+from akari_bot_webrender.functions.exceptions import ResourceLimitExceeded
+from akari_bot_webrender.functions.main import WebRender
+from akari_bot_webrender.functions.options import PageScreenshotOptions
+
+
+def make_page(cdp=False):
+    """A page whose ``on`` handlers can be fired, with or without a CDP session."""
+    handlers = {}
+    page = MagicMock()
+    page.on = MagicMock(side_effect=lambda event, handler: handlers.setdefault(event, handler))
+    page.route = AsyncMock()
+    page.evaluate = AsyncMock()
+    page.close = AsyncMock()
+    session = None
+    if cdp:
+        session = MagicMock()
+        session.send = AsyncMock()
+        session.detach = AsyncMock()
+        session.on = MagicMock(side_effect=lambda event, handler: handlers.setdefault(event, handler))
+        page.context.new_cdp_session = AsyncMock(return_value=session)
+    else:
+        page.context.new_cdp_session = AsyncMock(side_effect=RuntimeError("CDP session is only available in Chromium"))
+    return page, handlers, session
+
+
+class ResourceBudgetTest(unittest.TestCase):
+    def test_requests_can_only_tighten_the_server_budget(self):
+        server = ResourceBudget(max_page_bytes=1000, max_page_requests=50)
+        options = PageScreenshotOptions(max_page_bytes=5000, max_page_requests=10, on_budget_exceeded="partial")
+
+        budget = server.for_request(options)
+
+        self.assertEqual(budget.max_page_bytes, 1000)
+        self.assertEqual(budget.max_page_requests, 10)
+        self.assertTrue(budget.partial)
+        self.assertIs(server.for_request(PageScreenshotOptions()), server)
+
+
+class PageBudgetTest(unittest.IsolatedAsyncioTestCase):
+    async def test_request_budget_blocks_further_requests(self):
+        page, handlers, _session = make_page()
+        tracker = PageBudget(page, ResourceBudget(max_page_requests=2))
+        await tracker.attach()
+
+        for _ in range(3):
+            handlers["request"](MagicMock())
+        await tracker._stopping
+
+        self.assertEqual(tracker.exceeded, "max_page_requests")
+        page.route.assert_awaited_once()
+        page.evaluate.assert_awaited_once()
+
+    async def test_byte_budget_counts_data_as_it_arrives_over_cdp(self):
+        page, handlers, session = make_page(cdp=True)
+        tracker = PageBudget(page, ResourceBudget(max_page_bytes=1000))
+        await tracker.attach()
+
+        handlers["Network.dataReceived"]({"dataLength": 600, "encodedDataLength": 0})
+        self.assertIsNone(tracker.exceeded)
+        handlers["Network.dataReceived"]({"dataLength": 600, "encodedDataLength": 500})
+        handlers["Network.dataReceived"]({"dataLength": 600, "encodedDataLength": 0})
+        await tracker._stopping
+        await tracker.detach()
+
+        self.assertEqual(tracker.bytes, 1700)
+        session.send.assert_any_await("Network.setBlockedURLs", {"urls": ["*"]})
+        session.send.assert_any_await("Page.stopLoading")
+        page.route.assert_not_awaited()
+        session.detach.assert_awaited_once()
+
+
+class RenderBudgetTest(unittest.IsolatedAsyncioTestCase):
+    def make_renderer(self, requests, error=None):
+        renderer = WebRender()
+        page, handlers, _session = make_page()
+        page.add_style_tag = AsyncMock()
+
+        async def goto(url, **kwargs):
+            for _ in range(requests):
+                handlers["request"](MagicMock())
+            await asyncio.sleep(0)
+            if error:
+                raise error
+
+        page.goto = AsyncMock(side_effect=goto)
+        renderer.browser.new_page = AsyncMock(return_value=page)
+        return renderer, page
+
+    async def test_render_over_budget_fails(self):
+        renderer, page = self.make_renderer(requests=20)
+
+        with budget_scope(ResourceBudget(max_page_requests=10)), self.assertRaises(ResourceLimitExceeded):
+            async with renderer.render_page(url="https://feed.example/"):
+                pass
+
+        self.assertEqual(renderer.budget_exceeded["max_page_requests"], 1)
+        self.assertEqual(renderer.page_budgets, {})
+        page.close.assert_awaited_once()
+
+    async def test_partial_render_keeps_what_loaded(self):
+        renderer, page = self.make_renderer(requests=20)
+
+        with budget_scope(ResourceBudget(max_page_requests=10, on_budget_exceeded="partial")):
+            async with renderer.render_page(url="https://feed.example/") as (rendered, _start_time):
+                self.assertIs(rendered, page)
+
+        self.assertEqual(renderer.budget_exceeded["max_page_requests"], 1)
+
+    async def test_aborted_navigation_fails_even_when_partial_renders_are_allowed(self):
+        renderer, page = self.make_renderer(requests=20, error=RuntimeError("net::ERR_ABORTED"))
+
+        with budget_scope(ResourceBudget(max_page_requests=10, on_budget_exceeded="partial")):
+            with self.assertRaises(ResourceLimitExceeded):
+                async with renderer.render_page(url="https://feed.example/"):
+                    pass
+
+        page.close.assert_awaited_once()
+
+    async def test_capture_is_cut_at_the_height_budget(self):
+        renderer = WebRender()
+        page = MagicMock()
+        page.evaluate = AsyncMock()
+        page.viewport_size = {"width": 720, "height": 1280}
+        page.screenshot = AsyncMock(return_value=b"slice")
+        element = MagicMock()
+        element.bounding_box = AsyncMock(return_value={"x": 0, "y": 0, "width": 720, "height": 100000})
+
+        with budget_scope(ResourceBudget(max_capture_height=3000, on_budget_exceeded="partial")):
+            images = await renderer.make_screenshot(page, element, screenshot_height=1000)
+        with budget_scope(ResourceBudget(max_capture_height=3000)), self.assertRaises(ResourceLimitExceeded):
+            await renderer.make_screenshot(page, element, screenshot_height=1000)
+
+        clips = [call.kwargs["clip"] for call in page.screenshot.await_args_list]
+        self.assertEqual(len(images), len(clips))
+        self.assertEqual(max(clip["y"] + clip["height"] for clip in clips), 3000)
+        self.assertEqual(renderer.budget_exceeded["max_capture_height"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
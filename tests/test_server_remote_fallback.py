@@ -1,5 +1,6 @@
+import asyncio
 import unittest
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 from fastapi.testclient import TestClient
 
@@ -87,6 +88,73 @@ class ServerRemoteFallbackTest(unittest.TestCase):
         self.assertIsNone(response.json())
         client_class.assert_not_called()
 
+    def test_exhausted_deadline_header_returns_gateway_timeout(self):
+        server_main.config["remote_only"] = False
+        server_main.webrender.remote_only = False
+        server_main.webrender.remote_webrender_url = None
+
+        with (
+            patch.object(server_main.webrender, "browser_init", AsyncMock(return_value=True)),
+            patch.object(server_main.webrender, "warmup", AsyncMock(return_value=True)),
+            patch.object(server_main.webrender, "browser_close", AsyncMock()),
+            patch.object(server_main.webrender.browser, "check_status", AsyncMock(return_value=True)),
+            patch.object(server_main.webrender, "page_screenshot", side_effect=server_main.DeadlineExceeded),
+            TestClient(server_main.app) as client,
+        ):
+            response = client.post("/page/", json={"content": "deadline"}, headers={"X-WebRender-Timeout": "0.01"})
+
+        self.assertEqual(response.status_code, 504)
+
+    def test_warmup_runs_before_requests_are_served(self):
+        server_main.config["remote_only"] = False
+        server_main.config["warmup"] = True
+        server_main.config["warmup_contexts"] = [{"width": 800, "height": 600}]
+        server_main.webrender.remote_only = False
+
+        with (
+            patch.object(server_main.webrender, "browser_init", AsyncMock(return_value=True)),
+            patch.object(server_main.webrender, "warmup", AsyncMock(return_value=True)) as warmup,
+            patch.object(server_main.webrender, "browser_close", AsyncMock()),
+            TestClient(server_main.app),
+        ):
+            warmup.assert_awaited_once_with([{"width": 800, "height": 600}])
+
+
+class CancelOnDisconnectTest(unittest.IsolatedAsyncioTestCase):
+    async def test_disconnected_client_cancels_running_request(self):
+        request = MagicMock()
+        request.is_disconnected = AsyncMock(return_value=True)
+        cancelled = asyncio.Event()
+
+        async def render():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        with (
+            patch.object(server_main, "disconnect_poll_interval", 0.01),
+            self.assertRaises(server_main.HTTPException) as raised,
+        ):
+            await server_main.cancel_on_disconnect(request, render())
+
+        self.assertEqual(raised.exception.status_code, 499)
+        self.assertTrue(cancelled.is_set())
+
+    async def test_connected_client_receives_result(self):
+        request = MagicMock()
+        request.is_disconnected = AsyncMock(return_value=False)
+
+        async def render():
+            await asyncio.sleep(0.03)
+            return ["image"]
+
+        with patch.object(server_main, "disconnect_poll_interval", 0.01):
+            result = await server_main.cancel_on_disconnect(request, render())
+
+        self.assertEqual(result, ["image"])
+
 
 if __name__ == "__main__":
     unittest.main()
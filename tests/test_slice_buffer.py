@@ -0,0 +1,129 @@
+import base64
+import tracemalloc
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import orjson as json
+from fastapi.testclient import TestClient
+
+from akari_bot_webrender.functions.cache import MemoryCacheBackend, RenderCache
+from akari_bot_webrender.functions.main import WebRender
+from akari_bot_webrender.functions.slices import SliceBuffer, iter_json_slices, spill_scope
+from akari_bot_webrender.server import main as server_main
+
+slice_size = 1024 * 1024
+
+
+def make_slice(index):
+    return bytes([index % 256]) * slice_size
+
+
+class SliceBufferTest(unittest.TestCase):
+    def test_short_captures_stay_a_list(self):
+        buffer = SliceBuffer(memory_threshold=4 * slice_size)
+        buffer.append(b"\xff\xd8 header")
+
+        self.assertFalse(buffer.spilled)
+        self.assertEqual(buffer.result(), [base64.b64encode(b"\xff\xd8 header").decode()])
+
+    def test_long_captures_spill_to_disk(self):
+        buffer = SliceBuffer(memory_threshold=2 * slice_size)
+        for index in range(5):
+            buffer.append(make_slice(index))
+
+        self.assertTrue(buffer.spilled)
+        self.assertIs(buffer.result(), buffer)
+        self.assertEqual(len(buffer), 5)
+        self.assertEqual(buffer.raw(0), make_slice(0))
+        self.assertEqual(base64.b64decode(buffer[-1]), make_slice(4))
+        self.assertEqual(json.loads(b"".join(iter_json_slices(buffer))), list(buffer))
+
+    def test_peak_memory_does_not_grow_with_the_capture(self):
+        tracemalloc.start()
+        try:
+            buffer = SliceBuffer(memory_threshold=2 * slice_size)
+            for index in range(40):
+                buffer.append(make_slice(index))
+            for _chunk in iter_json_slices(buffer):
+                pass
+            _current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(buffer.size, 40 * slice_size)
+        self.assertLess(peak, 8 * slice_size)
+
+
+class SpilledCaptureTest(unittest.IsolatedAsyncioTestCase):
+    async def capture(self, renderer, screenshot=None):
+        page = MagicMock()
+        page.evaluate = AsyncMock()
+        page.viewport_size = {"deviceScaleFactor": 1}
+        page.screenshot = screenshot or AsyncMock(side_effect=[make_slice(index) for index in range(4)])
+        element = MagicMock()
+        element.bounding_box = AsyncMock(return_value={"x": 0, "y": 0, "width": 720, "height": 4 * 8000})
+        return await renderer.make_screenshot(page, element, screenshot_height=8000)
+
+    async def test_make_screenshot_spills_past_the_threshold(self):
+        renderer = WebRender(slice_memory_threshold=2 * slice_size)
+
+        with spill_scope():
+            images = await self.capture(renderer)
+
+        self.assertIsInstance(images, SliceBuffer)
+        self.assertEqual(len(images), 4)
+        self.assertEqual(renderer.spilled_captures, 1)
+        images.close()
+
+    async def test_library_callers_always_get_a_list(self):
+        renderer = WebRender(slice_memory_threshold=2 * slice_size)
+
+        images = await self.capture(renderer)
+
+        self.assertIsInstance(images, list)
+        self.assertEqual(len(images), 4)
+        self.assertEqual(renderer.spilled_captures, 0)
+
+    async def test_failed_capture_deletes_its_temporary_file(self):
+        renderer = WebRender(slice_memory_threshold=slice_size)
+        buffers = []
+        original = SliceBuffer.append
+
+        def append(buffer, data):
+            buffers.append(buffer)
+            original(buffer, data)
+
+        screenshot = AsyncMock(side_effect=[make_slice(0), make_slice(1), RuntimeError("crashed")])
+        with spill_scope(), patch.object(SliceBuffer, "append", append), self.assertRaises(RuntimeError):
+            await self.capture(renderer, screenshot)
+
+        self.assertTrue(buffers[-1]._file.closed)
+
+    async def test_render_cache_skips_spilled_captures_over_its_value_limit(self):
+        cache = RenderCache(MemoryCacheBackend(4), max_value_size=slice_size)
+        buffer = SliceBuffer(memory_threshold=slice_size)
+        buffer.append(make_slice(0))
+        buffer.append(make_slice(1))
+
+        await cache.put("key", '"etag"', buffer)
+
+        self.assertIsNone(await cache.get("key", '"etag"'))
+
+
+class SpilledResponseTest(unittest.TestCase):
+    def test_spilled_capture_is_streamed_as_json(self):
+        buffer = SliceBuffer(memory_threshold=slice_size)
+        for index in range(3):
+            buffer.append(make_slice(index))
+
+        with patch.object(server_main.webrender, "page_screenshot", AsyncMock(return_value=buffer)):
+            response = TestClient(server_main.app).post("/page/", json={"content": "<p>long</p>"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "application/json")
+        self.assertEqual([base64.b64decode(image) for image in response.json()], [make_slice(i) for i in range(3)])
+        self.assertTrue(buffer._file.closed)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+from akari_bot_webrender.functions.browser import Browser
+from akari_bot_webrender.functions.storage import StorageStateStore, scope_storage_state, site_for_url
+
+state = {
+    "cookies": [
+        {"name": "cf_clearance", "value": "wiki", "domain": "wiki.example", "path": "/"},
+        {"name": "shared", "value": "parent", "domain": ".example", "path": "/"},
+        {"name": "tracker", "value": "other", "domain": "ads.other", "path": "/"},
+    ],
+    "origins": [
+        {"origin": "https://wiki.example", "localStorage": [{"name": "a", "value": "b"}]},
+        {"origin": "https://ads.other", "localStorage": [{"name": "c", "value": "d"}]},
+    ],
+}
+
+
+def make_browser(path):
+    browser = Browser(storage_state_path=path)
+    browser_process = MagicMock()
+
+    async def new_context(**kwargs):
+        context = MagicMock(pages=[])
+        context.storage_state = AsyncMock(return_value=state)
+        context.close = AsyncMock()
+        context.add_init_script = AsyncMock()
+        context.set_extra_http_headers = AsyncMock()
+        return context
+
+    browser_process.new_context = AsyncMock(side_effect=new_context)
+    browser.browser = browser_process
+    return browser
+
+
+class StorageStateTest(unittest.IsolatedAsyncioTestCase):
+    def test_state_is_scoped_to_the_site(self):
+        scoped = scope_storage_state(state, "wiki.example")
+
+        self.assertEqual([cookie["name"] for cookie in scoped["cookies"]], ["cf_clearance", "shared"])
+        self.assertEqual([origin["origin"] for origin in scoped["origins"]], ["https://wiki.example"])
+
+    def test_site_for_url_ignores_non_http_urls(self):
+        self.assertEqual(site_for_url("https://Wiki.Example:8443/wiki/Page"), "wiki.example")
+        self.assertIsNone(site_for_url("data:text/html,hello"))
+        self.assertIsNone(site_for_url(None))
+
+    def test_store_round_trip_never_leaks_other_sites(self):
+        with tempfile.TemporaryDirectory() as path:
+            store = StorageStateStore(path)
+            store.save("wiki.example", state)
+
+            self.assertEqual(store.load("wiki.example"), scope_storage_state(state, "wiki.example"))
+            self.assertIsNone(store.load("ads.other"))
+
+    async def test_each_site_gets_its_own_context_with_saved_state(self):
+        with tempfile.TemporaryDirectory() as path:
+            StorageStateStore(path).save("wiki.example", state)
+            browser = make_browser(path)
+
+            wiki_context = await browser.get_context(url="https://wiki.example/wiki/Page")
+            other_context = await browser.get_context(url="https://other.example/")
+
+            self.assertIsNot(wiki_context, other_context)
+            first_call, second_call = browser.browser.new_context.await_args_list
+            self.assertEqual(first_call.kwargs["storage_state"], scope_storage_state(state, "wiki.example"))
+            self.assertNotIn("storage_state", second_call.kwargs)
+
+    async def test_idle_site_contexts_are_saved_and_closed_beyond_the_limit(self):
+        with tempfile.TemporaryDirectory() as path:
+            browser = make_browser(path)
+            browser.max_site_contexts = 1
+
+            first = await browser.get_context(url="https://wiki.example/")
+            await browser.get_context(url="https://other.example/")
+
+            first.close.assert_awaited_once()
+            self.assertEqual(list(browser.contexts), ["720x1280_zh-CN_stealth@other.example"])
+            self.assertIsNotNone(StorageStateStore(path).load("wiki.example"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from fastapi.testclient import TestClient
+
+from akari_bot_webrender.functions.main import WebRender
+from akari_bot_webrender.functions.tracing import TraceRecorder
+from akari_bot_webrender.server import main as server_main
+
+
+def make_page():
+    async def stop(path=None):
+        if path:
+            Path(path).write_bytes(b"PK trace")
+
+    page = MagicMock()
+    page.context.tracing.start = AsyncMock()
+    page.context.tracing.stop = AsyncMock(side_effect=stop)
+    page.set_content = AsyncMock()
+    page.close = AsyncMock()
+    return page
+
+
+class TraceRecorderTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    async def test_only_failed_and_slow_traces_are_kept(self):
+        recorder = TraceRecorder(self.directory.name, sample_rate=1, slow_threshold=10)
+
+        for duration, failed in [(1, False), (1, True), (12, False)]:
+            session = await recorder.start(make_page(), "https://wiki.example/page")
+            await recorder.stop(session, duration, failed=failed)
+
+        names = [trace["name"] for trace in recorder.list()]
+        self.assertEqual(len(names), 2)
+        self.assertTrue(any("-failed-wiki.example-" in name for name in names))
+        self.assertTrue(any("-slow-wiki.example-" in name for name in names))
+        self.assertEqual(recorder.stats()["discarded"], 1)
+
+    async def test_a_context_is_traced_once_at_a_time(self):
+        recorder = TraceRecorder(self.directory.name, sample_rate=1)
+        page = make_page()
+
+        first = await recorder.start(page, None)
+        second = await recorder.start(page, None)
+        await recorder.stop(first, 0)
+
+        self.assertIsNotNone(first)
+        self.assertIsNone(second)
+        self.assertIsNotNone(await recorder.start(page, None))
+
+    async def test_oldest_traces_are_rotated_out(self):
+        recorder = TraceRecorder(self.directory.name, sample_rate=1, max_traces=2)
+
+        for second in range(3):
+            with patch("akari_bot_webrender.functions.tracing.time.strftime", return_value=f"2026010{second}"):
+                session = await recorder.start(make_page(), None)
+                await recorder.stop(session, 0, failed=True)
+
+        self.assertEqual(len(recorder.list()), 2)
+        self.assertIsNone(recorder.get("../config.json"))
+
+    async def test_failed_render_keeps_its_trace(self):
+        renderer = WebRender(trace_path=self.directory.name, trace_sample_rate=1)
+        renderer.browser.new_page = AsyncMock(return_value=make_page())
+
+        with self.assertRaises(RuntimeError):
+            async with renderer.render_page(content="<p>page</p>"):
+                raise RuntimeError
+
+        self.assertEqual(renderer.trace_recorder.kept, 1)
+
+
+class TraceEndpointTest(unittest.TestCase):
+    def test_traces_can_be_listed_and_downloaded(self):
+        with tempfile.TemporaryDirectory() as directory:
+            (Path(directory) / "20260101-failed-wiki.example-abcd.zip").write_bytes(b"PK trace")
+            recorder = TraceRecorder(directory)
+
+            with patch.object(server_main.webrender, "trace_recorder", recorder):
+                client = TestClient(server_main.app)
+                listing = client.get("/debug/traces/")
+                download = client.get(f"/debug/traces/{listing.json()[0]['name']}")
+                missing = client.get("/debug/traces/..%2Fconfig.json")
+
+        self.assertEqual(listing.json()[0]["size"], 8)
+        self.assertEqual(download.content, b"PK trace")
+        self.assertEqual(download.headers["content-type"], "application/zip")
+        self.assertEqual(missing.status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
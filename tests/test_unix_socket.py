@@ -0,0 +1,136 @@
+import base64
+import socket
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+from starlette.requests import Request
+
+from akari_bot_webrender.functions.main import WebRender
+from akari_bot_webrender.functions.options import PageScreenshotOptions
+from akari_bot_webrender.functions.shm import SliceHandover, import_slices, slice_transport_header
+from akari_bot_webrender.server import main as server_main
+
+large_slice = base64.b64encode(b"\xff" * 4096).decode()
+small_slice = base64.b64encode(b"small").decode()
+
+
+def make_request(server, headers=None):
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/page/",
+        "headers": [(key.lower().encode(), value.encode()) for key, value in (headers or {}).items()],
+        "server": server,
+    }
+    return Request(scope)
+
+
+class SliceHandoverTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name) / "slices"
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_large_slices_are_handed_over_as_files(self):
+        handover = SliceHandover(self.path, min_size=1024)
+
+        exported = handover.export([small_slice, large_slice])
+
+        self.assertEqual(exported[0], small_slice)
+        self.assertEqual(exported[1]["size"], 4096)
+        self.assertEqual(import_slices(exported, self.path), [small_slice, large_slice])
+        self.assertEqual(list(self.path.iterdir()), [])
+
+    def test_slices_outside_the_directory_are_refused(self):
+        secret = Path(self.directory.name) / "secret.txt"
+        secret.write_text("secret")
+
+        with self.assertRaises(ValueError):
+            import_slices([{"shm": str(secret), "size": 6}], self.path)
+        self.assertTrue(secret.exists())
+
+
+class UnixSocketClientTest(unittest.IsolatedAsyncioTestCase):
+    async def test_remote_requests_use_the_socket_and_collect_slices(self):
+        with tempfile.TemporaryDirectory() as directory:
+            exported = SliceHandover(directory, min_size=1024).export([large_slice])
+            renderer = WebRender(
+                remote_uds_path="/run/webrender.sock", remote_shm_path=directory, remote_shm_handover=True
+            )
+            response = MagicMock(status_code=200, headers={})
+            response.read.return_value = httpx.Response(200, json=exported).content
+            client = MagicMock()
+            client.__aenter__ = AsyncMock(return_value=client)
+            client.__aexit__ = AsyncMock(return_value=None)
+            client.post = AsyncMock(return_value=response)
+
+            with patch("akari_bot_webrender.functions.main.httpx.AsyncClient", return_value=client) as client_class:
+                result = await renderer.page_screenshot(PageScreenshotOptions(content="page"))
+
+        self.assertEqual(renderer.remote_webrender_url, "http://localhost/")
+        self.assertEqual(result, [large_slice])
+        self.assertIsInstance(client_class.call_args.kwargs["transport"], httpx.AsyncHTTPTransport)
+        self.assertEqual(client.post.await_args.kwargs["headers"][slice_transport_header], "shm")
+
+    async def test_slices_stay_inline_unless_handover_is_enabled(self):
+        renderer = WebRender(remote_uds_path="/run/webrender.sock")
+        response = MagicMock(status_code=200, headers={})
+        response.read.return_value = httpx.Response(200, json=[large_slice]).content
+        client = MagicMock()
+        client.__aenter__ = AsyncMock(return_value=client)
+        client.__aexit__ = AsyncMock(return_value=None)
+        client.post = AsyncMock(return_value=response)
+
+        with patch("akari_bot_webrender.functions.main.httpx.AsyncClient", return_value=client):
+            result = await renderer.page_screenshot(PageScreenshotOptions(content="page"))
+
+        self.assertEqual(result, [large_slice])
+        self.assertNotIn(slice_transport_header, client.post.await_args.kwargs["headers"])
+
+
+class UnixSocketServerTest(unittest.IsolatedAsyncioTestCase):
+    async def test_slices_are_only_handed_over_on_the_unix_socket(self):
+        async def render():
+            return [large_slice]
+
+        with tempfile.TemporaryDirectory() as directory:
+            with (
+                patch.dict(server_main.config, {"uds_path": "/run/webrender.sock"}),
+                patch.object(server_main, "slice_handover", SliceHandover(directory, min_size=1024)),
+            ):
+                headers = {slice_transport_header: "shm"}
+                over_tcp = await server_main.conditional_response(make_request(("127.0.0.1", 15551), headers), render())
+                over_uds = await server_main.conditional_response(
+                    make_request(("/run/webrender.sock", None), headers), render()
+                )
+                exported = httpx.Response(200, content=over_uds.body).json()
+
+                self.assertEqual(httpx.Response(200, content=over_tcp.body).json(), [large_slice])
+                self.assertEqual(import_slices(exported, directory), [large_slice])
+
+
+class StaleSocketTest(unittest.TestCase):
+    def test_only_sockets_nobody_listens_on_are_removed(self):
+        with tempfile.TemporaryDirectory() as directory:
+            stale, live = str(Path(directory) / "stale.sock"), str(Path(directory) / "live.sock")
+            with socket.socket(socket.AF_UNIX) as crashed:
+                crashed.bind(stale)
+            with socket.socket(socket.AF_UNIX) as listener:
+                listener.bind(live)
+                listener.listen()
+
+                server_main.remove_stale_socket(stale)
+                server_main.remove_stale_socket(live)
+                server_main.remove_stale_socket(str(Path(directory) / "missing.sock"))
+
+                self.assertFalse(Path(stale).exists())
+                self.assertTrue(Path(live).exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,247 @@
+import asyncio
+import base64
+import threading
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import orjson as json
+from fastapi.testclient import TestClient
+
+from akari_bot_webrender.functions.exceptions import ElementNotFound, NotModified
+from akari_bot_webrender.functions.main import WebRender
+from akari_bot_webrender.functions.multiplex import (
+    MultiplexClient,
+    decode_slice,
+    encode_slice,
+    progress_scope,
+    report_progress,
+)
+from akari_bot_webrender.functions.slices import SliceBuffer
+from akari_bot_webrender.server import main as server_main
+
+header_slice = b"\xff\xd8 header"
+body_slice = b"\xff\xd8 body"
+
+
+def receive_until_result(websocket, request_id):
+    frames = []
+    while True:
+        message = websocket.receive()
+        if message.get("bytes") is not None:
+            frames.append(decode_slice(message["bytes"]))
+            continue
+        frame = json.loads(message["text"])
+        frames.append(frame)
+        if frame["id"] == request_id and frame["event"] == "result":
+            return frames
+
+
+class FakeConnection:
+    """Answers render messages like the server's ``/ws/`` endpoint would."""
+
+    def __init__(self, answer):
+        self.answer = answer
+        self.sent = []
+        self.frames = asyncio.Queue()
+
+    async def send(self, frame):
+        message = json.loads(frame)
+        self.sent.append(message)
+        if message["op"] == "render":
+            for reply in self.answer(message):
+                self.frames.put_nowait(reply)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        frame = await self.frames.get()
+        if frame is None:
+            raise StopAsyncIteration
+        return frame
+
+    async def close(self):
+        self.frames.put_nowait(None)
+
+
+def screenshot_answer(message):
+    request_id = message["id"]
+    yield json.dumps({"id": request_id, "event": "progress", "stage": "slice", "index": 1, "total": 2}).decode()
+    yield encode_slice(request_id, 0, header_slice)
+    yield encode_slice(request_id, 1, body_slice)
+    yield json.dumps({"id": request_id, "event": "result", "status": 200, "slices": 2, "etag": '"abc"'}).decode()
+
+
+class WebSocketEndpointTest(unittest.TestCase):
+    def test_screenshot_streams_progress_and_binary_slices(self):
+        async def page_screenshot(options):
+            report_progress("navigated")
+            return [base64.b64encode(header_slice).decode(), base64.b64encode(body_slice).decode()]
+
+        with (
+            patch.object(server_main.webrender, "page_screenshot", page_screenshot),
+            TestClient(server_main.app).websocket_connect("/ws/") as websocket,
+        ):
+            websocket.send_text(json.dumps({"id": "a", "op": "render", "endpoint": "page", "options": {}}).decode())
+            frames = receive_until_result(websocket, "a")
+
+        self.assertEqual(frames[0], {"id": "a", "event": "progress", "stage": "navigated"})
+        self.assertEqual(frames[1:3], [("a", 0, header_slice), ("a", 1, body_slice)])
+        self.assertEqual(frames[3], {"id": "a", "event": "result", "status": 200, "slices": 2})
+
+    def test_spilled_capture_is_sent_and_deleted(self):
+        buffer = SliceBuffer(memory_threshold=1)
+        buffer.append(header_slice)
+        buffer.append(body_slice)
+
+        with (
+            patch.object(server_main.webrender, "page_screenshot", AsyncMock(return_value=buffer)),
+            TestClient(server_main.app).websocket_connect("/ws/") as websocket,
+        ):
+            websocket.send_text(json.dumps({"id": "a", "op": "render", "endpoint": "page", "options": {}}).decode())
+            frames = receive_until_result(websocket, "a")
+
+        self.assertEqual(frames[:2], [("a", 0, header_slice), ("a", 1, body_slice)])
+        self.assertTrue(buffer._file.closed)
+
+    def test_duplicate_request_id_is_refused_with_an_error_frame(self):
+        started = threading.Event()
+
+        async def page_screenshot(options):
+            started.set()
+            await asyncio.sleep(30)
+
+        with (
+            patch.object(server_main.webrender, "page_screenshot", page_screenshot),
+            TestClient(server_main.app).websocket_connect("/ws/") as websocket,
+        ):
+            message = json.dumps({"id": "a", "op": "render", "endpoint": "page"}).decode()
+            websocket.send_text(message)
+            self.assertTrue(started.wait(5))
+            websocket.send_text(message)
+            frame = json.loads(websocket.receive_text())
+
+        self.assertEqual(frame["event"], "error")
+        self.assertEqual(frame["status"], 409)
+
+    def test_errors_map_to_http_status_codes(self):
+        with (
+            patch.object(server_main.webrender, "element_screenshot", AsyncMock(side_effect=ElementNotFound)),
+            patch.object(server_main.webrender, "page_screenshot", AsyncMock(side_effect=NotModified('"abc"'))),
+            TestClient(server_main.app).websocket_connect("/ws/") as websocket,
+        ):
+            for request_id, endpoint in [("a", "element_screenshot"), ("b", "page"), ("c", "unknown")]:
+                websocket.send_text(
+                    json.dumps({"id": request_id, "op": "render", "endpoint": endpoint, "options": {}}).decode()
+                )
+                result = receive_until_result(websocket, request_id)[-1]
+                self.assertEqual(result["status"], {"a": 404, "b": 304, "c": 404}[request_id])
+
+        self.assertEqual(result["detail"], "Unknown endpoint")
+
+    def test_cancel_stops_one_render_and_keeps_the_others(self):
+        started = threading.Event()
+        cancelled = threading.Event()
+
+        async def page_screenshot(options):
+            started.set()
+            try:
+                await asyncio.sleep(30)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        with (
+            patch.object(server_main.webrender, "page_screenshot", page_screenshot),
+            patch.object(server_main.webrender, "source", AsyncMock(return_value="<html></html>")),
+            TestClient(server_main.app).websocket_connect("/ws/") as websocket,
+        ):
+            websocket.send_text(json.dumps({"id": "slow", "op": "render", "endpoint": "page"}).decode())
+            self.assertTrue(started.wait(5))
+            websocket.send_text(json.dumps({"id": "slow", "op": "cancel"}).decode())
+            websocket.send_text(
+                json.dumps(
+                    {"id": "fast", "op": "render", "endpoint": "source", "options": {"url": "https://a.b/"}}
+                ).decode()
+            )
+            result = receive_until_result(websocket, "fast")[-1]
+
+        self.assertTrue(cancelled.wait(5))
+        self.assertEqual(result["content"], "<html></html>")
+
+
+class WebSocketOutboxTest(unittest.IsolatedAsyncioTestCase):
+    async def test_progress_is_dropped_and_results_wait_while_the_outbox_is_full(self):
+        async def page_screenshot(options):
+            report_progress("navigated")
+            return [base64.b64encode(body_slice).decode()]
+
+        outbox = asyncio.Queue(1)
+        outbox.put_nowait("earlier")
+        with patch.object(server_main.webrender, "page_screenshot", page_screenshot):
+            request = asyncio.create_task(server_main.run_websocket_request({"id": "a", "endpoint": "page"}, outbox))
+            await asyncio.sleep(0.01)
+            self.assertFalse(request.done())
+            frames = [await outbox.get() for _ in range(3)]
+            await request
+
+        self.assertEqual(frames[0], "earlier")
+        self.assertEqual(frames[1][0], "a")
+        self.assertEqual(json.loads(frames[2])["slices"], 1)
+
+
+class MultiplexClientTest(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_requests_share_one_connection(self):
+        connection = FakeConnection(screenshot_answer)
+        client = MultiplexClient("ws://remote/ws/", connect=AsyncMock(return_value=connection))
+        progress = []
+
+        with progress_scope(lambda stage, details: progress.append((stage, details))):
+            first, second = await asyncio.gather(
+                client.request("page", {}, timeout=5), client.request("page", {}, timeout=5)
+            )
+        await client.close()
+
+        self.assertEqual(client.connections, 1)
+        self.assertEqual(
+            first["content"], [base64.b64encode(header_slice).decode(), base64.b64encode(body_slice).decode()]
+        )
+        self.assertEqual(second["etag"], '"abc"')
+        self.assertEqual(progress, [("slice", {"index": 1, "total": 2})] * 2)
+
+    async def test_abandoned_request_is_cancelled_remotely(self):
+        connection = FakeConnection(lambda message: [])
+        client = MultiplexClient("ws://remote/ws/", connect=AsyncMock(return_value=connection))
+
+        with self.assertRaises(TimeoutError):
+            await client.request("page", {}, timeout=0.05)
+        await client.close()
+
+        self.assertEqual(connection.sent[-1], {"id": "1", "op": "cancel"})
+        self.assertEqual(client.stats()["in_flight"], 0)
+
+    async def test_unreadable_frame_fails_pending_requests_with_its_error(self):
+        connection = FakeConnection(lambda message: ["not json"])
+        logger = MagicMock()
+        client = MultiplexClient("ws://remote/ws/", connect=AsyncMock(return_value=connection), logger=logger)
+
+        with self.assertRaises(json.JSONDecodeError):
+            await client.request("page", {}, timeout=5)
+        await client.close()
+
+        logger.exception.assert_called_once()
+        self.assertFalse(client.stats()["connected"])
+
+    async def test_remote_fallback_uses_the_websocket_client(self):
+        renderer = WebRender(remote_webrender_url="https://fallback.example/", remote_transport="websocket")
+        renderer.multiplex_client.request = AsyncMock(return_value={"status": 200, "content": ["image"]})
+
+        result = await renderer._request_remote("page", None)
+
+        self.assertEqual(result, ["image"])
+        self.assertEqual(renderer.multiplex_client.url, "wss://fallback.example/ws/")
+        self.assertEqual(renderer.multiplex_client.request.await_args.kwargs["hop"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()